@@ -0,0 +1,143 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""HTTP session of the asyncio discovery backend.
+
+The backend is optional and requires aiohttp, install it by:
+
+    $ pip install python-tempestconf[asyncio]
+
+All requests of one discovery share a single AsyncSession, i.e. a single
+event loop, thread and connection pool. Identical GET requests are sent only
+once, like in the synchronous backend, see config_tempest.request_cache.
+"""
+
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from config_tempest.constants import LOG
+from config_tempest import request_cache
+from config_tempest import resilience
+
+
+def is_available():
+    return aiohttp is not None
+
+
+class AsyncSession(object):
+    """Thin wrapper of aiohttp.ClientSession used by the services.
+
+    Services only call get() and get_status(), so that they don't depend
+    on aiohttp API and can be tested with any object providing the same
+    coroutines.
+    """
+
+    def __init__(self, disable_ssl_validation=False, limit=100):
+        """Init method of AsyncSession.
+
+        Must be called from a running event loop.
+
+        :param disable_ssl_validation: don't verify certificates
+        :type disable_ssl_validation: bool
+        :param limit: maximum number of simultaneous connections
+        :type limit: int
+        """
+        if aiohttp is None:
+            raise RuntimeError("The asyncio discovery backend requires "
+                               "aiohttp, install it by 'pip install "
+                               "python-tempestconf[asyncio]'.")
+        timeout = resilience.get_timeout()
+        if timeout is not None:
+            timeout = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                            sock_read=timeout[1])
+        else:
+            timeout = aiohttp.ClientTimeout(total=None)
+        connector = aiohttp.TCPConnector(
+            limit=limit, ssl=False if disable_ssl_validation else None)
+        self._session = aiohttp.ClientSession(connector=connector,
+                                              timeout=timeout)
+        self._responses = {}
+
+    async def get(self, url, headers=None):
+        """Send a GET request.
+
+        :return: status code and body of the response
+        :rtype: tuple (int, bytes)
+        """
+        key = request_cache.RequestCache.get_key(url, headers)
+        future = self._responses.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._get(url, headers))
+            self._responses[key] = future
+        else:
+            LOG.debug("Using cached response of GET %s", url)
+        try:
+            # shield, so that a cancelled waiter doesn't cancel the request
+            # for the others
+            return await asyncio.shield(future)
+        except Exception:
+            # errors are not memoized
+            if self._responses.get(key) is future:
+                del self._responses[key]
+            raise
+
+    async def get_status(self, method, url, headers=None, timeout=None):
+        """Send a request once and return its status code.
+
+        Unlike get, the request is neither cached nor retried by the policy
+        in use, redirects aren't followed and the body isn't read, it's
+        meant for probes, see config_tempest.services.horizon.
+
+        :param timeout: connect and read timeout in seconds, the timeout of
+                        the session if not given
+        :type timeout: float or None
+        :rtype: int
+        """
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(sock_connect=timeout,
+                                                      sock_read=timeout)
+        async with self._session.request(method, url, headers=headers,
+                                         allow_redirects=False,
+                                         **kwargs) as r:
+            return r.status
+
+    async def _send(self, url, headers):
+        async with self._session.get(url, headers=headers) as r:
+            return r.status, await r.read()
+
+    async def _get(self, url, headers):
+        # retried and circuit broken by the policy in use like the requests
+        # of the synchronous backend
+        errors = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+        try:
+            return await resilience.async_request(
+                lambda: self._send(url, headers), url, errors)
+        except errors as e:
+            raise resilience.EndpointUnavailable(
+                "Request to '%s' failed: %s" % (url, e))
+
+    async def close(self):
+        await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
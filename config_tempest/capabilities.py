@@ -0,0 +1,112 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Storage back-ends and their capabilities.
+
+The scheduler of cinder and manila reports the pools of the storage
+back-ends together with their capabilities, f.e. multiattach or
+snapshot_support. The pools of all the storage services are read once into
+a table indexed by (service, capability), so that every feature flag
+derived from them is a lookup and not another request.
+"""
+
+import json
+
+from config_tempest.tempest_conf import ListValue
+
+
+def normalize_value(value):
+    """Return a capability value in a comparable form.
+
+    The scheduler reports booleans as booleans or strings, with or without
+    the '<is>' operator of the extra specs, f.e. True, 'True', '<is> True'.
+    Lists and dicts are serialized to JSON so that they can be indexed.
+    """
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True)
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('<is>'):
+            value = value[len('<is>'):].strip()
+        if value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+    return value
+
+
+def get_key(value):
+    """Return the index key of a capability value.
+
+    The type is a part of the key, True and 1 or 1 and 1.0 are equal and
+    would be one key of a dict, but they're different capabilities, f.e.
+    thin_provisioning_support and max_over_subscription_ratio.
+    """
+    value = normalize_value(value)
+    return type(value), value
+
+
+class CapabilityTable(object):
+    """Back-ends of the storage services indexed by their capabilities."""
+
+    def __init__(self):
+        # {service: [back-end]}
+        self._backends = {}
+        # {(service, capability): {(type, value): [back-end]}}
+        self._index = {}
+
+    def add(self, service, backend, capabilities):
+        """Add a pool of a back-end.
+
+        :param service: feature name of the service, f.e. volume or share
+        :type service: string
+        :type backend: string
+        :param capabilities: capabilities of the pool
+        :type capabilities: dict
+        """
+        self._backends.setdefault(service, ListValue()).add(backend)
+        for capability, value in capabilities.items():
+            backends = self._index.setdefault(
+                (service, capability), {}).setdefault(
+                    get_key(value), ListValue())
+            backends.add(backend)
+
+    def get_backends(self, service, capability=None, value=True):
+        """Return back-ends of a service, in the order they were added.
+
+        :param capability: if given, only back-ends having a pool with the
+                           capability of the value are returned
+        :rtype: ListValue
+        """
+        if capability is None:
+            return ListValue(self._backends.get(service, ()))
+        values = self._index.get((service, capability), {})
+        return ListValue(values.get(get_key(value), ()))
+
+    def get_values(self, service, capability):
+        """Return normalized values of a capability reported by a service.
+
+        Values which are equal but of a different type, f.e. True and 1,
+        are all returned.
+
+        :rtype: list
+        """
+        return [value for _, value in
+                self._index.get((service, capability), {})]
+
+    def supports(self, service, capability):
+        """Return True if a pool of the service has the capability enabled.
+
+        :rtype: bool
+        """
+        return bool(self.get_backends(service, capability))
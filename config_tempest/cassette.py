@@ -0,0 +1,227 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Recording and replaying of the HTTP traffic of a python-tempestconf run.
+
+All HTTP requests made during the discovery, no matter whether they're sent
+by Service.do_get, tempest clients or the requests library, end up in
+urllib3's HTTPConnectionPool.urlopen. A cassette replaces that method for
+the duration of a run and either records every request and its response
+to a file (record mode) or serves the responses from that file without
+touching the network (replay mode).
+"""
+
+import base64
+import contextlib
+import gzip
+import io
+import json
+import threading
+
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool
+
+from config_tempest.constants import LOG
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# headers which carry secrets and are therefore not written to a cassette
+SENSITIVE_HEADERS = ('x-subject-token', 'x-auth-token', 'set-cookie')
+REDACTED = 'REDACTED'
+
+
+class CassetteError(urllib3.exceptions.HTTPError):
+    pass
+
+
+class Cassette(object):
+    """HTTP interactions of one python-tempestconf run.
+
+    Interactions are keyed by the HTTP method and the full url of the
+    request. When the same request is sent more times, the responses are
+    replayed in the order they were recorded, the last one is repeated once
+    all of them were used.
+    """
+
+    def __init__(self, path, mode):
+        """Init method of Cassette.
+
+        :param path: path to the cassette file, gzipped if it ends with .gz
+        :type path: string
+        :param mode: RECORD or REPLAY
+        :type mode: string
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError("Unknown cassette mode '%s'" % mode)
+        self.path = path
+        self.mode = mode
+        self.interactions = {}
+        self._replayed = {}
+        self._lock = threading.Lock()
+        self._urlopen = None
+        if mode == REPLAY:
+            self.load()
+
+    def _open(self, mode):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode + 't')
+        return open(self.path, mode)
+
+    def load(self):
+        with self._open('r') as f:
+            self.interactions = json.load(f)
+        LOG.info("Replaying HTTP interactions from cassette %s", self.path)
+
+    def save(self):
+        with self._open('w') as f:
+            json.dump(self.interactions, f, separators=(',', ':'),
+                      sort_keys=True)
+        LOG.info("HTTP interactions were recorded to cassette %s", self.path)
+
+    @staticmethod
+    def get_key(pool, method, url):
+        """Return the key of a request sent through pool.
+
+        :param pool: urllib3 connection pool the request is sent through
+        :type pool: urllib3.connectionpool.HTTPConnectionPool
+        :param url: url or the path of the request
+        :type url: string
+        :rtype: string
+        """
+        if not url.startswith('http:') and not url.startswith('https:'):
+            host = pool.host
+            if ':' in host:
+                # IPv6 address
+                host = '[%s]' % host
+            url = '%s://%s:%s%s' % (pool.scheme, host, pool.port, url)
+        return '%s %s' % (method.upper(), url)
+
+    @staticmethod
+    def _serialize(response, data):
+        headers = []
+        for name, value in response.headers.items():
+            if name.lower() in SENSITIVE_HEADERS:
+                value = REDACTED
+            headers.append([name, value])
+        interaction = {'status': response.status,
+                       'reason': response.reason,
+                       'headers': headers}
+        try:
+            interaction['body'] = data.decode('utf-8')
+        except UnicodeDecodeError:
+            interaction['body_b64'] = base64.b64encode(data).decode('ascii')
+        return interaction
+
+    @staticmethod
+    def _deserialize(interaction, method, url, preload_content,
+                     decode_content):
+        if 'error' in interaction:
+            raise urllib3.exceptions.ProtocolError(interaction['error'])
+        if 'body_b64' in interaction:
+            data = base64.b64decode(interaction['body_b64'])
+        else:
+            data = interaction['body'].encode('utf-8')
+        return urllib3.HTTPResponse(
+            body=io.BytesIO(data),
+            headers=[tuple(h) for h in interaction['headers']],
+            status=interaction['status'],
+            version=11,
+            reason=interaction['reason'],
+            preload_content=preload_content,
+            decode_content=decode_content,
+            request_method=method,
+            request_url=url)
+
+    def record(self, pool, method, url, body=None, headers=None, **kwargs):
+        """Send the request and save its response to the cassette."""
+        preload_content = kwargs.pop('preload_content', True)
+        decode_content = kwargs.pop('decode_content', True)
+        key = self.get_key(pool, method, url)
+        try:
+            response = self._urlopen(pool, method, url, body=body,
+                                     headers=headers, preload_content=False,
+                                     decode_content=False, **kwargs)
+        except Exception as e:
+            with self._lock:
+                self.interactions.setdefault(key, []).append(
+                    {'error': str(e)})
+            raise
+        # read the raw data, so that the response can be stored and then
+        # returned to the caller the same way as it would have been
+        # returned from the server
+        data = response.read(decode_content=False)
+        response.release_conn()
+        interaction = self._serialize(response, data)
+        with self._lock:
+            self.interactions.setdefault(key, []).append(interaction)
+        replayed = dict(interaction, headers=[
+            [name, value] for name, value in response.headers.items()])
+        return self._deserialize(replayed, method, url, preload_content,
+                                 decode_content)
+
+    def replay(self, pool, method, url, body=None, headers=None, **kwargs):
+        """Return the recorded response of the request."""
+        key = self.get_key(pool, method, url)
+        with self._lock:
+            if key not in self.interactions:
+                raise CassetteError("No recorded response for '%s' in "
+                                    "cassette %s" % (key, self.path))
+            responses = self.interactions[key]
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+        interaction = responses[min(index, len(responses) - 1)]
+        return self._deserialize(interaction, method, url,
+                                 kwargs.get('preload_content', True),
+                                 kwargs.get('decode_content', True))
+
+    def __enter__(self):
+        self._urlopen = HTTPConnectionPool.urlopen
+        handler = self.record if self.mode == RECORD else self.replay
+
+        def urlopen(pool, method, url, *args, **kwargs):
+            return handler(pool, method, url, *args, **kwargs)
+
+        HTTPConnectionPool.urlopen = urlopen
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        HTTPConnectionPool.urlopen = self._urlopen
+        self._urlopen = None
+        if self.mode == RECORD:
+            self.save()
+
+
+@contextlib.contextmanager
+def use(record=None, replay=None):
+    """Context manager recording or replaying HTTP traffic.
+
+    :param record: path to a cassette the traffic will be recorded to
+    :type record: string or None
+    :param replay: path to a cassette the traffic will be replayed from
+    :type replay: string or None
+    """
+    if record and replay:
+        raise ValueError("HTTP traffic can't be recorded and replayed "
+                         "at the same time.")
+    if not record and not replay:
+        yield None
+        return
+    if record:
+        cassette = Cassette(record, RECORD)
+    else:
+        cassette = Cassette(replay, REPLAY)
+    with cassette:
+        yield cassette
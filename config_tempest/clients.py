@@ -15,8 +15,9 @@
 
 from tempest.lib import exceptions
 from tempest.lib.services.compute import flavors_client
-from tempest.lib.services.compute import hosts_client
 from tempest.lib.services.compute import servers_client
+from tempest.lib.services.compute import services_client \
+    as compute_services_client
 from tempest.lib.services.identity.v2 import identity_client
 from tempest.lib.services.identity.v2 import roles_client
 from tempest.lib.services.identity.v2 import tenants_client
@@ -37,6 +38,8 @@ except ImportError:
     # For backward compatibility
     from tempest.lib.services.volume.v2 import services_client
 
+from config_tempest import constants as C
+
 
 class ProjectsClient(object):
     """The class is a wrapper for managing projects/tenants.
@@ -113,7 +116,7 @@ class ClientManager(object):
             endpoint_type='publicURL',
             default_params=default_params)
 
-        self.hosts_client = hosts_client.HostsClient(
+        self.compute_services = compute_services_client.ServicesClient(
             self.auth_provider,
             conf.get_defaulted('compute', 'catalog_type'),
             self.identity_region,
@@ -173,7 +176,8 @@ class ClientManager(object):
         # Set admin project id needed for keystone v3 tests.
         if creds.admin:
             project = self.projects.get_project_by_name(creds.project_name)
-            conf.set('auth', 'admin_project_id', project['id'])
+            conf.set('auth', 'admin_project_id', project['id'],
+                     layer=C.SOURCE_DISCOVERY + ' identity')
 
     def _get_default_params(self, conf):
         default_params = {
@@ -221,8 +225,9 @@ class ClientManager(object):
         """
         # TODO(arxcruz): This function is under used, it should return
         # a dictionary of all services for a particular client, for
-        # example, we need hosts_client and flavors_client for compute
-        # should return {'hosts': self.hosts_client, 'flavors': self.flavors }
+        # example, we need services and flavors clients for compute
+        # should return {'services': self.compute_services,
+        # 'flavors': self.flavors}
         # and so on.
         if service_name == "image":
             return self.images
@@ -232,7 +237,7 @@ class ClientManager(object):
             # methods which are chosen according to neutron presence
             return self
         elif service_name == "compute":
-            return self.hosts_client
+            return self.compute_services
         elif "volume" in service_name:
             return self.volume_client
         elif service_name == "metering":
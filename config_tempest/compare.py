@@ -0,0 +1,187 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Order independent comparison of tempest.conf files.
+
+Every file is normalized once into a map of (section, key) to its value.
+Values which are lists divided by commas, f.e. api_extensions, are stored
+as sets, so that they're compared regardless the order of their items.
+The difference of two files is then computed by set operations in one
+pass:
+
+    $ python -m config_tempest.compare ./file1.conf ./file2.conf
+    $ python -m config_tempest.compare --format json ./file1.conf \\
+        ./file2.conf
+"""
+
+import argparse
+import json
+import sys
+
+from six.moves import configparser
+
+# the section is treated as an ordinary one, its options are not merged
+# into the other sections
+NO_DEFAULT_SECTION = '\0'
+
+
+def normalize_value(value):
+    """Return a list value as a frozenset, other values as they are.
+
+    :type value: string
+    :rtype: string or frozenset
+    """
+    if ',' in value:
+        return frozenset(v.strip() for v in value.split(','))
+    return value
+
+
+def normalize(conf):
+    """Return options of a configuration as a map.
+
+    :param conf: configuration
+    :type conf: configparser.RawConfigParser or an object with the same API
+    :return: {(section, key): value}, list values are frozensets
+    :rtype: dict
+    """
+    options = {}
+    for section in conf.sections():
+        for key, value in conf.items(section, raw=True):
+            options[(section, key)] = normalize_value(value)
+    return options
+
+
+def read(path):
+    """Read and normalize a file.
+
+    :param path: path of an ini file
+    :type path: string
+    :rtype: dict, see normalize
+    """
+    conf = configparser.RawConfigParser(default_section=NO_DEFAULT_SECTION)
+    # preserve case of the options like TempestConf does
+    conf.optionxform = str
+    with open(path) as f:
+        conf.read_file(f)
+    return normalize(conf)
+
+
+def to_json(value):
+    """Return a normalized value in a JSON serializable form."""
+    if isinstance(value, frozenset):
+        return sorted(value)
+    return value
+
+
+def _to_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def compare(options1, options2):
+    """Return the difference of two normalized configurations.
+
+    :type options1: dict, see normalize
+    :type options2: dict, see normalize
+    :return: JSON serializable difference, all lists are sorted:
+        {'only_left': [[section, key, value]],
+         'only_right': [[section, key, value]],
+         'different': [{'section': section, 'key': key,
+                        'left': value, 'right': value,
+                        'removed': [items], 'added': [items]}]}
+        where removed and added are present only if both values are lists
+    :rtype: dict
+    """
+    keys1 = options1.keys()
+    keys2 = options2.keys()
+    different = []
+    for section, key in sorted(keys1 & keys2):
+        value1 = options1[(section, key)]
+        value2 = options2[(section, key)]
+        if value1 == value2:
+            continue
+        item = {'section': section, 'key': key,
+                'left': to_json(value1), 'right': to_json(value2)}
+        if isinstance(value1, frozenset) and isinstance(value2, frozenset):
+            item['removed'] = sorted(value1 - value2)
+            item['added'] = sorted(value2 - value1)
+        different.append(item)
+    return {
+        'only_left': [[s, k, to_json(options1[(s, k)])]
+                      for s, k in sorted(keys1 - keys2)],
+        'only_right': [[s, k, to_json(options2[(s, k)])]
+                       for s, k in sorted(keys2 - keys1)],
+        'different': different,
+    }
+
+
+def is_empty(difference):
+    """Return True if the difference doesn't contain any change."""
+    return not any(difference.values())
+
+
+def format_text(difference, path1, path2):
+    """Return the difference as human readable lines.
+
+    :rtype: list of strings
+    """
+    lines = []
+    for section, key, _ in difference['only_left']:
+        lines.append("%s doesn't have %s.%s option" % (path2, section, key))
+    for section, key, _ in difference['only_right']:
+        lines.append("%s doesn't have %s.%s option" % (path1, section, key))
+    for item in difference['different']:
+        if 'added' in item:
+            for value in item['removed']:
+                lines.append("%s value not in %s.%s of %s" % (
+                    value, item['section'], item['key'], path2))
+            for value in item['added']:
+                lines.append("%s value not in %s.%s of %s" % (
+                    value, item['section'], item['key'], path1))
+        else:
+            lines.append("%s in %s != %s in %s under %s.%s" % (
+                ','.join(_to_list(item['left'])), path1,
+                ','.join(_to_list(item['right'])), path2,
+                item['section'], item['key']))
+    return lines
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Compare two tempest.conf files regardless the order "
+                    "of options and of items of list values.")
+    parser.add_argument('left', help="path of the first file")
+    parser.add_argument('right', help="path of the second file")
+    parser.add_argument('--format', choices=('text', 'json'), default='text',
+                        help="""Output format, text lines are printed to
+                                the standard error output, json to the
+                                standard output.""")
+    return parser
+
+
+def main(argv=None):
+    """Compare two files, return 1 if they differ, 0 otherwise."""
+    args = get_arg_parser().parse_args(argv)
+    difference = compare(read(args.left), read(args.right))
+    if args.format == 'json':
+        json.dump(difference, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        for line in format_text(difference, args.left, args.right):
+            sys.stderr.write(line + '\n')
+    return 0 if is_empty(difference) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -32,6 +32,23 @@ DEFAULT_FLAVOR_RAM_ALT = 128
 DEFAULT_FLAVOR_DISK = 1
 DEFAULT_FLAVOR_VCPUS = 1
 
+DISCOVERY_BACKEND_SYNC = 'sync'
+DISCOVERY_BACKEND_ASYNCIO = 'asyncio'
+DISCOVERY_BACKENDS = (DISCOVERY_BACKEND_SYNC, DISCOVERY_BACKEND_ASYNCIO)
+
+# maximum of stages of a run running at the same time, see pipeline
+DEFAULT_STAGE_WORKERS = 4
+
+# layers which options of a tempest.conf come from, see
+# TempestConf.get_source, options set by a service have the layer
+# SOURCE_DISCOVERY followed by the type of the service
+SOURCE_DEFAULT = 'default'
+SOURCE_DEPLOYER_INPUT = 'deployer input'
+SOURCE_CLOUD_CONFIG = 'cloud config'
+SOURCE_OVERRIDE = 'override'
+SOURCE_DISCOVERY = 'discovery'
+SOURCE_PREVIOUS_RUN = 'previous run'
+
 # The dict holds the credentials, which are not supposed to be printed
 # to a tempest.conf when --test-accounts CLI parameter is used.
 ALL_CREDENTIALS_KEYS = {
@@ -13,9 +13,13 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import requests
+import json
+
 from tempest.lib import auth
 
+from config_tempest import constants as C
+from config_tempest import request_cache
+from config_tempest import resilience
 from config_tempest import utils
 
 
@@ -37,8 +41,6 @@ class Credentials(object):
         self.username = self.get_credential('username')
         self.password = self.get_credential('password')
         self.project_name = self.get_credential('project_name')
-        self.identity_version = self._get_identity_version()
-        self.api_version = 3 if self.identity_version == "v3" else 2
         self.identity_region = self._conf.get_defaulted('identity', 'region')
         self.disable_ssl_certificate_validation = self._conf.get_defaulted(
             'identity',
@@ -46,6 +48,8 @@ class Credentials(object):
         )
         self.ca_certs = self._conf.get_defaulted('identity',
                                                  'ca_certificates_file')
+        self.identity_version = self._get_identity_version()
+        self.api_version = 3 if self.identity_version == "v3" else 2
         self.set_credentials()
 
     def get_credential(self, key):
@@ -66,8 +70,13 @@ class Credentials(object):
             return self._conf.get_defaulted('identity', key)
 
     def _list_versions(self, base_url):
-        resp = requests.get(base_url)
-        data = resp.json()
+        def fetch():
+            http = resilience.get_pool_manager(
+                self.disable_ssl_certificate_validation)
+            return resilience.request(http, 'GET', base_url)
+
+        resp = request_cache.get(base_url, None, fetch)
+        data = json.loads(resp.data.decode('utf-8'))
         return data["versions"]["values"]
 
     def _get_identity_version(self):
@@ -125,7 +134,8 @@ class Credentials(object):
             # rc file don't set the /v3 it will fail with a error 404
             uri = self._conf.get_defaulted('identity', 'uri_v3')
             uri = utils.get_base_url(uri) + 'v3'
-            self._conf.set('identity', 'uri_v3', uri)
+            self._conf.set('identity', 'uri_v3', uri,
+                           layer=C.SOURCE_DISCOVERY + ' identity')
             return auth.KeystoneV3AuthProvider(
                 self.tempest_creds,
                 self._conf.get_defaulted('identity', 'uri_v3'),
@@ -0,0 +1,324 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Drift analysis of many generated tempest.conf files.
+
+tempestconf-diff reads the files one by one, f.e. the nightly output for
+every cloud and region, and adds their options to a columnar index of
+(section, key) to values and the files having them. Only the index is kept
+in memory, not the parsed files. From the index it reports:
+
+* clusters - groups of files with the same configuration,
+* outliers - values of an option shared by only a small part of the files,
+* changes - options which changed since a snapshot of a previous run.
+
+    $ tempestconf-diff --save-snapshot today.json nightly/
+    $ tempestconf-diff --snapshot today.json --format json nightly/
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from config_tempest import compare
+from config_tempest import constants as C
+from config_tempest.tempest_conf import TempestConf
+from config_tempest import utils
+
+SNAPSHOT_VERSION = 1
+DEFAULT_OUTLIER_THRESHOLD = 0.05
+# options which differ between clouds by design
+DEFAULT_IGNORED = tuple(sorted(C.ALL_CREDENTIALS_KEYS))
+
+
+def read_conf(path):
+    """Read and normalize a tempest.conf.
+
+    :rtype: dict, see compare.normalize
+    """
+    conf = TempestConf(default_section=compare.NO_DEFAULT_SECTION)
+    with open(path) as f:
+        conf.read_file(f)
+    return compare.normalize(conf)
+
+
+def iter_paths(paths, suffix='.conf'):
+    """Yield files given by paths, directories are walked recursively.
+
+    :param paths: paths of files or directories
+    :type paths: list
+    :param suffix: only files with the suffix are taken from directories
+    :type suffix: string
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith(suffix):
+                    yield os.path.join(root, name)
+
+
+def _from_json(value):
+    if isinstance(value, list):
+        return frozenset(value)
+    return value
+
+
+class Index(object):
+    """Columnar index of options of many files."""
+
+    def __init__(self, ignored=DEFAULT_IGNORED):
+        """Init method of Index.
+
+        :param ignored: 'section.key' options left out of the index, i.e.
+                        of the clusters, the outliers, the changes and the
+                        snapshots
+        :type ignored: iterable
+        """
+        self.files = []
+        # {(section, key): {value: [file index]}}
+        self.columns = {}
+        # {hash of the options: [file index]}
+        self.clusters = {}
+        self.ignored = set(tuple(o.split('.', 1)) for o in ignored)
+
+    def add(self, path, options):
+        """Add options of a file to the index.
+
+        :type path: string
+        :type options: dict, see compare.normalize
+        """
+        file_id = len(self.files)
+        self.files.append(path)
+        sha = hashlib.sha256()
+        for option in sorted(options):
+            if option in self.ignored:
+                # f.e. credentials, they don't get to the snapshots
+                continue
+            value = options[option]
+            self.columns.setdefault(option, {}).setdefault(
+                value, []).append(file_id)
+            sha.update(json.dumps(
+                [option, compare.to_json(value)]).encode('utf-8'))
+        self.clusters.setdefault(sha.hexdigest(), []).append(file_id)
+
+    def get_clusters(self):
+        """Return groups of files with the same options, biggest first.
+
+        :rtype: list of lists of paths
+        """
+        clusters = sorted(self.clusters.values(),
+                          key=lambda ids: (-len(ids), ids[0]))
+        return [[self.files[i] for i in ids] for ids in clusters]
+
+    def get_outliers(self, threshold=DEFAULT_OUTLIER_THRESHOLD):
+        """Return values shared by at most threshold of the files.
+
+        A file missing an option, which most of the files have, is an
+        outlier too, its value is None.
+
+        :param threshold: fraction of the files
+        :type threshold: float
+        :rtype: list of dicts
+        """
+        outliers = []
+        total = len(self.files)
+        limit = threshold * total
+        for section, key in sorted(self.columns):
+            values = self.columns[(section, key)]
+            missing = total - sum(len(ids) for ids in values.values())
+            groups = list(values.items())
+            if missing:
+                present = set(i for ids in values.values() for i in ids)
+                groups.append((None, [i for i in range(total)
+                                      if i not in present]))
+            if len(groups) < 2:
+                continue
+            for value, ids in sorted(groups, key=lambda g: g[1][0]):
+                if len(ids) <= limit:
+                    outliers.append({
+                        'section': section, 'key': key,
+                        'value': compare.to_json(value),
+                        'files': [self.files[i] for i in ids]})
+        return outliers
+
+    def _get_column(self, option):
+        """Return {path: value} of an option."""
+        return {self.files[i]: value
+                for value, ids in self.columns.get(option, {}).items()
+                for i in ids}
+
+    def get_changes(self, previous):
+        """Return options which changed since a previous index.
+
+        Only files present in both indexes are compared, list values are
+        compared regardless the order of their items, see compare. Options
+        ignored by this index are skipped, even if the previous one, f.e.
+        loaded from an older snapshot, has them.
+
+        :type previous: Index
+        :rtype: list of dicts
+        """
+        common = sorted(set(self.files) & set(previous.files))
+        options = (self.columns.keys() | previous.columns.keys()) - \
+            self.ignored
+        changes = []
+        for section, key in sorted(options):
+            new = self._get_column((section, key))
+            old = previous._get_column((section, key))
+            changed = [[path, compare.to_json(old.get(path)),
+                        compare.to_json(new.get(path))]
+                       for path in common
+                       if old.get(path) != new.get(path)]
+            if changed:
+                changes.append({'section': section, 'key': key,
+                                'files': changed})
+        return changes
+
+    def save(self, path):
+        """Save the index as a snapshot."""
+        columns = [[section, key,
+                    [[compare.to_json(v), ids] for v, ids in values.items()]]
+                   for (section, key), values in self.columns.items()]
+        utils.write_atomic(path, json.dumps(
+            {'version': SNAPSHOT_VERSION, 'files': self.files,
+             'columns': columns}, separators=(',', ':')))
+
+    @classmethod
+    def load(cls, path):
+        """Load an index from a snapshot."""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != SNAPSHOT_VERSION:
+            raise ValueError("Snapshot %s has an unsupported version" % path)
+        index = cls(ignored=())
+        index.files = data['files']
+        for section, key, values in data['columns']:
+            index.columns[(section, key)] = {
+                _from_json(v): ids for v, ids in values}
+        return index
+
+
+def build_index(paths, ignored=DEFAULT_IGNORED):
+    """Read files one by one and index their options.
+
+    :param paths: paths of files or directories containing them
+    :type paths: list
+    :rtype: Index
+    """
+    index = Index(ignored)
+    for path in iter_paths(paths):
+        index.add(path, read_conf(path))
+    return index
+
+
+def get_report(index, previous=None, threshold=DEFAULT_OUTLIER_THRESHOLD):
+    """Return the drift report.
+
+    :type index: Index
+    :param previous: index of the last snapshot, changes are reported only
+                     if given
+    :type previous: Index or None
+    :rtype: dict
+    """
+    report = {'files': len(index.files),
+              'clusters': index.get_clusters(),
+              'outliers': index.get_outliers(threshold)}
+    if previous is not None:
+        report['changes'] = index.get_changes(previous)
+    return report
+
+
+def _format_value(value):
+    """Return a value of the report as it's written in tempest.conf."""
+    if value is None:
+        return '(missing)'
+    if isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+def format_text(report):
+    """Return the report as human readable lines.
+
+    :rtype: list of strings
+    """
+    lines = ["%d files, %d clusters" % (report['files'],
+                                        len(report['clusters']))]
+    for i, cluster in enumerate(report['clusters']):
+        lines.append("cluster %d: %d files, f.e. %s" % (i, len(cluster),
+                                                        cluster[0]))
+    for outlier in report['outliers']:
+        lines.append("outlier %s.%s = %s in %s" % (
+            outlier['section'], outlier['key'],
+            _format_value(outlier['value']), ', '.join(outlier['files'])))
+    for change in report.get('changes', []):
+        for path, old, new in change['files']:
+            lines.append("changed %s.%s in %s: %s -> %s" % (
+                change['section'], change['key'], path, _format_value(old),
+                _format_value(new)))
+    return lines
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="Report drift between many tempest.conf files.")
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help="""tempest.conf files or directories, *.conf
+                                files are searched in them recursively""")
+    parser.add_argument('--snapshot', metavar='PATH',
+                        help="""Snapshot of a previous run, options changed
+                                since then are reported.""")
+    parser.add_argument('--save-snapshot', metavar='PATH',
+                        help="Save a snapshot of this run.")
+    parser.add_argument('--outlier-threshold', type=float,
+                        default=DEFAULT_OUTLIER_THRESHOLD, metavar='FRACTION',
+                        help="""Values shared by at most this fraction of
+                                the files are reported as outliers.""")
+    parser.add_argument('--ignore', action='append', default=[],
+                        metavar='SECTION.KEY',
+                        help="""Option left out of the report and of the
+                                snapshot, credentials are always left out.
+                                Can be used more times.""")
+    parser.add_argument('--format', choices=('text', 'json'), default='text',
+                        help="Output format.")
+    return parser
+
+
+def main(argv=None):
+    args = get_arg_parser().parse_args(argv)
+    index = build_index(args.paths, DEFAULT_IGNORED + tuple(args.ignore))
+    previous = None
+    if args.snapshot:
+        previous = Index.load(args.snapshot)
+    report = get_report(index, previous, args.outlier_threshold)
+    if args.format == 'json':
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        for line in format_text(report):
+            sys.stdout.write(line + '\n')
+    if args.save_snapshot:
+        index.save(args.save_snapshot)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
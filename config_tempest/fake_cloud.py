@@ -0,0 +1,459 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""A fake OpenStack cloud served on local ports.
+
+The cloud emulates the API calls python-tempestconf makes during the
+discovery: keystone catalog and authentication, versions and extensions of
+the services, flavors, images, networks, storage pools and so on. Every
+service listens on its own port, the same way as in a real deployment, so
+that the version discovery of the root urls works as expected.
+
+Usage::
+
+    cloud = FakeCloud(flavors=500, latency=0.2)
+    cloud.start()
+    try:
+        config_tempest(cloud_creds=cloud.cloud_creds, ...)
+    finally:
+        cloud.stop()
+
+It's used by the benchmark in tools/benchmark.py and by the end-to-end tests
+through config_tempest.tests.fake_cloud.FakeCloudFixture.
+"""
+
+import collections
+import json
+import re
+import socketserver
+import threading
+import time
+from wsgiref import simple_server
+
+from six.moves import urllib
+
+from config_tempest import constants as C
+
+PROJECT_ID = '6c9b8e5c4bd1459e8f2f4ad6dd8ba25c'
+TOKEN = 'gAAAAABfakeTokenForTempestconf'
+REGION = 'RegionOne'
+EXPIRES_AT = '2099-01-01T00:00:00.000000Z'
+UPDATED_AT = '2020-01-01T00:00:00.000000'
+
+# service types the cloud can offer on top of the core ones, used when
+# more services are requested
+EXTRA_SERVICE_TYPES = [
+    'orchestration', 'dns', 'key-manager', 'load-balancer', 'metering',
+    'share', 'sharev2', 'baremetal', 'database', 'data-processing',
+    'workflowv2', 'messaging', 'alarming', 'metric', 'event', 'placement',
+    'volumev2', 'application-catalog', 'container-infra', 'clustering',
+    'backup', 'shared-file-system', 'instance-ha', 'reservation',
+]
+CORE_SERVICES = [
+    # (type, name, path of the endpoint)
+    ('identity', 'keystone', '/v3'),
+    ('compute', 'nova', '/v2.1'),
+    ('image', 'glance', ''),
+    ('network', 'neutron', ''),
+    ('volumev3', 'cinderv3', '/v3/' + PROJECT_ID),
+    ('object-store', 'swift', '/v1/AUTH_' + PROJECT_ID),
+    ('block-storage', 'cinder', '/v3/' + PROJECT_ID),
+]
+# service types served by the server of another service type
+ALIASES = {'block-storage': 'volumev3'}
+
+
+class _ThreadingWSGIServer(socketserver.ThreadingMixIn,
+                           simple_server.WSGIServer):
+    daemon_threads = True
+
+
+class _QuietHandler(simple_server.WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCloud(object):
+    """OpenStack cloud emulated by local HTTP servers.
+
+    :param flavors: number of flavors in the cloud
+    :param images: number of images in the cloud
+    :param networks: number of networks in the cloud, the last one is the
+        external one
+    :param hosts: number of compute hosts
+    :param pools: number of volume storage pools
+    :param services: number of services in the catalog, the core ones
+        (identity, compute, image, network, volume and object storage) are
+        always present
+    :param latency: time in seconds every request takes
+    :param down: types of services whose endpoints answer every request
+        with 503, they're still in the catalog
+    """
+
+    def __init__(self, flavors=2, images=2, networks=2, hosts=1, pools=1,
+                 services=None, latency=0.0, down=()):
+        self.latency = latency
+        self.down = set(down)
+        self.flavors = [self._make_flavor(i) for i in range(flavors)]
+        self.images = [self._make_image(i) for i in range(max(images, 2))]
+        self.networks = [self._make_network(i, i == networks - 1)
+                         for i in range(networks)]
+        self.subnets = [self._make_subnet(i, n)
+                        for i, n in enumerate(self.networks)]
+        self.hosts = [{'id': i + 1, 'binary': 'nova-compute',
+                       'host': 'compute-%d' % i, 'zone': 'nova',
+                       'status': 'enabled', 'state': 'up',
+                       'updated_at': UPDATED_AT, 'disabled_reason': None}
+                      for i in range(hosts)]
+        self.pools = [{'name': 'volume-%d@lvm-%d#lvm' % (i, i),
+                       'capabilities': {
+                           'volume_backend_name': 'lvm-%d' % i,
+                           'pool_name': 'lvm', 'storage_protocol': 'iSCSI',
+                           'thin_provisioning_support': True,
+                           'multiattach': True,
+                           'replication_enabled': False}}
+                      for i in range(pools)]
+        extra = max((services or 0) - len(CORE_SERVICES), 0)
+        self.service_types = CORE_SERVICES + [
+            (s_type, s_type.replace('-', '_'), '/v1')
+            for s_type in EXTRA_SERVICE_TYPES[:extra]]
+        self.requests = collections.Counter()
+        self._lock = threading.Lock()
+        self._servers = {}
+        self._threads = []
+
+    @property
+    def http_calls(self):
+        """Number of requests the cloud has served so far."""
+        return sum(self.requests.values())
+
+    @property
+    def auth_url(self):
+        return self.url('identity') + '/v3'
+
+    @property
+    def cloud_creds(self):
+        """Credentials in the format returned by openstacksdk."""
+        return {'username': 'admin', 'password': 'secrete',
+                'project_name': 'admin', 'auth_url': self.auth_url,
+                'region_name': REGION}
+
+    def url(self, s_type):
+        server = self._servers[ALIASES.get(s_type, s_type)]
+        host, port = server.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+    def start(self):
+        for s_type, _, _ in self.service_types:
+            if s_type in ALIASES:
+                continue
+            server = simple_server.make_server(
+                '127.0.0.1', 0, self._make_app(s_type),
+                server_class=_ThreadingWSGIServer,
+                handler_class=_QuietHandler)
+            self._servers[s_type] = server
+            thread = threading.Thread(target=server.serve_forever)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._servers = {}
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # data of the cloud
+
+    def _make_flavor(self, i):
+        return {'id': str(1000 + i), 'name': 'flavor-%d' % i,
+                'ram': 64 * (i + 1), 'disk': 1 + i, 'vcpus': 1 + i % 8,
+                'swap': '', 'rxtx_factor': 1.0,
+                'OS-FLV-EXT-DATA:ephemeral': 0,
+                'OS-FLV-DISABLED:disabled': False,
+                'os-flavor-access:is_public': True,
+                'links': [{'href': 'http://localhost/flavors/%d' % (1000 + i),
+                           'rel': 'self'}]}
+
+    def _make_image(self, i):
+        # the first two images are the ones python-tempestconf looks for
+        name = C.DEFAULT_IMAGE.rsplit('/', 1)[-1]
+        names = {0: name, 1: name + '_alt'}
+        return {'id': 'a1b2c3d4-0000-4000-8000-%012d' % i,
+                'name': names.get(i, 'image-%d' % i), 'status': 'active',
+                'visibility': 'public', 'disk_format': 'qcow2',
+                'container_format': 'bare', 'size': 13,
+                'min_disk': 0, 'min_ram': 0, 'protected': False,
+                'tags': [], 'owner': PROJECT_ID}
+
+    def _make_network(self, i, external):
+        return {'id': 'b1c2d3e4-0000-4000-8000-%012d' % i,
+                'name': 'public' if external else 'network-%d' % i,
+                'router:external': external, 'status': 'ACTIVE',
+                'shared': external, 'admin_state_up': True,
+                'project_id': PROJECT_ID,
+                'subnets': ['c1d2e3f4-0000-4000-8000-%012d' % i]}
+
+    def _make_subnet(self, i, network):
+        return {'id': network['subnets'][0], 'network_id': network['id'],
+                'name': network['name'] + '-subnet', 'ip_version': 4,
+                'cidr': '10.%d.0.0/24' % i}
+
+    def catalog(self):
+        catalog = []
+        for s_type, name, path in self.service_types:
+            catalog.append({
+                'id': name + '-id', 'type': s_type, 'name': name,
+                'endpoints': [{'id': name + '-public', 'interface': 'public',
+                               'region': REGION, 'region_id': REGION,
+                               'url': self.url(s_type) + path}]})
+        return catalog
+
+    # HTTP handling
+
+    def _make_app(self, s_type):
+        handler = getattr(self, '_' + s_type.replace('-', '_'),
+                          self._generic)
+
+        def app(environ, start_response):
+            method = environ['REQUEST_METHOD']
+            path = environ.get('PATH_INFO', '/')
+            query = urllib.parse.parse_qs(environ.get('QUERY_STRING', ''))
+            with self._lock:
+                self.requests[(s_type, method, path)] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if s_type in self.down:
+                start_response('503 Service Unavailable',
+                               [('Content-Length', '0')])
+                return [b'']
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            if length:
+                environ['wsgi.input'].read(length)
+            response = handler(method, path, query)
+            if response is None:
+                response = (404, {'itemNotFound': {'code': 404}})
+            status, body = response[:2]
+            headers = response[2] if len(response) > 2 else {}
+            if isinstance(body, bytes):
+                content_type = 'application/octet-stream'
+            else:
+                content_type = 'application/json'
+                body = json.dumps(body).encode('utf-8')
+            headers = dict({'Content-Type': content_type,
+                            'Content-Length': str(len(body))}, **headers)
+            start_response('%d %s' % (status, _reason(status)),
+                           list(headers.items()))
+            return [body]
+        return app
+
+    def _versions(self, s_type, versions):
+        url = self.url(s_type)
+        return {'versions': [
+            dict({'status': status, 'id': v_id, 'updated': UPDATED_AT,
+                  'links': [{'href': '%s/%s/' % (url, v_id), 'rel': 'self'}]},
+                 **extra)
+            for v_id, status, extra in versions]}
+
+    def _identity(self, method, path, query):
+        version = {'id': 'v3.14', 'status': 'stable', 'updated': UPDATED_AT,
+                   'links': [{'href': self.auth_url + '/', 'rel': 'self'}]}
+        if path == '/':
+            return 300, {'versions': {'values': [version]}}
+        if path.rstrip('/') == '/v3':
+            ext = 'https://docs.openstack.org/api/openstack-identity/3/ext/'
+            return 200, {'version': version, 'resources': {
+                ext + 'OS-INHERIT/1.0/rel/domain_user_role_inherited': {},
+                ext + 'OS-EP-FILTER/1.0/rel/endpoint_projects': {},
+                ext + 'OS-OAUTH1/1.0/rel/access_tokens': {}}}
+        if path == '/v3/auth/tokens' and method == 'POST':
+            return 201, {'token': {
+                'methods': ['password'], 'expires_at': EXPIRES_AT,
+                'issued_at': '2020-01-01T00:00:00.000000Z',
+                'project': {'id': PROJECT_ID, 'name': 'admin',
+                            'domain': {'id': 'default', 'name': 'Default'}},
+                'user': {'id': 'admin-id', 'name': 'admin',
+                         'domain': {'id': 'default', 'name': 'Default'}},
+                'roles': [{'id': 'admin-role-id', 'name': 'admin'}],
+                'catalog': self.catalog()}}, {'X-Subject-Token': TOKEN}
+        if path == '/v3/services':
+            services = [{'id': name + '-id', 'name': name, 'type': s_type,
+                         'enabled': True}
+                        for s_type, name, _ in self.service_types]
+            if 'type' in query:
+                services = [s for s in services
+                            if s['type'] in query['type']]
+            return 200, {'services': services}
+        if path == '/v3/projects':
+            return 200, {'projects': [
+                {'id': PROJECT_ID, 'name': 'admin', 'domain_id': 'default',
+                 'enabled': True, 'description': ''}]}
+        if path == '/v3/roles':
+            return 200, {'roles': [
+                {'id': name + '-role-id', 'name': name, 'domain_id': None}
+                for name in ('admin', 'member', 'reader', 'ResellerAdmin')]}
+        return None
+
+    def _compute(self, method, path, query):
+        if path == '/':
+            return 200, self._versions('compute', [
+                ('v2.0', 'SUPPORTED', {'version': '', 'min_version': ''}),
+                ('v2.1', 'CURRENT', {'version': '2.87',
+                                     'min_version': '2.1'})])
+        if path == '/v2.1/os-services':
+            return 200, {'services': [
+                h for h in self.hosts
+                if h['binary'] in query.get('binary', [h['binary']])]}
+        if path == '/v2.1/flavors':
+            return 200, {'flavors': [
+                {'id': f['id'], 'name': f['name'], 'links': f['links']}
+                for f in self.flavors]}
+        m = re.match(r'^/v2.1/flavors/([^/]+)$', path)
+        if m:
+            for flavor in self.flavors:
+                if flavor['id'] == m.group(1):
+                    return 200, {'flavor': flavor}
+        return None
+
+    def _image(self, method, path, query):
+        if path == '/':
+            return 300, self._versions('image', [
+                ('v2.9', 'CURRENT', {}), ('v2.8', 'SUPPORTED', {})])
+        if path == '/v2/images':
+            return 200, {'images': self.images, 'first': '/v2/images',
+                         'schema': '/v2/schemas/images'}
+        m = re.match(r'^/v2/images/([^/]+)(/file)?$', path)
+        if m:
+            for image in self.images:
+                if image['id'] == m.group(1):
+                    if m.group(2):
+                        return 200, b'fake-image-data'
+                    return 200, image
+        return None
+
+    def _network(self, method, path, query):
+        if path == '/':
+            return 200, self._versions('network', [('v2.0', 'CURRENT', {})])
+        if path == '/v2.0/extensions.json':
+            return 200, {'extensions': [
+                {'alias': alias, 'name': alias, 'description': '',
+                 'updated': UPDATED_AT, 'links': []}
+                for alias in ('agent', 'allowed-address-pairs', 'binding',
+                              'dvr', 'external-net', 'extraroute',
+                              'l3-ha', 'network-ip-availability',
+                              'port-security', 'project-id', 'qos',
+                              'quotas', 'rbac-policies', 'router',
+                              'security-group', 'standard-attr-tag',
+                              'subnet_allocation', 'trunk')]}
+        resources = {'/v2.0/networks': ('networks', self.networks),
+                     '/v2.0/subnets': ('subnets', self.subnets)}
+        if path in resources:
+            name, items = resources[path]
+            return 200, self._neutron_list(path, name, items, query)
+        m = re.match(r'^/v2.0/networks/([^/]+)$', path)
+        if m:
+            for network in self.networks:
+                if network['id'] == m.group(1):
+                    return 200, {'network': network}
+        return None
+
+    def _neutron_list(self, path, name, resources, query):
+        """Filter, paginate and select fields of resources like neutron."""
+        reserved = ('fields', 'limit', 'marker')
+        for key, values in query.items():
+            if key not in reserved:
+                resources = [r for r in resources
+                             if str(r.get(key)) in values]
+        if 'marker' in query:
+            ids = [r['id'] for r in resources]
+            marker = query['marker'][0]
+            resources = resources[ids.index(marker) + 1:]
+        body = {}
+        if 'limit' in query:
+            limit = int(query['limit'][0])
+            if len(resources) >= limit:
+                href = '%s?marker=%s' % (self.url('network') + path,
+                                         resources[limit - 1]['id'])
+                body[name + '_links'] = [{'rel': 'next', 'href': href}]
+            resources = resources[:limit]
+        if 'fields' in query:
+            resources = [{k: r[k] for k in query['fields'] if k in r}
+                         for r in resources]
+        body[name] = resources
+        return body
+
+    def _volumev3(self, method, path, query):
+        prefix = '/v3/' + PROJECT_ID
+        if path == '/':
+            return 300, self._versions('volumev3', [
+                ('v2.0', 'DEPRECATED', {'version': '', 'min_version': ''}),
+                ('v3.0', 'CURRENT', {'version': '3.59',
+                                     'min_version': '3.0'})])
+        if path == prefix + '/extensions':
+            return 200, {'extensions': [
+                {'alias': alias, 'name': alias, 'description': '',
+                 'updated': UPDATED_AT, 'links': []}
+                for alias in ('OS-SCH-STATS', 'os-availability-zone',
+                              'os-extended-snapshot-attributes',
+                              'os-hosts', 'os-quota-sets', 'os-services',
+                              'os-types-manage', 'os-volume-actions')]}
+        if path == prefix + '/scheduler-stats/get_pools':
+            if 'true' in query.get('detail', []):
+                return 200, {'pools': self.pools}
+            return 200, {'pools': [{'name': p['name']} for p in self.pools]}
+        if path == prefix + '/os-services':
+            services = [{'binary': 'cinder-backup', 'host': 'backup-0',
+                         'zone': 'nova', 'status': 'enabled',
+                         'state': 'up', 'updated_at': UPDATED_AT,
+                         'disabled_reason': None}]
+            return 200, {'services': [
+                s for s in services
+                if s['binary'] in query.get('binary', [s['binary']])]}
+        return None
+
+    def _object_store(self, method, path, query):
+        if path == '/info':
+            return 200, {'swift': {'version': '2.25.0'}, 'formpost': {},
+                         'tempurl': {}, 'bulk_delete': {}, 'slo': {}}
+        if path.endswith('/healthcheck'):
+            return 200, b'OK'
+        return None
+
+    def _generic(self, method, path, query):
+        """Any other service with a versioned root and empty resources."""
+        if path.rstrip('/') in ('', '/v1'):
+            return 200, {'versions': [
+                {'id': 'v1.0', 'status': 'CURRENT', 'version': '1.0',
+                 'min_version': '1.0', 'updated': UPDATED_AT, 'links': []}]}
+        if path.endswith('/extensions'):
+            return 200, {'extensions': []}
+        if 'pools' in path:
+            return 200, {'pools': []}
+        return 200, {}
+
+
+def _reason(status):
+    return {200: 'OK', 201: 'Created', 300: 'Multiple Choices',
+            404: 'Not Found'}.get(status, 'Unknown')
@@ -0,0 +1,205 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Incremental regeneration of an existing tempest.conf.
+
+Setting up of the resources is the slowest part of a run, f.e. flavors are
+listed, an image is downloaded and uploaded to glance and networks are
+searched. With --incremental a provenance record is saved next to the
+output file. For every setup step it lists the options the step wrote and
+a fingerprint of the data the step was based on, i.e. the discovered data
+of the service, the arguments of the run and the configuration set before
+the step.
+
+The next incremental run still discovers the services, which is cheap
+thanks to the request cache, but a step whose fingerprint didn't change is
+skipped and its options are copied from the existing tempest.conf. Options
+referring to resources, f.e. compute.image_ref, are reused only if the
+resources still exist, which is checked by a GET of each of them, or by
+a look at the disk for local files, f.e. scenario.img_file.
+"""
+
+import hashlib
+import json
+import os
+
+from six.moves import configparser
+
+from tempest.lib import exceptions
+
+from config_tempest import constants as C
+from config_tempest.constants import LOG
+from config_tempest import utils
+
+RECORD_VERSION = 1
+
+
+def get_record_path(out_path):
+    return out_path + '.provenance.json'
+
+
+def get_fingerprint(data):
+    """Return a hash of JSON serializable data.
+
+    :rtype: string
+    """
+    data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def get_conf_items(conf):
+    """Return all options of a configuration as a dict.
+
+    :type conf: TempestConf object
+    :return: {section: {key: value}}
+    :rtype: dict
+    """
+    return {section: dict(conf.items(section, raw=True))
+            for section in conf.sections()}
+
+
+class Record(object):
+    """Options written by the setup steps and fingerprints of their inputs.
+    """
+
+    def __init__(self, steps=None):
+        # {step: {'fingerprint': string, 'options': [[section, key]]}}
+        self.steps = steps or {}
+
+    @classmethod
+    def load(cls, path):
+        """Load a record, an empty one if it can't be read."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            LOG.info("Provenance record %s can't be read (%s), "
+                     "regenerating everything", path, e)
+            return cls()
+        if data.get('version') != RECORD_VERSION:
+            LOG.info("Provenance record %s has an unsupported version, "
+                     "regenerating everything", path)
+            return cls()
+        return cls(data.get('steps', {}))
+
+    def save(self, path):
+        utils.write_atomic(path, json.dumps(
+            {'version': RECORD_VERSION, 'steps': self.steps}, indent=2,
+            sort_keys=True))
+
+    def get_options(self, step, fingerprint):
+        """Return options written by a step if its inputs didn't change.
+
+        :return: list of (section, key) or None if the step has to be run
+        :rtype: list or None
+        """
+        entry = self.steps.get(step)
+        if entry is None or entry.get('fingerprint') != fingerprint:
+            return None
+        return [tuple(option) for option in entry.get('options', [])]
+
+    def add(self, step, fingerprint, options):
+        self.steps[step] = {'fingerprint': fingerprint,
+                            'options': sorted([list(o) for o in options])}
+
+
+class Regeneration(object):
+    """Runs setup steps, skipping those whose inputs didn't change."""
+
+    def __init__(self, out_path, enabled=False):
+        """Init method of Regeneration.
+
+        :param out_path: path of the generated tempest.conf
+        :type out_path: string
+        :param enabled: if False, all steps are run and no record is saved
+        :type enabled: bool
+        """
+        self.out_path = out_path
+        self.enabled = enabled
+        self.record = Record()
+        self.previous = Record()
+        self.previous_conf = configparser.RawConfigParser()
+        # preserve case of the options like TempestConf does
+        self.previous_conf.optionxform = str
+        if enabled and os.path.isfile(out_path):
+            self.previous = Record.load(get_record_path(out_path))
+            self.previous_conf.read(out_path)
+
+    def _resources_exist(self, step, options, checks):
+        """Return True if resources the reused options refer to exist.
+
+        :param options: (section, key) of the options to reuse
+        :param checks: {(section, key): callable getting the value of the
+                       option, returning False or raising NotFound if the
+                       resource doesn't exist}
+        :type checks: dict
+        """
+        for option, check in checks.items():
+            if option not in options:
+                continue
+            value = self.previous_conf.get(*option)
+            if not value:
+                continue
+            try:
+                exists = check(value) is not False
+            except exceptions.NotFound:
+                exists = False
+            if not exists:
+                LOG.info("%s.%s = %s doesn't exist anymore, running '%s' "
+                         "again", option[0], option[1], value, step)
+                return False
+        return True
+
+    def run(self, conf, step, data, setup, checks=None):
+        """Run a setup step or reuse its options from the previous run.
+
+        :param conf: configuration the step writes to
+        :type conf: TempestConf object
+        :param step: name of the step
+        :type step: string
+        :param data: JSON serializable inputs of the step, if they didn't
+                     change since the previous run, the step is skipped
+        :param setup: callable without arguments performing the step
+        :param checks: options referring to resources, see
+                       _resources_exist, the step is run if any of the
+                       resources doesn't exist anymore
+        :type checks: dict or None
+        """
+        fingerprint = get_fingerprint(data)
+        options = None
+        if self.enabled:
+            options = self.previous.get_options(step, fingerprint)
+        if options is not None and all(
+                self.previous_conf.has_option(*o) for o in options) and \
+                self._resources_exist(step, options, checks or {}):
+            LOG.info("Inputs of '%s' didn't change since the last run, "
+                     "reusing its options", step)
+            # keep the order of the options in the existing file
+            order = [(section, key)
+                     for section in self.previous_conf.sections()
+                     for key in self.previous_conf.options(section)]
+            for section, key in sorted(options, key=order.index):
+                conf.set(section, key, self.previous_conf.get(section, key),
+                         layer=C.SOURCE_PREVIOUS_RUN)
+        else:
+            with conf.collect_keys() as options:
+                setup()
+        self.record.add(step, fingerprint, options)
+
+    def save(self):
+        if self.enabled:
+            path = get_record_path(self.out_path)
+            LOG.info("Saving provenance record %s", os.path.abspath(path))
+            self.record.save(path)
@@ -45,12 +45,19 @@ from oslo_config import cfg
 from six.moves import configparser
 
 from config_tempest import accounts
+from config_tempest import async_http
+from config_tempest import cassette
 from config_tempest.clients import ClientManager
 from config_tempest import constants as C
 from config_tempest.constants import LOG
 from config_tempest.credentials import Credentials
 from config_tempest.flavors import Flavors
+from config_tempest import incremental
+from config_tempest import pipeline
 from config_tempest import profile
+from config_tempest import request_cache
+from config_tempest import resilience
+from config_tempest import schema
 from config_tempest.services.services import Services
 from config_tempest.tempest_conf import TempestConf
 from config_tempest.users import Users
@@ -169,49 +176,55 @@ def set_options(conf, deployer_input, non_admin, image_path, overrides=[],
     :param cloud_creds: Cloud credentials from client's config
     :type cloud_creds: dict
     """
-    load_basic_defaults(conf)
+    defaults = conf.with_source(C.SOURCE_DEFAULT)
+    load_basic_defaults(defaults)
     # image.image_path is a python-tempestconf option which defines which
     # image will be uploaded to glance
-    conf.set('image', 'image_path', image_path)
+    defaults.set('image', 'image_path', image_path)
 
+    deployer = conf.with_source(C.SOURCE_DEPLOYER_INPUT)
     if deployer_input and os.path.isfile(deployer_input):
         LOG.info("Reading deployer input from file {}".format(
             deployer_input))
-        read_deployer_input(deployer_input, conf)
+        read_deployer_input(deployer_input, deployer)
     elif os.path.isfile(C.DEPLOYER_INPUT) and not no_default_deployer:
         LOG.info("Reading deployer input from file {}".format(
             C.DEPLOYER_INPUT))
-        read_deployer_input(C.DEPLOYER_INPUT, conf)
+        read_deployer_input(C.DEPLOYER_INPUT, deployer)
 
+    overriden = conf.with_source(C.SOURCE_OVERRIDE)
     if non_admin:
         # non admin, so delete auth admin values which were set
         # in load_basic_defaults method
-        conf.set("auth", "admin_username", "")
-        conf.set("auth", "admin_project_name", "")
-        conf.set("auth", "admin_password", "")
-        conf.set("auth", "use_dynamic_credentials", "False", priority=True)
+        overriden.set("auth", "admin_username", "")
+        overriden.set("auth", "admin_project_name", "")
+        overriden.set("auth", "admin_password", "")
+        overriden.set("auth", "use_dynamic_credentials", "False",
+                      priority=True)
 
     # get and set auth data from client's config
     if cloud_creds:
-        set_cloud_config_values(non_admin, cloud_creds, conf)
+        set_cloud_config_values(non_admin, cloud_creds,
+                                conf.with_source(C.SOURCE_CLOUD_CONFIG))
 
     if accounts_path:
         # new way for running using accounts file
-        conf.set("auth", "use_dynamic_credentials", "False", priority=True)
-        conf.set("auth", "test_accounts_file",
-                 os.path.abspath(accounts_path))
+        overriden.set("auth", "use_dynamic_credentials", "False",
+                      priority=True)
+        overriden.set("auth", "test_accounts_file",
+                      os.path.abspath(accounts_path))
 
     # set overrides - values specified in CLI
     for section, key, value in overrides:
-        conf.set(section, key, value, priority=True)
+        overriden.set(section, key, value, priority=True)
 
     uri = conf.get("identity", "uri")
     if "v3" in uri:
-        conf.set("identity", "auth_version", "v3")
-        conf.set("identity", "uri_v3", uri)
+        defaults.set("identity", "auth_version", "v3")
+        defaults.set("identity", "uri_v3", uri)
     else:
         # TODO(arxcruz) make a check if v3 is enabled
-        conf.set("identity", "uri_v3", uri.replace("v2.0", "v3"))
+        defaults.set("identity", "uri_v3", uri.replace("v2.0", "v3"))
 
 
 def get_arg_parser():
@@ -227,6 +240,47 @@ def get_arg_parser():
                         help="""Output file
                                 A name of the file where the discovered Tempest
                                 configuration will be written to.""")
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        help="""Regenerate the output file incrementally
+                                A provenance record of the resources set up
+                                by the run (flavors, images and networks) is
+                                saved next to the output file. If the output
+                                file and the record exist already, resources
+                                of the services whose discovered data and
+                                inputs didn't change are not set up again,
+                                their options are copied from the existing
+                                output file.""")
+    parser.add_argument('--diff', action='store_true', default=False,
+                        help="""Print a unified diff of the output file
+                                against its previous content to the standard
+                                output. The output file is rewritten only
+                                if its content changes.""")
+    parser.add_argument('--options-cache', default=None, metavar='DIR',
+                        help="""Directory where options known by tempest
+                                and its plugins are cached, so that the
+                                following runs don't have to read them from
+                                tempest. The cache is specific to the
+                                installed versions of tempest and the
+                                plugins.
+                                For example:
+                                  --options-cache $HOME/.cache/tempestconf
+                             """)
+    parser.add_argument('--skip-validation', action='store_true',
+                        default=False,
+                        help="""Don't validate the options against the
+                                options known by tempest and its plugins
+                                before the output file is written. By
+                                default an option given by the user (by
+                                overrides, --append, a deployer input or a
+                                cloud config) whose value has a wrong type
+                                or isn't one of the allowed values, or
+                                which tempest doesn't know but is close to
+                                a known option of a section no plugin adds
+                                options to (a typo, f.e. compute.flavor_rf),
+                                makes the run fail. Other unknown options of
+                                the user, f.e. of plugins which aren't
+                                installed, and problems of discovered
+                                options are only logged as warnings.""")
     parser.add_argument('--deployer-input', default=None,
                         help="""Path to deployer file
                                 A file in the format of tempest.conf that will
@@ -342,6 +396,68 @@ def get_arg_parser():
                                   --remove identity.username=myname \\
                                   --remove feature-enabled.api_ext=http[,https]
                              """)
+    parser.add_argument('--record', default=None, metavar='PATH',
+                        help="""Record HTTP traffic to a cassette file
+                                All HTTP requests sent during the discovery
+                                and their responses will be saved to the
+                                specified file (gzipped if the path ends with
+                                .gz), so that the run can be replayed later
+                                by --replay argument.
+                                NOTE: The file contains the service catalog
+                                and all discovered data of the cloud!
+                                For example:
+                                  --record $HOME/mycloud.json.gz
+                             """)
+    parser.add_argument('--replay', default=None, metavar='PATH',
+                        help="""Replay HTTP traffic from a cassette file
+                                Responses recorded by --record argument are
+                                served from the specified file instead of
+                                querying the cloud, no network access is
+                                needed.
+                                For example:
+                                  --replay $HOME/mycloud.json.gz
+                             """)
+    parser.add_argument('--discovery-backend',
+                        default=C.DISCOVERY_BACKEND_SYNC,
+                        choices=C.DISCOVERY_BACKENDS,
+                        help="""Backend of the services discovery
+                                "sync" discovers the services one by one,
+                                "asyncio" discovers all of them concurrently
+                                in one event loop, it requires aiohttp
+                                library.""")
+    parser.add_argument('--swift-healthcheck-path', action='append',
+                        default=[], metavar='PATH',
+                        help="""Additional path of the healthcheck API of
+                                the object storage, f.e. for ceph RGW with
+                                a custom rgw_swift_url_prefix. 'healthcheck'
+                                and 'swift/healthcheck' paths are always
+                                checked. Can be used more times.
+                                For example:
+                                  --swift-healthcheck-path rgw/healthcheck
+                             """)
+    parser.add_argument('--stage-workers', type=int,
+                        default=C.DEFAULT_STAGE_WORKERS, metavar='N',
+                        help="""Maximum number of stages, f.e. creation of
+                                flavors, images and networks, running at the
+                                same time. Stages which depend on each other
+                                always run one by one, 1 runs all stages one
+                                by one.""")
+    parser.add_argument('--connect-timeout', type=float,
+                        default=resilience.DEFAULT_CONNECT_TIMEOUT,
+                        metavar='SECONDS',
+                        help="""Connect timeout of the discovery requests
+                                in seconds.""")
+    parser.add_argument('--read-timeout', type=float,
+                        default=resilience.DEFAULT_READ_TIMEOUT,
+                        metavar='SECONDS',
+                        help="""Read timeout of the discovery requests
+                                in seconds.""")
+    parser.add_argument('--retries', type=int,
+                        default=resilience.DEFAULT_RETRIES,
+                        help="""How many times a discovery request failing
+                                on a connection error, a timeout or a 5xx
+                                status code is retried. Services which
+                                keep failing are marked as unavailable.""")
     return parser
 
 
@@ -355,10 +471,29 @@ def parse_arguments():
     if args.test_accounts and args.create_accounts_file:
         raise Exception("Options '--test-accounts' and "
                         "'--create-accounts-file' can't be used together.")
+    if args.record and args.replay:
+        raise Exception("Options '--record' and '--replay' can't be used "
+                        "together.")
+    if args.discovery_backend == C.DISCOVERY_BACKEND_ASYNCIO:
+        if not async_http.is_available():
+            raise Exception("The asyncio discovery backend requires aiohttp "
+                            "library, install it by 'pip install "
+                            "python-tempestconf[asyncio]'.")
+        if args.record or args.replay:
+            raise Exception("Options '--record' and '--replay' can't be "
+                            "used with the asyncio discovery backend.")
     args.overrides = parse_overrides(args.overrides)
     return args
 
 
+def _merge_values(parsed, key_path, values):
+    """Merge values of a key given by more --remove arguments."""
+    if parsed.get(key_path) == []:
+        # all values of the key are removed already
+        return
+    parsed.setdefault(key_path, []).extend(values)
+
+
 def parse_values_to_remove(options):
     """Manual parsing of remove arguments.
 
@@ -376,7 +511,7 @@ def parse_values_to_remove(options):
                 raise Exception("Missing dot. The option --remove has to "
                                 "come in the format 'section.key=value[,value"
                                 "]', but got '%s'." % argument)
-            parsed[section] = values.split(',')
+            _merge_values(parsed, section, values.split(','))
         else:
             # missing equal sign, all values in section.key will be deleted
             parsed[argument] = []
@@ -403,7 +538,7 @@ def parse_values_to_append(options):
                                 "--append has to come in the format "
                                 "'section.key=value[, value]', but got "
                                 "'%s'" % values)
-            parsed[section] = values.split(',')
+            parsed.setdefault(section, []).extend(values.split(','))
         else:
             # missing equal sign, no values to add were specified, if a user
             # wants to just create a section, it can be done so via overrides
@@ -502,11 +637,171 @@ def get_cloud_creds(args_namespace):
     return cloud_creds
 
 
+def create_users(context):
+    users = Users(context.clients.projects, context.clients.roles,
+                  context.clients.users,
+                  context.services.get_conf('identity'))
+    users.create_tempest_users()
+
+
+def create_flavors(context):
+    options = context.options
+    services = context.services
+
+    def setup_flavors():
+        flavors = Flavors(context.clients.flavors,
+                          options.get('create', False),
+                          services.get_conf('compute'),
+                          options.get('flavor_min_mem', C.DEFAULT_FLAVOR_RAM),
+                          options.get('flavor_min_disk',
+                                      C.DEFAULT_FLAVOR_DISK),
+                          no_rng=options.get('no_rng', False))
+        flavors.create_tempest_flavors()
+    compute = services.get_service('compute')
+    context.regeneration.run(context.conf, 'flavors', [
+        compute.get_discovered_data(), context.conf_items,
+        options.get('create', False), options.get('flavor_min_mem'),
+        options.get('flavor_min_disk'), options.get('no_rng', False)],
+        setup_flavors, checks={
+            ('compute', 'flavor_ref'): context.clients.flavors.show_flavor,
+            ('compute', 'flavor_ref_alt'):
+                context.clients.flavors.show_flavor})
+
+
+def create_images(context):
+    options = context.options
+    services = context.services
+    image = services.get_service('image')
+    image.set_image_preferences(options.get('image_disk_format',
+                                            C.DEFAULT_IMAGE_FORMAT),
+                                options.get('non_admin', False),
+                                no_rng=options.get('no_rng', False),
+                                convert=options.get('convert_to_raw', False))
+    context.regeneration.run(context.conf, 'images', [
+        image.get_discovered_data(), context.conf_items,
+        options.get('image_disk_format'), options.get('non_admin', False),
+        options.get('no_rng', False), options.get('convert_to_raw', False)],
+        lambda: image.create_tempest_images(services.get_conf('image')),
+        checks={
+            ('compute', 'image_ref'): context.clients.images.show_image,
+            ('compute', 'image_ref_alt'): context.clients.images.show_image,
+            # the image file tempest scenarios upload, it's downloaded
+            # again when the step runs
+            ('scenario', 'img_file'): lambda img_file: os.path.isfile(
+                os.path.join(context.conf.get('scenario', 'img_dir'),
+                             img_file))})
+
+
+def create_networks(context):
+    services = context.services
+    network = services.get_service('network')
+    context.regeneration.run(context.conf, 'networks', [
+        network.get_discovered_data(), context.conf_items,
+        context.options.get('network_id')],
+        lambda: network.create_tempest_networks(
+            services.get_conf('network'), context.options.get('network_id')),
+        checks={('network', 'public_network_id'): lambda network_id:
+                context.clients.get_neutron_client().show_network(network_id)})
+
+
+def create_accounts_file(context):
+    LOG.info("Creating an accounts.yaml file in: %s", context.accounts_path)
+    accounts.create_accounts_file(context.options.get('create', False),
+                                  context.accounts_path, context.conf)
+
+
+def get_stages(context):
+    """Return the stages of a run, see config_tempest.pipeline.
+
+    :type context: pipeline.Context
+    :rtype: list of pipeline.Stage objects
+    """
+    options = context.options
+    services = context.services
+    stages = []
+    if options.get('create', False) and options.get('test_accounts') is None:
+        stages.append(pipeline.Stage(
+            'users', create_users, reads=['identity', 'auth'],
+            writes=['auth.tempest_roles'],
+            clients=['projects', 'roles', 'users']))
+    stages.append(pipeline.Stage(
+        'horizon', lambda c: c.services.configure_horizon(),
+        reads=['identity.uri'],
+        writes=['service_available.horizon', 'dashboard']))
+    # only discovered services, unreachable ones were marked unavailable
+    if services.get_service('compute') is not None:
+        stages.append(pipeline.Stage(
+            'flavors', create_flavors,
+            reads=['compute.flavor_ref', 'compute.flavor_ref_alt'],
+            writes=['compute.flavor_ref', 'compute.flavor_ref_alt',
+                    'volume.volume_size'],
+            clients=['flavors']))
+    if services.get_service('image') is not None:
+        stages.append(pipeline.Stage(
+            'images', create_images,
+            reads=['image', 'scenario.img_dir', 'compute.image_ref',
+                   'compute.image_ref_alt'],
+            writes=['image.http_image', 'validation.image_ssh_user',
+                    'scenario.img_file', 'compute.image_ref',
+                    'compute.image_ref_alt'],
+            clients=['images']))
+    if services.get_service('network') is not None:
+        stages.append(pipeline.Stage(
+            'networks', create_networks, reads=['network'],
+            writes=['network',
+                    'network-feature-enabled.port_security',
+                    'network-feature-enabled.floating_ips'],
+            clients=['networks']))
+    stages.append(pipeline.Stage(
+        'capabilities', lambda c: c.services.discover_capabilities(),
+        writes=['volume.backend_names', 'volume-feature-enabled.multi_backend',
+                'volume-feature-enabled.replication',
+                'compute-feature-enabled.volume_multiattach', 'share']))
+    stages += [
+        # services may read and set anything
+        pipeline.Stage('post_configuration',
+                       lambda c: c.services.post_configure_services(),
+                       reads=['*'], writes=['*']),
+        pipeline.Stage('api_versions',
+                       lambda c: c.services.set_supported_api_versions(),
+                       writes=['*-feature-enabled.api_v*']),
+        pipeline.Stage('extensions',
+                       lambda c: c.services.set_service_extensions(),
+                       reads=['identity-feature-enabled.api_v3'],
+                       writes=['*-feature-enabled.api_extensions'],
+                       clients=['identity']),
+    ]
+    stages += pipeline.load_plugin_stages(context)
+    creating_accounts = options.get('test_accounts') is None
+    if context.accounts_path is not None and creating_accounts:
+        stages.append(pipeline.Stage(
+            'accounts', create_accounts_file, reads=['identity', 'auth']))
+    return stages
+
+
 def config_tempest(**kwargs):
+    set_logging(kwargs.get('debug', False), kwargs.get('verbose', False))
+    policy = resilience.RetryPolicy(
+        connect_timeout=kwargs.get('connect_timeout',
+                                   resilience.DEFAULT_CONNECT_TIMEOUT),
+        read_timeout=kwargs.get('read_timeout',
+                                resilience.DEFAULT_READ_TIMEOUT),
+        retries=kwargs.get('retries', resilience.DEFAULT_RETRIES),
+        # every stage running at once may send requests
+        pool_maxsize=max(kwargs.get('stage_workers', C.DEFAULT_STAGE_WORKERS),
+                         resilience.DEFAULT_POOL_MAXSIZE))
+    with cassette.use(record=kwargs.get('record'),
+                      replay=kwargs.get('replay')):
+        with request_cache.use(), resilience.use(policy):
+            _config_tempest(**kwargs)
+
+
+def _config_tempest(**kwargs):
+    if kwargs.get('options_cache'):
+        schema.use_cache(kwargs.get('options_cache'))
     # convert a list of remove values to a dict
     remove = parse_values_to_remove(kwargs.get('remove', []))
     add = parse_values_to_append(kwargs.get('append', []))
-    set_logging(kwargs.get('debug', False), kwargs.get('verbose', False))
 
     accounts_path = kwargs.get('test_accounts')
     if kwargs.get('create_accounts_file') is not None:
@@ -521,52 +816,32 @@ def config_tempest(**kwargs):
 
     credentials = Credentials(conf, not kwargs.get('non_admin', False))
     clients = ClientManager(conf, credentials)
-    services = Services(clients, conf, credentials)
-
-    if kwargs.get('create', False) and kwargs.get('test_accounts') is None:
-        users = Users(clients.projects, clients.roles, clients.users, conf)
-        users.create_tempest_users()
-
-    if services.is_service(**{"type": "compute"}):
-        flavors = Flavors(clients.flavors, kwargs.get('create', False), conf,
-                          kwargs.get('flavor_min_mem', C.DEFAULT_FLAVOR_RAM),
-                          kwargs.get('flavor_min_disk', C.DEFAULT_FLAVOR_DISK),
-                          no_rng=kwargs.get('no_rng', False))
-        flavors.create_tempest_flavors()
+    services = Services(clients, conf, credentials,
+                        kwargs.get('discovery_backend',
+                                   C.DISCOVERY_BACKEND_SYNC),
+                        kwargs.get('swift_healthcheck_paths', []))
 
-    if services.is_service(**{"type": "image"}):
-        image = services.get_service('image')
-        image.set_image_preferences(kwargs.get('image_disk_format',
-                                               C.DEFAULT_IMAGE_FORMAT),
-                                    kwargs.get('non_admin', False),
-                                    no_rng=kwargs.get('no_rng', False),
-                                    convert=kwargs.get('convert_to_raw',
-                                                       False))
-        image.create_tempest_images(conf)
-
-    if services.is_service(**{"type": "network"}):
-        network = services.get_service("network")
-        network.create_tempest_networks(conf, kwargs.get('network_id'))
-
-    services.post_configuration()
-    services.set_supported_api_versions()
-    services.set_service_extensions()
-
-    if accounts_path is not None and kwargs.get('test_accounts') is None:
-        LOG.info("Creating an accounts.yaml file in: %s", accounts_path)
-        accounts.create_accounts_file(kwargs.get('create', False),
-                                      accounts_path,
-                                      conf)
-
-    # remove all unwanted values if were specified
+    out_path = kwargs.get('out', 'etc/tempest.conf')
+    context = pipeline.Context(
+        conf=conf, clients=clients, credentials=credentials,
+        services=services, options=kwargs, accounts_path=accounts_path,
+        regeneration=incremental.Regeneration(
+            out_path, kwargs.get('incremental', False)),
+        # options set so far are inputs of all setup steps
+        conf_items=incremental.get_conf_items(conf))
+    pipeline.Pipeline(get_stages(context)).run(
+        context, kwargs.get('stage_workers', C.DEFAULT_STAGE_WORKERS))
+
+    # remove all unwanted values and add the wanted ones if were specified
     if remove != {}:
         LOG.info("Removing configuration: %s", str(remove))
-        conf.remove_values(remove)
     if add != {}:
         LOG.info("Adding configuration: %s", str(add))
-        conf.append_values(add)
-    out_path = kwargs.get('out', 'etc/tempest.conf')
-    conf.write(out_path)
+    conf.update_values(remove, add, C.SOURCE_OVERRIDE)
+    if not kwargs.get('skip_validation', False):
+        schema.check(conf)
+    conf.write(out_path, kwargs.get('diff', False))
+    context.regeneration.save()
 
 
 def main():
@@ -585,22 +860,34 @@ def main():
     config_tempest(
         append=args.append,
         cloud_creds=cloud_creds,
+        connect_timeout=args.connect_timeout,
         convert_to_raw=args.convert_to_raw,
         create=args.create,
         create_accounts_file=args.create_accounts_file,
         debug=args.debug,
         deployer_input=args.deployer_input,
+        diff=args.diff,
+        discovery_backend=args.discovery_backend,
         flavor_min_mem=args.flavor_min_mem,
         flavor_min_disk=args.flavor_min_disk,
         image_disk_format=args.image_disk_format,
         image_path=args.image,
+        incremental=args.incremental,
         network_id=args.network_id,
         non_admin=args.non_admin,
         no_rng=args.no_rng,
         os_cloud=args.os_cloud,
+        options_cache=args.options_cache,
         out=args.out,
         overrides=args.overrides,
+        record=args.record,
         remove=args.remove,
+        read_timeout=args.read_timeout,
+        replay=args.replay,
+        retries=args.retries,
+        skip_validation=args.skip_validation,
+        stage_workers=args.stage_workers,
+        swift_healthcheck_paths=args.swift_healthcheck_path,
         test_accounts=args.test_accounts,
         verbose=args.verbose
     )
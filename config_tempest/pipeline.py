@@ -0,0 +1,239 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Stages of a run and their scheduling.
+
+After the services are discovered, a run consists of stages, f.e. creation
+of users, flavors, images and networks, post configuration of the services
+and writing of the output file. Every stage declares the options it reads
+and writes and the clients it uses. A stage depends on an earlier stage if
+one of them writes an option the other one reads or writes, or if they use
+the same client. Stages which don't depend on each other run at the same
+time.
+
+Options set by the stages are written in the same order as if the stages
+ran one by one in the order they were declared in, so that the output file
+is the same however the stages were scheduled.
+
+Tempest plugins or other packages can add their stages by an entry point in
+the tempestconf.stages group. The entry point is a callable which gets the
+Context of the run and returns a list of Stage objects, they're run after
+the discovery stages of tempestconf and before the values given by
+--remove and --append are applied.
+"""
+
+from concurrent import futures
+import fnmatch
+
+from config_tempest.constants import LOG
+from config_tempest.tempest_conf import ListValue
+from config_tempest import utils
+
+STAGES_ENTRY_POINT = 'tempestconf.stages'
+
+
+class Context(object):
+    """Objects shared by the stages of a run.
+
+    The attributes are given as keyword arguments, f.e. conf, clients,
+    services and options, the arguments of the run.
+    """
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _split(resource):
+    section, _, key = resource.partition('.')
+    return section, key or '*'
+
+
+def _match(pattern1, pattern2):
+    if '*' in pattern1 and '*' in pattern2:
+        # two wildcards may match the same name, f.e. a* and *b
+        return True
+    return any(fnmatch.fnmatchcase(name, pattern) for name, pattern
+               in ((pattern1, pattern2), (pattern2, pattern1)))
+
+
+def overlap(resources1, resources2):
+    """Return True if two lists of options may share an option.
+
+    :param resources1: options in the form of 'section.key', 'section'
+        stands for all options of the section, shell wildcards can be used
+    :type resources1: iterable
+    :type resources2: iterable
+    :rtype: bool
+    """
+    for resource1 in resources1:
+        section1, key1 = _split(resource1)
+        for resource2 in resources2:
+            section2, key2 = _split(resource2)
+            if _match(section1, section2) and _match(key1, key2):
+                return True
+    return False
+
+
+class Stage(object):
+    """A step of a run."""
+
+    def __init__(self, name, run, reads=(), writes=(), clients=()):
+        """Init method of Stage.
+
+        :param name: unique name of the stage
+        :type name: string
+        :param run: callable performing the stage, it gets the Context
+        :param reads: options the stage reads, see overlap, '*' for all
+        :type reads: iterable
+        :param writes: options the stage sets, see overlap
+        :type writes: iterable
+        :param clients: names of the clients the stage uses
+        :type clients: iterable
+        """
+        self.name = name
+        self.run = run
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+        self.clients = frozenset(clients)
+
+    def depends_on(self, other):
+        """Return True if the stage can't run at the same time as other.
+
+        :type other: Stage
+        :rtype: bool
+        """
+        if self.clients & other.clients:
+            return True
+        if overlap(other.writes, self.reads + self.writes):
+            return True
+        return overlap(other.reads, self.writes)
+
+    def __repr__(self):
+        return "Stage(%r)" % self.name
+
+
+def load_plugin_stages(context):
+    """Return stages added by entry points of installed packages.
+
+    :type context: Context
+    :rtype: list of Stage objects
+    """
+    stages = []
+    for ep in utils.get_entry_points(STAGES_ENTRY_POINT):
+        try:
+            get_stages = ep.load()
+        except Exception as e:
+            LOG.warning("Can't load stages of %s: %s", ep.name, e)
+            continue
+        stages += get_stages(context) or []
+    return stages
+
+
+class Pipeline(object):
+    """Stages of a run in the order they were declared in."""
+
+    def __init__(self, stages=()):
+        self.stages = []
+        for stage in stages:
+            self.add(stage)
+
+    def add(self, stage, before=None):
+        """Add a stage at the end or before another one.
+
+        :type stage: Stage
+        :param before: name of a stage
+        :type before: string or None
+        :raises ValueError: if the stage name isn't unique or the stage
+            to add before doesn't exist
+        """
+        names = [s.name for s in self.stages]
+        if stage.name in names:
+            raise ValueError("Stage '%s' is already added" % stage.name)
+        if before is None:
+            self.stages.append(stage)
+        elif before in names:
+            self.stages.insert(names.index(before), stage)
+        else:
+            raise ValueError("Stage '%s' doesn't exist" % before)
+
+    def get_dependencies(self):
+        """Return earlier stages every stage has to wait for.
+
+        :return: {name: [names of stages]}
+        :rtype: dict
+        """
+        return {stage.name: [other.name for other in self.stages[:i]
+                             if stage.depends_on(other)]
+                for i, stage in enumerate(self.stages)}
+
+    @staticmethod
+    def _run_stage(stage, context, keys):
+        LOG.info("Running stage '%s'", stage.name)
+        with context.conf.collect_keys(keys):
+            stage.run(context)
+
+    def run(self, context, workers=1):
+        """Run the stages, independent ones at the same time.
+
+        If a stage fails, no more stages are started and the error of the
+        first failed stage is raised when the running ones finish.
+
+        :param context: context of the run, its conf attribute is the
+            TempestConf object the stages set options to
+        :type context: Context
+        :param workers: maximum of stages running at the same time, 1 runs
+            the stages one by one in the order they were declared in
+        :type workers: int
+        """
+        conf = context.conf
+        dependencies = self.get_dependencies()
+        workers = max(workers, 1)
+        old_keys = set(conf.get_keys())
+        old_sections = set(conf.sections())
+        keys = dict((stage.name, ListValue()) for stage in self.stages)
+        pending = list(self.stages)
+        running = {}
+        done = set()
+        errors = {}
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for stage in list(pending):
+                    if errors or len(running) >= workers:
+                        break
+                    if all(d in done for d in dependencies[stage.name]):
+                        pending.remove(stage)
+                        future = executor.submit(self._run_stage, stage,
+                                                 context, keys[stage.name])
+                        running[future] = stage
+                if not running:
+                    break
+                finished, _ = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    try:
+                        future.result()
+                        done.add(stage.name)
+                    except Exception as e:
+                        errors[stage.name] = e
+        for stage in self.stages:
+            if stage.name in errors:
+                raise errors[stage.name]
+        # order of the options as if the stages ran one by one
+        new_keys = ListValue()
+        for stage in self.stages:
+            new_keys.update(k for k in keys[stage.name] if k not in old_keys)
+        conf.reorder(ListValue(s for s, _ in new_keys
+                               if s not in old_sections), new_keys)
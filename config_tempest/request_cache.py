@@ -0,0 +1,128 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Per-run cache of the GET requests sent during the discovery.
+
+Several services query the same urls, e.g. volumev2 and volumev3 both read
+versions from the same unversioned root of cinder. While a cache is in use,
+identical GET requests are sent only once, the following ones get the
+memoized response. Identical requests sent concurrently from more threads
+are coalesced, only one of them reaches the server and the others wait for
+its response.
+
+The cache is meant to live for one run of python-tempestconf only, the cloud
+isn't expected to change in the meantime.
+"""
+
+import contextlib
+import threading
+
+from config_tempest.constants import LOG
+
+_active = None
+
+
+class RequestCache(object):
+
+    def __init__(self):
+        self._responses = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(url, headers=None):
+        """Return the key of a GET request.
+
+        :param url: url of the request
+        :type url: string
+        :param headers: headers of the request
+        :type headers: dict or None
+        :rtype: tuple
+        """
+        return (url, tuple(sorted((headers or {}).items())))
+
+    def get(self, url, headers, fetch):
+        """Return the response of a GET request.
+
+        :param url: url of the request
+        :type url: string
+        :param headers: headers of the request, part of the key, as the
+                        response may differ e.g. based on the Accept header
+        :type headers: dict or None
+        :param fetch: callable without arguments sending the request, its
+                      return value is memoized, exceptions are not
+        :return: return value of fetch
+        """
+        key = self.get_key(url, headers)
+        while True:
+            with self._lock:
+                if key in self._responses:
+                    self.hits += 1
+                    LOG.debug("Using cached response of GET %s", url)
+                    return self._responses[key]
+                event = self._in_flight.get(key)
+                if event is None:
+                    # nobody is sending the request, it's our job
+                    event = threading.Event()
+                    self._in_flight[key] = event
+                    self.misses += 1
+                    break
+            # the same request is being sent from another thread, wait for
+            # it and check the cache again, if it failed, try it ourselves
+            event.wait()
+        try:
+            response = fetch()
+            with self._lock:
+                self._responses[key] = response
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def clear(self):
+        with self._lock:
+            self._responses.clear()
+
+
+def get(url, headers, fetch):
+    """Send a GET request through the cache in use, if any.
+
+    See RequestCache.get for the description of the arguments.
+    """
+    cache = _active
+    if cache is None:
+        return fetch()
+    return cache.get(url, headers, fetch)
+
+
+@contextlib.contextmanager
+def use(cache=None):
+    """Context manager making GET requests go through a cache.
+
+    :param cache: cache to use, a new one is created if not given
+    :type cache: RequestCache or None
+    """
+    global _active
+    previous = _active
+    _active = cache if cache is not None else RequestCache()
+    try:
+        yield _active
+    finally:
+        LOG.debug("Request cache: %d requests sent, %d served from cache",
+                  _active.misses, _active.hits)
+        _active = previous
@@ -0,0 +1,332 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Timeouts, retries and circuit breaking of the discovery requests.
+
+A request is sent with connect and read timeouts. When it fails on
+a connection error, a timeout or with a 5xx status code, it's retried with
+a jittered exponential backoff. When all the attempts fail, the request
+raises EndpointUnavailable and it's counted as one failure of the endpoint,
+i.e. the scheme, the host and the first segment of the path of the url,
+since many deployments serve all the APIs from one host and tell them apart
+by the path. Once an endpoint fails failure_threshold requests in a row,
+its circuit opens and following requests to it fail immediately with
+EndpointUnavailable, so that a dead endpoint doesn't stall the whole
+discovery.
+
+Requests of the asyncio discovery backend follow the same policy, see
+async_request.
+"""
+
+import asyncio
+import contextlib
+import random
+import threading
+import time
+
+import urllib3
+
+from config_tempest.constants import LOG
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 60.0
+# connections kept open per host, the discovery sends requests from several
+# threads at once, f.e. of the pipeline stages or of first_success
+DEFAULT_POOL_MAXSIZE = 10
+# redirects urllib3 follows within one attempt, f.e. of /identity to
+# /identity/, the default of urllib3
+MAX_REDIRECTS = 5
+
+_active = None
+
+
+class EndpointUnavailable(Exception):
+    pass
+
+
+def get_endpoint(url):
+    """Return the endpoint a url belongs to.
+
+    F.e. http://host/compute for http://host/compute/v2.1/flavors and
+    http://host:8774/v2.1 for http://host:8774/v2.1/flavors.
+
+    :type url: string
+    :rtype: string
+    """
+    u = urllib3.util.parse_url(url)
+    segment = (u.path or '').lstrip('/').split('/', 1)[0]
+    return '%s://%s/%s' % (u.scheme, u.netloc, segment)
+
+
+class CircuitBreaker(object):
+    """Per endpoint circuit breaker.
+
+    The circuit of an endpoint opens after failure_threshold consecutive
+    failures. After reset_timeout seconds one request is let through again,
+    if it succeeds, the circuit closes, otherwise it stays open.
+    """
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened = {}
+        self._lock = threading.Lock()
+
+    def allow(self, endpoint):
+        """Return True if a request to the endpoint may be sent."""
+        with self._lock:
+            opened = self._opened.get(endpoint)
+            if opened is None:
+                return True
+            if time.time() - opened >= self.reset_timeout:
+                # half open, let one request through
+                self._opened[endpoint] = time.time()
+                return True
+            return False
+
+    def success(self, endpoint):
+        with self._lock:
+            self._failures.pop(endpoint, None)
+            self._opened.pop(endpoint, None)
+
+    def failure(self, endpoint):
+        with self._lock:
+            failures = self._failures.get(endpoint, 0) + 1
+            self._failures[endpoint] = failures
+            if failures >= self.failure_threshold:
+                if endpoint not in self._opened:
+                    LOG.warning("Endpoint %s failed %d requests in a row, "
+                                "further requests to it will be skipped",
+                                endpoint, failures)
+                self._opened[endpoint] = time.time()
+
+
+class RetryPolicy(object):
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, retries=DEFAULT_RETRIES,
+                 backoff=DEFAULT_BACKOFF,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE):
+        """Init method of RetryPolicy.
+
+        :param connect_timeout: connect timeout of a request in seconds
+        :type connect_timeout: float
+        :param read_timeout: read timeout of a request in seconds
+        :type read_timeout: float
+        :param retries: how many times a failed request is retried
+        :type retries: int
+        :param backoff: base of the delay between retries in seconds, the
+                        delay of n-th retry is random up to backoff * 2^n
+        :type backoff: float
+        :param failure_threshold: consecutive failed requests opening the
+                                  circuit of an endpoint
+        :type failure_threshold: int
+        :param reset_timeout: seconds after which an open circuit lets
+                              a request through again
+        :type reset_timeout: float
+        :param pool_maxsize: connections kept open per host, at least the
+                             number of threads sending requests at once,
+                             otherwise connections are discarded instead of
+                             reused
+        :type pool_maxsize: int
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.pool_maxsize = pool_maxsize
+        self._pool_managers = {}
+        self._lock = threading.Lock()
+
+    def get_pool_manager(self, disable_ssl_validation=False):
+        """Return a pool manager shared by all requests of the policy.
+
+        Connections to the same host are reused by the following requests
+        instead of opening a new connection for each of them.
+        """
+        with self._lock:
+            if disable_ssl_validation not in self._pool_managers:
+                self._pool_managers[disable_ssl_validation] = \
+                    new_pool_manager(disable_ssl_validation,
+                                     self.pool_maxsize)
+            return self._pool_managers[disable_ssl_validation]
+
+    @property
+    def timeout(self):
+        return urllib3.Timeout(connect=self.connect_timeout,
+                               read=self.read_timeout)
+
+    def get_delay(self, attempt):
+        """Return the delay before the retry after the given attempt."""
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def _allow(self, url):
+        """Return the endpoint of the url if its circuit is closed.
+
+        :raises EndpointUnavailable: if the circuit is open
+        """
+        endpoint = get_endpoint(url)
+        if not self.breaker.allow(endpoint):
+            raise EndpointUnavailable(
+                "Skipping request to '%s', endpoint %s keeps failing"
+                % (url, endpoint))
+        return endpoint
+
+    def _get_retry_delay(self, attempt, url, error):
+        """Return the delay before the next attempt or None if it's last."""
+        if attempt >= self.retries:
+            return None
+        delay = self.get_delay(attempt)
+        LOG.warning("Request to '%s' failed (%s), retrying in %.1f seconds",
+                    url, error, delay)
+        return delay
+
+    @property
+    def urllib3_retries(self):
+        """Retries of urllib3 following redirects only.
+
+        Failed attempts are retried by the policy, not by urllib3.
+        """
+        return urllib3.Retry(total=None, connect=0, read=0, status=0,
+                             other=0, redirect=MAX_REDIRECTS)
+
+    def request(self, http, method, url, **kwargs):
+        """Send a request through a urllib3 pool manager.
+
+        :param http: pool manager sending the request
+        :type http: urllib3.PoolManager
+        :rtype: urllib3.HTTPResponse
+        :raises EndpointUnavailable: if the circuit of the endpoint is open
+            or all the attempts failed on an error or with 5xx
+        """
+        endpoint = self._allow(url)
+        for attempt in range(self.retries + 1):
+            try:
+                r = http.request(method, url, timeout=self.timeout,
+                                 retries=self.urllib3_retries, **kwargs)
+            except urllib3.exceptions.HTTPError as e:
+                error = e
+            else:
+                if r.status < 500:
+                    self.breaker.success(endpoint)
+                    return r
+                error = 'status %d' % r.status
+            delay = self._get_retry_delay(attempt, url, error)
+            if delay is not None:
+                time.sleep(delay)
+        self.breaker.failure(endpoint)
+        raise EndpointUnavailable("Request to '%s' failed: %s"
+                                  % (url, error))
+
+    async def async_request(self, send, url, errors=()):
+        """Async counterpart of request.
+
+        Timeouts of the requests are up to the sender.
+
+        :param send: coroutine function sending the request once, it
+            returns a tuple of the status code and the body
+        :param errors: exceptions send raises when the request fails
+        :type errors: tuple
+        :rtype: tuple (int, bytes)
+        :raises EndpointUnavailable: see request
+        """
+        endpoint = self._allow(url)
+        for attempt in range(self.retries + 1):
+            try:
+                status, data = await send()
+            except errors as e:
+                error = e
+            else:
+                if status < 500:
+                    self.breaker.success(endpoint)
+                    return status, data
+                error = 'status %d' % status
+            delay = self._get_retry_delay(attempt, url, error)
+            if delay is not None:
+                await asyncio.sleep(delay)
+        self.breaker.failure(endpoint)
+        raise EndpointUnavailable("Request to '%s' failed: %s"
+                                  % (url, error))
+
+
+def new_pool_manager(disable_ssl_validation=False,
+                     maxsize=DEFAULT_POOL_MAXSIZE):
+    if disable_ssl_validation:
+        urllib3.disable_warnings()
+        return urllib3.PoolManager(cert_reqs='CERT_NONE', maxsize=maxsize)
+    return urllib3.PoolManager(maxsize=maxsize)
+
+
+def get_pool_manager(disable_ssl_validation=False):
+    """Return the pool manager of the policy in use or a new one."""
+    policy = _active
+    if policy is None:
+        return new_pool_manager(disable_ssl_validation)
+    return policy.get_pool_manager(disable_ssl_validation)
+
+
+def request(http, method, url, **kwargs):
+    """Send a request using the policy in use, if any.
+
+    Without a policy, the request is sent once and without timeouts.
+    """
+    policy = _active
+    if policy is None:
+        return http.request(method, url, **kwargs)
+    return policy.request(http, method, url, **kwargs)
+
+
+async def async_request(send, url, errors=()):
+    """Async counterpart of request.
+
+    Without a policy, the request is sent once.
+    """
+    policy = _active
+    if policy is None:
+        return await send()
+    return await policy.async_request(send, url, errors)
+
+
+def get_timeout():
+    """Return (connect, read) timeouts of the policy in use or None."""
+    policy = _active
+    if policy is None:
+        return None
+    return (policy.connect_timeout, policy.read_timeout)
+
+
+@contextlib.contextmanager
+def use(policy=None):
+    """Context manager making requests follow a retry policy.
+
+    :param policy: policy to use, one with the defaults if not given
+    :type policy: RetryPolicy or None
+    """
+    global _active
+    previous = _active
+    _active = policy if policy is not None else RetryPolicy()
+    try:
+        yield _active
+    finally:
+        _active = previous
@@ -0,0 +1,437 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Options tempest and the installed tempest plugins know.
+
+The options are read once from the option registry of tempest into a flat
+table of (section, key) to the default value, type and allowed values, so
+that a lookup of a default is a dict hit instead of a query of oslo.config
+and a whole configuration can be validated in one pass before it's written.
+
+Reading of the registry means importing tempest config and loading all the
+plugins. The table can be saved to a cache file, which is keyed on the
+versions of tempest and of the plugins. When the cache file exists, the
+registry isn't touched at all.
+"""
+
+import difflib
+import hashlib
+import json
+import os
+import threading
+
+try:
+    from importlib import metadata
+except ImportError:
+    # python < 3.8
+    import importlib_metadata as metadata
+
+from config_tempest import constants as C
+from config_tempest.constants import LOG
+from config_tempest import utils
+
+SCHEMA_VERSION = 3
+PLUGINS_ENTRY_POINT = 'tempest.test_plugins'
+OPTS_ENTRY_POINT = 'oslo.config.opts'
+# namespaces of options tempest reads, see config-generator.tempest.conf
+# of tempest, tempest.config includes options of the plugins
+NAMESPACES = ('tempest.config', 'oslo.concurrency', 'oslo.log')
+# layers of options defined by the user, an invalid option coming from
+# them is an error, otherwise just a warning
+USER_LAYERS = (C.SOURCE_OVERRIDE, C.SOURCE_DEPLOYER_INPUT,
+               C.SOURCE_CLOUD_CONFIG)
+# options used by python-tempestconf only
+TEMPESTCONF_OPTIONS = {('image', 'image_path')}
+# sections of tempest which tempest plugins commonly add their options to,
+# an unknown option in them may belong to a plugin which isn't installed,
+# so do sections ending by FEATURE_SECTIONS_SUFFIX
+SHARED_SECTIONS = ('service_available',)
+FEATURE_SECTIONS_SUFFIX = 'feature-enabled'
+# how similar an unknown option has to be to a known one to be reported
+# as a typo of it, see difflib.get_close_matches
+TYPO_CUTOFF = 0.8
+TRUE_VALUES = ('true', '1', 'on', 'yes')
+FALSE_VALUES = ('false', '0', 'off', 'no')
+
+_schema = None
+_lock = threading.Lock()
+
+
+class ValidationError(Exception):
+    pass
+
+
+def get_cache_key():
+    """Return a key identifying tempest and the installed plugins.
+
+    :rtype: string
+    """
+    try:
+        versions = ['tempest==' + metadata.version('tempest')]
+    except metadata.PackageNotFoundError:
+        versions = ['tempest']
+    for ep in utils.get_entry_points(PLUGINS_ENTRY_POINT):
+        dist = getattr(ep, 'dist', None)
+        versions.append('%s=%s==%s' % (ep.name, ep.value,
+                                       dist.version if dist else ''))
+    data = '\n'.join(sorted(versions)).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def get_cache_path(cache_dir):
+    return os.path.join(cache_dir, 'tempest-options-%s.json' %
+                        get_cache_key())
+
+
+def _get_default(opt):
+    """Return the default value of an option as oslo.config returns it."""
+    value = opt.default
+    if value is None:
+        return None
+    if isinstance(value, str):
+        # oslo.config escapes $ by $$, the defaults of tempest don't
+        # reference other options
+        value = value.replace('$$', '$')
+    try:
+        return opt.type(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class OptionSpec(object):
+    """Default value, type and allowed values of an option.
+
+    There is one instance per option, hence the slots.
+    """
+
+    __slots__ = ('default', 'kind', 'choices', 'min', 'max')
+
+    def __init__(self, default=None, kind='any', choices=None, min=None,
+                 max=None):
+        """Init method of OptionSpec.
+
+        :param kind: one of boolean, integer, float, string, list, dict
+                     or any
+        :type kind: string
+        :param choices: allowed values
+        :type choices: list or None
+        """
+        self.default = default
+        self.kind = kind
+        self.choices = choices
+        self.min = min
+        self.max = max
+
+    @classmethod
+    def from_opt(cls, opt):
+        """Return the spec of an oslo.config option."""
+        # importing oslo.config is needed only when reading the registry
+        from oslo_config import types
+
+        opt_type = opt.type
+        kind = 'any'
+        for kind_type, name in ((types.Boolean, 'boolean'),
+                                (types.Integer, 'integer'),
+                                (types.Float, 'float'),
+                                (types.List, 'list'),
+                                (types.Dict, 'dict'),
+                                (types.String, 'string')):
+            if isinstance(opt_type, kind_type):
+                kind = name
+                break
+        choices = getattr(opt_type, 'choices', None)
+        if choices:
+            choices = [str(c) for c in choices if c is not None]
+        return cls(_get_default(opt), kind, choices or None,
+                   getattr(opt_type, 'min', None),
+                   getattr(opt_type, 'max', None))
+
+    def to_list(self):
+        return [self.default, self.kind, self.choices, self.min, self.max]
+
+    def check(self, value):
+        """Return why the value is invalid or None if it's valid.
+
+        :type value: string
+        :rtype: string or None
+        """
+        if self.kind == 'boolean':
+            if value.lower() not in TRUE_VALUES + FALSE_VALUES:
+                return "'%s' is not a boolean" % value
+            return None
+        if self.kind in ('integer', 'float'):
+            try:
+                number = int(value) if self.kind == 'integer' \
+                    else float(value)
+            except ValueError:
+                return "'%s' is not %s" % (value, 'an integer'
+                                           if self.kind == 'integer'
+                                           else 'a float')
+            if self.min is not None and number < self.min:
+                return "%s is less than %s" % (value, self.min)
+            if self.max is not None and number > self.max:
+                return "%s is greater than %s" % (value, self.max)
+        if self.choices and value not in self.choices:
+            return "'%s' is not one of %s" % (value, ', '.join(self.choices))
+        return None
+
+
+class Schema(object):
+    """Flat table of the options of tempest and its plugins."""
+
+    def __init__(self, options=None, owned_sections=None):
+        """Init method of Schema.
+
+        :param options: {(section, key): OptionSpec}
+        :type options: dict
+        :param owned_sections: sections no installed tempest plugin adds its
+                               options to, all the sections if not given,
+                               shared sections are left out anyway, see
+                               SHARED_SECTIONS
+        :type owned_sections: iterable or None
+        """
+        self.options = options or {}
+        self.sections = {}
+        for section, key in self.options:
+            self.sections.setdefault(section, []).append(key)
+        if owned_sections is None:
+            owned_sections = self.sections
+        self.owned_sections = set(
+            section for section in owned_sections
+            if not self.is_shared(section))
+
+    @classmethod
+    def from_registry(cls):
+        """Read the options from the option registry of tempest."""
+        # importing oslo.config and tempest is needed only when reading the
+        # registry
+        from oslo_config import cfg
+        from tempest.test_discover import plugins
+
+        def get_section(group):
+            if isinstance(group, cfg.OptGroup):
+                group = group.name
+            return group or 'DEFAULT'
+
+        options = {}
+        for ep in utils.get_entry_points(OPTS_ENTRY_POINT):
+            if ep.name not in NAMESPACES:
+                continue
+            for group, opts in ep.load()():
+                section = get_section(group)
+                for opt in opts:
+                    spec = OptionSpec.from_opt(opt)
+                    names = [(section, opt.dest), (section, opt.name)]
+                    names += [(d.group or section, d.name)
+                              for d in opt.deprecated_opts if d.name]
+                    for name in names:
+                        options.setdefault(name, spec)
+        plugin_sections = set(
+            get_section(group) for group, _ in
+            plugins.TempestTestPluginManager().get_plugin_options_list())
+        owned_sections = set(section for section, _ in options)
+        return cls(options, owned_sections - plugin_sections)
+
+    @staticmethod
+    def is_shared(section):
+        """Return True if tempest plugins commonly extend the section."""
+        return section in SHARED_SECTIONS or \
+            section.endswith(FEATURE_SECTIONS_SUFFIX)
+
+    def has_option(self, section, key):
+        return (section, key) in self.options
+
+    def get_default(self, section, key):
+        """Return the default value of an option.
+
+        :raises KeyError: if tempest doesn't know the option
+        """
+        return self.options[(section, key)].default
+
+    def get_close_option(self, section, key):
+        """Return a known option the unknown one is likely a typo of.
+
+        :return: (section, key) or None
+        :rtype: tuple or None
+        """
+        if section not in self.sections:
+            sections = difflib.get_close_matches(
+                section, self.sections, 1, TYPO_CUTOFF)
+            if not sections:
+                return None
+            section = sections[0]
+            if key in self.sections[section]:
+                return section, key
+        keys = difflib.get_close_matches(
+            key, self.sections[section], 1, TYPO_CUTOFF)
+        return (section, keys[0]) if keys else None
+
+    def check(self, section, key, value):
+        """Return why an option is invalid or None if it's valid.
+
+        :rtype: string or None
+        """
+        spec = self.options.get((section, key))
+        if spec is None:
+            if (section, key) in TEMPESTCONF_OPTIONS:
+                return None
+            problem = "unknown section" if section not in self.sections \
+                else "unknown option"
+            close = self.get_close_option(section, key)
+            if close is not None:
+                problem += ", did you mean [%s] %s?" % close
+            return problem
+        return spec.check(value)
+
+    def validate(self, conf):
+        """Check all options of a configuration in one pass.
+
+        A value of a wrong type or not allowed given by the user is an
+        error, a wrong value set by discovery is a warning. An option of the
+        user tempest doesn't know is an error too if it's close to a known
+        one in a section owned by tempest, see owned_sections, it's most
+        likely a typo. Other unknown options may belong to tempest plugins
+        which aren't installed where tempestconf runs, they're warned about
+        only if they were given by the user, otherwise just logged.
+
+        :type conf: TempestConf object
+        :return: lists of errors and warnings, strings describing them
+        :rtype: tuple
+        """
+        errors = []
+        warnings = []
+        defaults = conf.defaults()
+        items = [('DEFAULT', key, value) for key, value in defaults.items()]
+        for section in conf.sections():
+            items += [(section, key, value)
+                      for key, value in conf.items(section, raw=True)
+                      if defaults.get(key) != value]
+        for section, key, value in items:
+            problem = self.check(section, key, value)
+            if problem is None:
+                continue
+            source = conf.get_source(section, key)
+            layer = source.layer if source else None
+            message = "[%s] %s = %s: %s (from %s)" % (
+                section, key, value, problem, layer or 'unknown source')
+            unknown = problem.startswith('unknown ')
+            typo = unknown and layer in USER_LAYERS and \
+                section in self.owned_sections and \
+                self.get_close_option(section, key) is not None
+            if layer in USER_LAYERS and (not unknown or typo):
+                errors.append(message)
+            elif layer in USER_LAYERS or not unknown:
+                warnings.append(message)
+            else:
+                LOG.debug("Option %s", message)
+        return errors, warnings
+
+    def save(self, path):
+        """Save the table to a cache file.
+
+        Options whose defaults are not JSON serializable are left out.
+        """
+        options = []
+        for (section, key), spec in self.options.items():
+            try:
+                json.dumps(spec.default)
+            except (TypeError, ValueError):
+                continue
+            options.append([section, key] + spec.to_list())
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        utils.write_atomic(path, json.dumps(
+            {'version': SCHEMA_VERSION, 'options': options,
+             'owned_sections': sorted(self.owned_sections)}))
+
+    @classmethod
+    def load(cls, path):
+        """Load the table from a cache file.
+
+        :raises ValueError: if the file has an unsupported format
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != SCHEMA_VERSION:
+            raise ValueError("Unsupported version of %s" % path)
+        return cls({(option[0], option[1]): OptionSpec(*option[2:])
+                    for option in data['options']},
+                   data['owned_sections'])
+
+
+def load(cache_dir=None):
+    """Load the schema, from a cache file in cache_dir if possible.
+
+    If cache_dir is given and the cache file doesn't exist yet, it's
+    created.
+
+    :param cache_dir: directory with cache files
+    :type cache_dir: string or None
+    :rtype: Schema
+    """
+    if cache_dir is None:
+        return Schema.from_registry()
+    path = get_cache_path(cache_dir)
+    try:
+        schema = Schema.load(path)
+        LOG.debug("Tempest options loaded from %s", path)
+        return schema
+    except (IOError, OSError, ValueError):
+        pass
+    schema = Schema.from_registry()
+    try:
+        schema.save(path)
+        LOG.debug("Tempest options saved to %s", path)
+    except (IOError, OSError) as e:
+        LOG.warning("Can't save tempest options to %s: %s", path, e)
+    return schema
+
+
+def get_schema():
+    """Return the schema, it's loaded on the first call.
+
+    :rtype: Schema
+    """
+    global _schema
+    if _schema is None:
+        with _lock:
+            if _schema is None:
+                _schema = load()
+    return _schema
+
+
+def use_cache(cache_dir):
+    """Load the schema using a cache directory, see load.
+
+    :rtype: Schema
+    """
+    global _schema
+    with _lock:
+        _schema = load(cache_dir)
+    return _schema
+
+
+def check(conf):
+    """Validate a configuration, fail if an option of the user is invalid.
+
+    :type conf: TempestConf object
+    :raises ValidationError: if there are errors
+    """
+    errors, warnings = get_schema().validate(conf)
+    for warning in warnings:
+        LOG.warning("Option %s", warning)
+    if errors:
+        raise ValidationError("Invalid options:\n  " + "\n  ".join(errors))
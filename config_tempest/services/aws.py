@@ -18,6 +18,8 @@ from config_tempest.services.base import Service
 
 class Ec2Service(Service):
 
+    __slots__ = ()
+
     def set_default_tempest_options(self, conf):
         conf.set('aws', 'ec2_url', self.service_url)
 
@@ -28,6 +30,8 @@ class Ec2Service(Service):
 
 class S3Service(Service):
 
+    __slots__ = ()
+
     def set_default_tempest_options(self, conf):
         conf.set('aws', 's3_url', self.service_url)
 
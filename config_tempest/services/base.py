@@ -20,7 +20,10 @@ import urllib3
 from six.moves import urllib
 
 from config_tempest.constants import LOG
+from config_tempest import request_cache
+from config_tempest import resilience
 
+from tempest.lib.common import api_version_request
 from tempest.lib import exceptions
 
 
@@ -32,56 +35,149 @@ class ServiceError(Exception):
 
 
 class Service(object):
+    """A service of the catalog.
+
+    Services are kept for the whole run, and in batch runs there are
+    many of them, so they keep only data derived from the responses,
+    f.e. the ids of versions and the aliases of extensions, not the
+    responses themselves.
+    """
+
+    __slots__ = ('name', 's_type', 'service_url', 'token',
+                 'disable_ssl_validation', 'client', 'endpoints',
+                 'extensions', 'versions', 'microversion_ranges', 'last_url')
+
+    # path of the storage pools of the service relative to its url, None
+    # if the service doesn't have any
+    pools_path = None
+
     def __init__(self, name, s_type, service_url, token,
                  disable_ssl_validation, client=None):
         self.name = name
         self.s_type = s_type
         self.service_url = service_url
-        self.headers = {'Accept': 'application/json', 'X-Auth-Token': token}
+        self.token = token
         self.disable_ssl_validation = disable_ssl_validation
         self.client = client
+        # endpoints of all types of the service, versioned twins, like
+        # volumev2 and volumev3, are discovered as one service
+        self.endpoints = {s_type: service_url}
 
         self.extensions = []
         self.versions = []
-        self.versions_body = {'versions': []}
+        self.microversion_ranges = []
+        # url of the last response received, options set by the service
+        # are attributed to it, see TempestConf.get_source
+        self.last_url = None
 
-    def do_get(self, url, top_level=False, top_level_path=""):
+    @property
+    def headers(self):
+        return {'Accept': 'application/json', 'X-Auth-Token': self.token}
+
+    def _get_url(self, url, top_level=False, top_level_path=""):
         parts = list(urllib.parse.urlparse(url))
         # 2 is the path offset
         if top_level:
             parts[2] = '/' + top_level_path
 
         parts[2] = MULTIPLE_SLASH.sub('/', parts[2])
-        url = urllib.parse.urlunparse(parts)
+        return urllib.parse.urlunparse(parts)
+
+    def _check_status(self, url, status):
+        if status == 403:
+            raise exceptions.Forbidden("Request on service '%s' with url '%s' "
+                                       "failed with code 403" % (self.s_type,
+                                                                 url))
+
+        if status >= 400:
+            raise ServiceError("Request on service '%s' with url '%s' failed"
+                               " with code %d" % (self.s_type, url, status))
+
+    def do_get(self, url, top_level=False, top_level_path=""):
+        url = self._get_url(url, top_level, top_level_path)
+
+        def fetch():
+            http = resilience.get_pool_manager(self.disable_ssl_validation)
+            return resilience.request(http, 'GET', url,
+                                      headers=self.headers)
 
         try:
-            if self.disable_ssl_validation:
-                urllib3.disable_warnings()
-                http = urllib3.PoolManager(cert_reqs='CERT_NONE')
-            else:
-                http = urllib3.PoolManager()
-            r = http.request('GET', url, headers=self.headers)
+            r = request_cache.get(url, self.headers, fetch)
         except Exception as e:
             LOG.error("Request on service '%s' with url '%s' failed",
                       self.s_type, url)
             raise e
 
-        if r.status == 403:
-            raise exceptions.Forbidden("Request on service '%s' with url '%s' "
-                                       "failed with code 403" % (self.s_type,
-                                                                 url))
-
-        if r.status >= 400:
-            raise ServiceError("Request on service '%s' with url '%s' failed"
-                               " with code %d" % (self.s_type, url, r.status))
+        self._check_status(url, r.status)
+        self.last_url = url
         return r.data.decode('utf-8')
 
+    async def async_do_get(self, session, url, top_level=False,
+                           top_level_path=""):
+        """Async counterpart of do_get.
+
+        :param session: session of the asyncio discovery backend
+        :type session: config_tempest.async_http.AsyncSession
+        """
+        url = self._get_url(url, top_level, top_level_path)
+        try:
+            status, data = await session.get(url, headers=self.headers)
+        except Exception as e:
+            LOG.error("Request on service '%s' with url '%s' failed",
+                      self.s_type, url)
+            raise e
+
+        self._check_status(url, status)
+        self.last_url = url
+        return data.decode('utf-8')
+
+    def add_endpoint(self, s_type, service_url):
+        """Add an endpoint of a versioned twin of the service.
+
+        :param s_type: type of the twin, e.g. volumev2 for volumev3
+        :type s_type: string
+        :param service_url: url of the twin's endpoint
+        :type service_url: string
+        """
+        self.endpoints[s_type] = service_url
+
+    def get_discovered_data(self):
+        """Return data discovered about the service.
+
+        Used to find out whether the service changed since the last run.
+
+        :rtype: dict
+        """
+        return {'endpoints': self.endpoints,
+                'extensions': self.extensions,
+                'versions': self.versions}
+
     def set_extensions(self):
         self.extensions = []
 
     def set_versions(self):
         self.versions = []
 
+    # Async counterparts of the discovery methods used by the asyncio
+    # discovery backend. Services which send requests in the synchronous
+    # methods override them, the default ones just call the synchronous
+    # methods, which don't send any request.
+
+    async def async_set_extensions(self, session):
+        self.set_extensions()
+
+    async def async_set_versions(self, session):
+        self.set_versions()
+
+    async def async_set_default_tempest_options(self, session, conf):
+        """Async counterpart of set_default_tempest_options.
+
+        Options set by tempest clients, which are synchronous, block the
+        event loop, override the method if the requests can be sent
+        by the session.
+        """
+        self.set_default_tempest_options(conf)
+
     def set_availability(self, conf, available):
         """Sets service's availability.
 
@@ -158,6 +254,34 @@ class Service(object):
         """
         return self.s_type
 
+    def get_pools(self):
+        """Return storage pools of the service with their capabilities.
+
+        Only services with storage back-ends, whose pools_path isn't None,
+        have pools, see Services.discover_capabilities.
+
+        :rtype: list of dicts
+        """
+        body = self.do_get(self.service_url + self.pools_path)
+        return json.loads(body)['pools']
+
+    def get_pool_backend(self, pool):
+        """Return the name of the back-end of a pool.
+
+        :type pool: dict
+        :rtype: string
+        """
+        raise NotImplementedError
+
+    def set_capabilities(self, conf, table):
+        """Set options following from capabilities of storage back-ends.
+
+        :param conf: config_tempest.tempest_conf.TempestConf
+        :param table: back-ends of all the storage services
+        :type table: config_tempest.capabilities.CapabilityTable
+        """
+        return None
+
     def post_configuration(self, conf, is_service):
         """Do post congiruation steps.
 
@@ -167,11 +291,96 @@ class Service(object):
         return None
 
 
+class MicroversionRange(object):
+    """Microversions supported by a version of an API.
+
+    The microversions are parsed once, when the versions of the service are
+    discovered, and compared as numbers, i.e. 2.9 is lower than 2.10.
+    """
+
+    __slots__ = ('version_id', 'status', 'min', 'max')
+
+    # statuses of versions which are not experimental nor deprecated
+    STABLE_STATUSES = ('CURRENT', 'SUPPORTED', 'STABLE')
+
+    def __init__(self, version_id, status, min_version, max_version):
+        """Init method of MicroversionRange.
+
+        :param version_id: id of the version of the API, f.e. v2.1
+        :type min_version: APIVersionRequest
+        :type max_version: APIVersionRequest
+        """
+        self.version_id = version_id
+        self.status = status
+        self.min = min_version
+        self.max = max_version
+
+    @classmethod
+    def from_version(cls, version):
+        """Return the range of a version from the versions document.
+
+        Versions without microversions have an empty version and
+        min_version, their range is null.
+
+        :type version: dict
+        """
+        return cls(version.get('id'), version.get('status'),
+                   parse_microversion(version.get('min_version')),
+                   parse_microversion(version.get('version')))
+
+    def is_stable(self):
+        return (self.status or '').upper() in self.STABLE_STATUSES
+
+    def contains(self, microversion):
+        """Return True if the microversion is within the range.
+
+        :type microversion: APIVersionRequest
+        :rtype: bool
+        """
+        if self.max.is_null():
+            return False
+        return microversion.matches(self.min, self.max)
+
+
+def parse_microversion(value):
+    """Return a microversion as a comparable object.
+
+    :param value: f.e. '2.10', empty or invalid values give a null version
+    :type value: string or None
+    :rtype: APIVersionRequest
+    """
+    try:
+        return api_version_request.APIVersionRequest(value or None)
+    except exceptions.InvalidAPIVersionString:
+        LOG.debug("Invalid microversion %s", value)
+        return api_version_request.APIVersionRequest()
+
+
 class VersionedService(Service):
-    def set_versions(self, top_level=True):
-        body = self.do_get(self.service_url, top_level=top_level)
-        self.versions_body = json.loads(body)
-        self.versions = self.deserialize_versions(self.versions_body)
+
+    __slots__ = ()
+
+    def get_versions_url(self):
+        """Return the url of versions of the service.
+
+        :return: url and whether only the top level of the url is used
+        :rtype: tuple (string, bool)
+        """
+        return self.service_url, True
+
+    def set_versions(self):
+        url, top_level = self.get_versions_url()
+        self.set_versions_body(self.do_get(url, top_level=top_level))
+
+    async def async_set_versions(self, session):
+        url, top_level = self.get_versions_url()
+        self.set_versions_body(
+            await self.async_do_get(session, url, top_level=top_level))
+
+    def set_versions_body(self, body):
+        body = json.loads(body)
+        self.versions = self.deserialize_versions(body)
+        self.set_microversion_ranges(body)
 
     def deserialize_versions(self, body):
         versions = []
@@ -180,25 +389,76 @@ class VersionedService(Service):
                 versions.append(version)
         return list(map(lambda x: x['id'], versions))
 
+    def set_microversion_ranges(self, body):
+        """Parse microversions of the versions of the service once.
+
+        :param body: versions document of the service
+        :type body: dict
+        """
+        versions = body.get('versions')
+        if not isinstance(versions, list):
+            # f.e. keystone lists its versions under versions.values, they
+            # don't have microversions
+            versions = []
+        self.microversion_ranges = [
+            MicroversionRange.from_version(version) for version in versions
+            if version.get('status') != "DEPRECATED"]
+
+    def get_max_microversion(self, stable=False):
+        """Return the highest microversion of the service.
+
+        :param stable: if True, only CURRENT and SUPPORTED versions of the
+                       API are taken into account
+        :type stable: bool
+        :return: the microversion or None if the service has none
+        :rtype: APIVersionRequest or None
+        """
+        versions = [r.max for r in self.microversion_ranges
+                    if not r.max.is_null() and (not stable or r.is_stable())]
+        return max(versions) if versions else None
+
+    def get_min_microversion(self):
+        """Return the lowest microversion of the service.
+
+        :rtype: APIVersionRequest or None
+        """
+        versions = [r.min for r in self.microversion_ranges
+                    if not r.min.is_null()]
+        return min(versions) if versions else None
+
+    def supports_microversion(self, microversion):
+        """Return True if a version of the service supports a microversion.
+
+        :param microversion: f.e. '2.10'
+        :type microversion: string or APIVersionRequest
+        :rtype: bool
+        """
+        if not isinstance(microversion, api_version_request.APIVersionRequest):
+            microversion = api_version_request.APIVersionRequest(microversion)
+        return any(r.contains(microversion)
+                   for r in self.microversion_ranges)
+
+    def set_microversion_options(self, conf, section,
+                                 key_format='%s_microversion'):
+        """Set the lowest and the highest microversion of the service.
+
+        :param section: section of the options, f.e. compute
+        :param key_format: format of the keys of the options, it gets
+                           min or max
+        """
+        m_versions = self.filter_api_microversions()
+        conf.set(section, key_format % 'min',
+                 m_versions['min_microversion'])
+        conf.set(section, key_format % 'max',
+                 m_versions['max_microversion'])
+
     def filter_api_microversions(self):
-        min_microversion = ''
-        max_microversion = ''
-        for version in self.versions_body['versions']:
-            if version['status'] != "DEPRECATED":
-                if max_microversion == '':
-                    max_microversion = version['version']
-                else:
-                    max_microversion = max(max_microversion,
-                                           version['version'])
-                if 'min_version' not in version:
-                    continue
-                if min_microversion == '':
-                    min_microversion = version['min_version']
-                else:
-                    min_microversion = min(min_microversion,
-                                           version['min_version'])
-        return {'max_microversion': max_microversion,
-                'min_microversion': min_microversion}
+        max_microversion = self.get_max_microversion()
+        min_microversion = self.get_min_microversion()
+        return {'max_microversion': (max_microversion.get_string()
+                                     if max_microversion else ''),
+                'min_microversion': (min_microversion.get_string()
+                                     if min_microversion else '')}
 
     def no_port_cut_url(self):
         # if there is no port defined, cut the url from version to the end
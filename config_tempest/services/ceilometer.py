@@ -20,6 +20,8 @@ from tempest.lib import exceptions
 
 class MeteringService(Service):
 
+    __slots__ = ()
+
     def post_configuration(self, conf, is_service):
         try:
             params = {'type': 'metering'}
@@ -13,20 +13,27 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import json
-
 from tempest.lib import exceptions
 
 from config_tempest import constants as C
 from config_tempest.services.base import VersionedService
+from config_tempest.tempest_conf import ListValue
+
+# the compute hosts haven't been listed yet
+_NOT_LISTED = object()
 
 
 class ComputeService(VersionedService):
-    def set_versions(self):
-        url, top_level = self.no_port_cut_url()
-        body = self.do_get(url, top_level=top_level)
-        self.versions_body = json.loads(body)
-        self.versions = self.deserialize_versions(self.versions_body)
+    __slots__ = ('_compute_hosts',)
+
+    def __init__(self, name, s_type, service_url, token,
+                 disable_ssl_validation, client=None):
+        super(ComputeService, self).__init__(
+            name, s_type, service_url, token, disable_ssl_validation, client)
+        self._compute_hosts = _NOT_LISTED
+
+    def get_versions_url(self):
+        return self.no_port_cut_url()
 
     def set_default_tempest_options(self, conf):
         conf.set('compute-feature-enabled', 'console_output', 'True')
@@ -41,21 +48,61 @@ class ComputeService(VersionedService):
         # compute nodes
         if num_compute >= 2:
             conf.set('compute-feature-enabled', 'resize', 'True')
-        # set microversions
-        m_versions = self.filter_api_microversions()
-        conf.set('compute', 'min_microversion', m_versions['min_microversion'])
-        conf.set('compute', 'max_microversion', m_versions['max_microversion'])
+        self.set_migration_options(conf)
+        self.set_microversion_options(conf, 'compute')
 
-    def _get_number_of_hosts(self):
-        # Right now the client returned is hosts, in the future
-        # change it to a dict, and get the client as requested
+    def get_compute_hosts(self):
+        """Return usable compute hosts by their availability zones.
+
+        Only nova-compute services are listed, filtered by nova, hosts
+        whose service is disabled or down are left out. The hosts are
+        listed once, the result is cached.
+
+        :return: {zone: ListValue of hosts} or None if the user is not
+                 allowed to list services
+        :rtype: dict or None
+        """
+        if self._compute_hosts is _NOT_LISTED:
+            self._compute_hosts = self._list_compute_hosts()
+        return self._compute_hosts
+
+    def _list_compute_hosts(self):
         try:
-            hosts = self.client.list_hosts()['hosts']
-            compute_hosts = [h for h in hosts if h['service'] == 'compute']
-            return len(compute_hosts)
+            services = self.client.list_services(
+                binary='nova-compute')['services']
         except exceptions.Forbidden:
             C.LOG.info('Can not retrieve hosts, user are not allowed')
+            return None
+        hosts = {}
+        for service in services:
+            if service['status'] == 'enabled' and service['state'] == 'up':
+                hosts.setdefault(service['zone'],
+                                 ListValue()).add(service['host'])
+        return hosts
+
+    def _get_number_of_hosts(self):
+        hosts = self.get_compute_hosts()
+        if hosts is None:
             return 1
+        return sum(len(zone_hosts) for zone_hosts in hosts.values())
+
+    def set_migration_options(self, conf):
+        """Disable migrations the compute hosts don't allow.
+
+        A server can be migrated only to another host in the same
+        availability zone.
+        """
+        hosts = self.get_compute_hosts()
+        if hosts is None:
+            return
+        if not any(len(zone_hosts) >= 2 for zone_hosts in hosts.values()):
+            C.LOG.info("No availability zone has 2 compute hosts, "
+                       "migration is not possible")
+            conf.set('compute-feature-enabled', 'live_migration', 'False')
+            conf.set('compute-feature-enabled', 'cold_migration', 'False')
+        elif len(hosts) > 1:
+            conf.set('compute-feature-enabled',
+                     'can_migrate_between_any_hosts', 'False')
 
     def post_configuration(self, conf, is_service):
         conf.set('compute-feature-enabled', 'attach_encrypted_volume',
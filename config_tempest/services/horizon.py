@@ -15,27 +15,84 @@
 
 
 from ssl import CertificateError
+from ssl import SSLError
 
 from six.moves import urllib
+import urllib3
 
 from config_tempest import constants as C
+from config_tempest import resilience
 
+# a slow dashboard shouldn't block the whole run
+PROBE_TIMEOUT = 5.0
 
-def configure_horizon(conf):
-    """Derive the horizon URIs from the identity's URI."""
+
+def get_dashboard_url(conf):
+    """Derive the horizon URI from the identity's URI."""
     uri = conf.get('identity', 'uri')
     u = urllib.parse.urlparse(uri)
     base = '%s://%s%s' % (u.scheme, u.netloc.replace(
         ':' + str(u.port), ''), '/dashboard')
     assert base.startswith('http:') or base.startswith('https:')
-    has_horizon = True
+    return base
+
+
+def probe(base, disable_ssl_validation=False, timeout=PROBE_TIMEOUT):
+    """Return True if the dashboard is available on the given url.
+
+    Only headers of the page are requested, the dashboard may not support
+    HEAD method, in that case the first byte of the page is requested.
+
+    :param timeout: connect and read timeout in seconds
+    :type timeout: float
+    """
+    http = resilience.get_pool_manager(disable_ssl_validation)
     try:
-        urllib.request.urlopen(base)
-    except urllib.error.URLError:
-        has_horizon = False
-    except CertificateError as ex:
+        r = http.request('HEAD', base, timeout=timeout, retries=False)
+        if r.status in (405, 501):
+            r = http.request('GET', base, headers={'Range': 'bytes=0-0'},
+                             timeout=timeout, retries=False,
+                             preload_content=False)
+            r.release_conn()
+    except urllib3.exceptions.SSLError as ex:
         C.LOG.info('Certificate Error while discovering Horizon: %s', (ex))
-        has_horizon = False
+        return False
+    except (urllib3.exceptions.HTTPError, CertificateError) as ex:
+        C.LOG.info('Error while discovering Horizon: %s', (ex))
+        return False
+    return r.status < 400
+
+
+async def async_probe(session, base, timeout=PROBE_TIMEOUT):
+    """Async counterpart of probe.
+
+    :param session: session of the asyncio discovery backend
+    :type session: config_tempest.async_http.AsyncSession
+    """
+    try:
+        status = await session.get_status('HEAD', base, timeout=timeout)
+        if status in (405, 501):
+            status = await session.get_status(
+                'GET', base, headers={'Range': 'bytes=0-0'}, timeout=timeout)
+    except SSLError as ex:
+        C.LOG.info('Certificate Error while discovering Horizon: %s', (ex))
+        return False
+    except Exception as ex:
+        C.LOG.info('Error while discovering Horizon: %s', (ex))
+        return False
+    return status < 400
+
+
+def configure_horizon(conf, has_horizon=None):
+    """Derive the horizon URIs from the identity's URI.
+
+    :param has_horizon: result of the probe of the dashboard, if it was
+                        already done, see Services.start_horizon_probe
+    :type has_horizon: bool or None
+    """
+    base = get_dashboard_url(conf)
+    if has_horizon is None:
+        has_horizon = probe(base)
 
     conf.set('service_available', 'horizon', str(has_horizon))
     if has_horizon:
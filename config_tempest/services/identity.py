@@ -19,10 +19,16 @@ import requests
 from six.moves import urllib
 
 from config_tempest.constants import LOG
+from config_tempest import request_cache
+from config_tempest import resilience
 from config_tempest.services.base import VersionedService
+from config_tempest.tempest_conf import ListValue
+from config_tempest import utils
 
 
 class IdentityService(VersionedService):
+    __slots__ = ('extensions_v3',)
+
     def __init__(self, name, s_type, service_url, token,
                  disable_ssl_validation, client=None):
         super(IdentityService, self).__init__(
@@ -35,12 +41,23 @@ class IdentityService(VersionedService):
             self.service_url = '{}://{}{}'.format(url_parse.scheme,
                                                   url_parse.netloc, version)
 
+    async def async_set_extensions(self, session):
+        if 'v2' in self.service_url:
+            body = await self.async_do_get(session,
+                                           self.service_url + '/extensions')
+            self.set_extensions_body(body)
+            return
+        self.set_extensions()
+
+    def set_extensions_body(self, body):
+        body = json.loads(body)
+        values = body['extensions']['values']
+        self.extensions = list(map(lambda x: x['alias'], values))
+
     def set_extensions(self):
         if 'v2' in self.service_url:
             body = self.do_get(self.service_url + '/extensions')
-            body = json.loads(body)
-            values = body['extensions']['values']
-            self.extensions = list(map(lambda x: x['alias'], values))
+            self.set_extensions_body(body)
             return
         # Keystone api changed in v3, the concept of extensions changed. Right
         # now, all the existing extensions are part of keystone core api, so,
@@ -64,6 +81,14 @@ class IdentityService(VersionedService):
     def get_service_type():
         return ['identity']
 
+    @staticmethod
+    def _get_json_home(url):
+        headers = {'Accept': 'application/json-home'}
+        return request_cache.get(
+            url, headers,
+            lambda: requests.get(url, verify=False, headers=headers,
+                                 timeout=resilience.get_timeout()))
+
     def set_identity_v3_extensions(self):
         """Returns discovered identity v3 extensions
 
@@ -72,34 +97,36 @@ class IdentityService(VersionedService):
 
         :return: A list with the discovered extensions
         """
-        try:
-            r = requests.get(self.service_url,
-                             verify=False,
-                             headers={'Accept': 'application/json-home'})
+        def check(url):
+            r = self._get_json_home(url)
             # check for http status
             r.raise_for_status()
-        except requests.exceptions.HTTPError:
+            return r
+
+        # try the url and its v3 variant at once, prefer the url
+        candidates = [self.service_url]
+        if 'v3' not in self.service_url:
+            candidates.append(self.service_url + '/v3')
+        url, r = utils.first_success(candidates, check)
+        if url != self.service_url:
             LOG.warning("Request on service '%s' with url '%s' failed, "
                         "checking for v3", 'identity', self.service_url)
-            if 'v3' not in self.service_url:
-                self.service_url = self.service_url + '/v3'
-                r = requests.get(self.service_url,
-                                 verify=False,
-                                 headers={'Accept': 'application/json-home'})
+            self.service_url = candidates[-1]
+            if url is None:
+                r = self._get_json_home(self.service_url)
 
         ext_h = 'https://docs.openstack.org/api/openstack-identity/3/ext/'
         content = r.content.decode('utf-8')
         res = [x for x in json.loads(content)['resources'].keys()]
         ext = [ex for ex in res if 'ext' in ex]
         ext = [str(e).replace(ext_h, '').split('/')[0] for e in ext]
-        self.extensions_v3 = list(set(ext))
+        self.extensions_v3 = list(ListValue(ext))
 
-    def set_versions(self):
-        super(IdentityService, self).set_versions(top_level=False)
+    def get_versions_url(self):
+        return self.service_url, False
 
     def get_extensions(self):
-        all_ext_lst = self.extensions + self.extensions_v3
-        return list(set(all_ext_lst))
+        return list(ListValue(self.extensions) | self.extensions_v3)
 
     def deserialize_versions(self, body):
         try:
@@ -28,6 +28,8 @@ from config_tempest.services.base import VersionedService
 
 class ImageService(VersionedService):
 
+    __slots__ = ('disk_format', 'non_admin', 'no_rng', 'convert')
+
     def __init__(self, name, s_type, service_url, token,
                  disable_ssl_validation, client=None):
         super(ImageService, self).__init__(name, s_type, service_url, token,
@@ -81,8 +83,8 @@ class ImageService(VersionedService):
     def get_codename():
         return 'glance'
 
-    def set_versions(self):
-        super(ImageService, self).set_versions(top_level=False)
+    def get_versions_url(self):
+        return self.service_url, False
 
     def create_tempest_images(self, conf):
         """Uploads an image to the glance.
@@ -18,6 +18,8 @@ from config_tempest.services.base import Service
 
 class KeyManagerService(Service):
 
+    __slots__ = ()
+
     @staticmethod
     def get_service_type():
         return ['key-manager']
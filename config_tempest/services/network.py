@@ -18,10 +18,36 @@ import json
 from config_tempest.constants import LOG
 from config_tempest.services.base import VersionedService
 
+# fields of networks needed for choosing the public network
+NETWORK_FIELDS = ['id', 'name', 'subnets', 'router:external']
+# fields of subnets needed for describing the topology
+SUBNET_FIELDS = ['id', 'network_id', 'ip_version']
+# number of resources listed by one request
+PAGE_SIZE = 100
+
 
 class NetworkService(VersionedService):
+    __slots__ = ('_public_network_id', '_public_network_name',
+                 '_topology')
+
+    def __init__(self, name, s_type, service_url, token,
+                 disable_ssl_validation, client=None):
+        super(NetworkService, self).__init__(
+            name, s_type, service_url, token, disable_ssl_validation, client)
+        self._public_network_id = None
+        self._public_network_name = None
+        self._topology = None
+
     def set_extensions(self):
         body = self.do_get(self.service_url + '/v2.0/extensions.json')
+        self.set_extensions_body(body)
+
+    async def async_set_extensions(self, session):
+        body = await self.async_do_get(
+            session, self.service_url + '/v2.0/extensions.json')
+        self.set_extensions_body(body)
+
+    def set_extensions_body(self, body):
         body = json.loads(body)
         self.extensions = list(map(lambda x: x['alias'], body['extensions']))
 
@@ -44,16 +70,98 @@ class NetworkService(VersionedService):
         if self._public_network_name is not None:
             conf.set('network', 'floating_network_name',
                      self._public_network_name)
+        self.set_topology_options(conf)
+
+    def set_topology_options(self, conf):
+        """Set options following from the topology of the cloud.
+
+        :type conf: TempestConf object
+        """
+        topology = self.get_topology()
+        public_subnets = topology['public_subnets']
+        if len(public_subnets) > 1:
+            # tempest needs to know which subnet to allocate floating IPs
+            # from, prefer an IPv4 one
+            subnet = sorted(public_subnets,
+                            key=lambda s: s.get('ip_version') != 4)[0]
+            conf.set('network', 'subnet_id', subnet['id'])
+        if self.extensions:
+            conf.set('network-feature-enabled', 'port_security',
+                     str('port-security' in self.extensions))
+            if 'router' not in self.extensions:
+                conf.set('network-feature-enabled', 'floating_ips', 'False')
+
+    def get_topology(self):
+        """Return the topology of the cloud, it's queried on the first call.
+
+        The topology is read by bulk requests returning only the fields
+        needed, so that their number doesn't grow with the number of
+        resources in the cloud. Only what some option follows from is
+        queried:
+
+        * public_subnets - subnets of the public network.
+
+        :rtype: dict
+        """
+        if self._topology is not None:
+            return self._topology
+        public_subnets = []
+        if self._public_network_id:
+            public_subnets = list(self.list_resources(
+                'subnets', SUBNET_FIELDS,
+                network_id=self._public_network_id))
+        self._topology = {'public_subnets': public_subnets}
+        return self._topology
 
     def get_service_extension_key(self):
         return 'api_extensions'
 
+    def list_networks(self, **filters):
+        """Yield networks matching filters page by page.
+
+        Networks are filtered by neutron and only the fields needed for
+        choosing the public network are returned, so that clouds with a lot
+        of tenant networks don't have to list all of them.
+
+        :param filters: query parameters of the request, f.e. id
+        """
+        return self._list_pages('networks', self.client.list_networks,
+                                NETWORK_FIELDS, filters)
+
+    def list_resources(self, name, fields, **filters):
+        """Yield neutron resources matching filters page by page.
+
+        :param name: name of the resources in the URL, f.e. subnets
+        :type name: string
+        :param fields: fields of the resources to return
+        :type fields: list
+        :param filters: query parameters of the request
+        """
+        return self._list_pages(
+            name, lambda **params: self.client.list_resources('/' + name,
+                                                              **params),
+            fields, filters)
+
+    @staticmethod
+    def _list_pages(name, list_method, fields, filters):
+        params = dict(filters, fields=fields, limit=PAGE_SIZE)
+        while True:
+            body = list_method(**params)
+            for resource in body[name]:
+                yield resource
+            # neutron returns a link to the next page if the page is full,
+            # there is none if pagination is disabled
+            links = [link for link in body.get(name + '_links', [])
+                     if link.get('rel') == 'next']
+            if not links or len(body[name]) < PAGE_SIZE:
+                break
+            params['marker'] = body[name][-1]['id']
+
     def _supplied_network(self):
         LOG.info("Looking for existing network id: {0}"
                  "".format(self._public_network_id))
         # check if network exists
-        network_list = self.client.list_networks()
-        for network in network_list['networks']:
+        for network in self.list_networks(id=self._public_network_id):
             if network['id'] == self._public_network_id:
                 self._public_network_name = network['name']
                 break
@@ -63,9 +171,8 @@ class NetworkService(VersionedService):
 
     def _discover_network(self):
         LOG.info("No network supplied, trying auto discover for network")
-        network_list = self.client.list_networks()
-        for network in network_list['networks']:
-            if network['router:external'] and network['subnets']:
+        for network in self.list_networks(**{'router:external': True}):
+            if network.get('router:external') and network['subnets']:
                 LOG.info("Found network, using: {0}".format(network['id']))
                 self._public_network_id = network['id']
                 self._public_network_name = network['name']
@@ -20,23 +20,62 @@ from tempest.lib import exceptions
 
 from config_tempest.constants import LOG
 from config_tempest.services.base import Service
+from config_tempest import utils
+
+# On swift, healthcheck is under http://.../healthcheck, while in ceph RGW it's
+# under http://.../swift/healthcheck by default (rgw_swift_url_prefix)
+HEALTHCHECK_PATHS = ['healthcheck', 'swift/healthcheck']
 
 
 class ObjectStorageService(Service):
+    __slots__ = ('healthcheck_paths',)
+
+    def __init__(self, name, s_type, service_url, token,
+                 disable_ssl_validation, client=None):
+        super(ObjectStorageService, self).__init__(
+            name, s_type, service_url, token, disable_ssl_validation, client)
+        self.healthcheck_paths = list(HEALTHCHECK_PATHS)
+
+    def add_healthcheck_paths(self, paths):
+        """Add more paths where the healthcheck API may be found.
+
+        F.e. ceph RGW with a custom rgw_swift_url_prefix.
+
+        :type paths: list
+        """
+        self.healthcheck_paths += [p.strip('/') for p in paths
+                                   if p.strip('/') not in
+                                   self.healthcheck_paths]
+
     def set_extensions(self):
         if 'v3' not in self.service_url:  # it's not a v3 url
             try:
                 body = self.do_get(self.service_url, top_level=True,
                                    top_level_path="info")
-                body = json.loads(body)
-                # Remove Swift general information from extensions list
-                body.pop('swift')
-                self.extensions = body.keys()
+                self.set_extensions_body(body)
+            except Exception:
+                self.extensions = []
+        else:
+            self.extensions = []
+
+    async def async_set_extensions(self, session):
+        if 'v3' not in self.service_url:  # it's not a v3 url
+            try:
+                body = await self.async_do_get(session, self.service_url,
+                                               top_level=True,
+                                               top_level_path="info")
+                self.set_extensions_body(body)
             except Exception:
                 self.extensions = []
         else:
             self.extensions = []
 
+    def set_extensions_body(self, body):
+        body = json.loads(body)
+        # Remove Swift general information from extensions list
+        body.pop('swift')
+        self.extensions = list(body)
+
     def list_create_roles(self, conf, client):
         try:
             roles = client.list_roles()['roles']
@@ -71,6 +110,15 @@ class ObjectStorageService(Service):
             LOG.warning('Healthcheck API not discovered giving %s', e)
             return False
 
+    async def _async_check_health_check(self, session, path):
+        try:
+            await self.async_do_get(session, self.service_url,
+                                    top_level=True, top_level_path=path)
+            return True
+        except Exception as e:
+            LOG.warning('Healthcheck API not discovered giving %s', e)
+            return False
+
     def check_service_status(self, conf):
         """Use healthcheck api to check the service status
 
@@ -88,12 +136,21 @@ class ObjectStorageService(Service):
                 return False
             return True
         except configparser.NoSectionError:
-            # On swift, healthcheck is under http://.../healthcheck, while in
-            # ceph is under http://.../swift/healthcheck, we check both cases
-            return_value = self._check_health_check('healthcheck')
-            if not return_value:
-                return_value = self._check_health_check('swift/healthcheck')
-            return return_value
+            # try all the paths at once, the first one which responds wins
+            path, _ = utils.first_success(self.healthcheck_paths,
+                                          self._check_health_check)
+            return path is not None
+
+    async def async_check_service_status(self, session, conf):
+        """Async counterpart of check_service_status."""
+        try:
+            return conf.get_bool_value(
+                conf.get('object-storage-feature-enabled', 'discoverability'))
+        except configparser.NoSectionError:
+            path, _ = await utils.async_first_success(
+                self.healthcheck_paths,
+                lambda path: self._async_check_health_check(session, path))
+            return path is not None
 
     def set_default_tempest_options(self, conf):
         """Set default values for swift
@@ -105,6 +162,11 @@ class ObjectStorageService(Service):
         if swift_status:
             self.list_create_roles(conf, self.client.roles)
 
+    async def async_set_default_tempest_options(self, session, conf):
+        swift_status = await self.async_check_service_status(session, conf)
+        if swift_status:
+            self.list_create_roles(conf, self.client.roles)
+
     @staticmethod
     def get_service_type():
         return ['object-store']
@@ -18,8 +18,10 @@ from config_tempest.services.base import VersionedService
 
 class LoadBalancerService(VersionedService):
 
-    def set_versions(self):
-        super(LoadBalancerService, self).set_versions(top_level=False)
+    __slots__ = ()
+
+    def get_versions_url(self):
+        return self.service_url, False
 
     def set_default_tempest_options(self, conf):
         conf.set('load_balancer', 'enable_security_groups', 'True')
@@ -21,6 +21,8 @@ from config_tempest.services.base import Service
 
 class OrchestrationService(Service):
 
+    __slots__ = ()
+
     @staticmethod
     def get_service_type():
         return ['orchestration']
@@ -14,21 +14,37 @@
 # under the License.
 
 
+import asyncio
+from concurrent import futures
 import importlib
 import pkgutil
-import pyclbr
 
 from six.moves import urllib
 
+from config_tempest import async_http
+from config_tempest import capabilities
 from config_tempest import constants as C
+from config_tempest import resilience
 from config_tempest.services import horizon
+from config_tempest.services import object_storage
+from config_tempest.tempest_conf import ListValue
 from tempest.lib import exceptions
 
 import config_tempest.services
 
 
 class Services(object):
-    def __init__(self, clients, conf, creds):
+    def __init__(self, clients, conf, creds,
+                 backend=C.DISCOVERY_BACKEND_SYNC, healthcheck_paths=None):
+        """Init method of Services.
+
+        :param backend: one of constants.DISCOVERY_BACKENDS, 'sync'
+                        discovers the services one by one, 'asyncio'
+                        discovers all of them concurrently in one event loop
+        :type backend: string
+        :param healthcheck_paths: additional paths of swift healthcheck API
+        :type healthcheck_paths: list
+        """
         self._clients = clients
         self._conf = conf
         self._creds = creds
@@ -36,10 +52,20 @@ class Services(object):
         self._region = clients.identity_region
         self._services = []
         self._service_classes = []
+        self._has_horizon = None
+        self._horizon_probe = None
+        self._healthcheck_paths = healthcheck_paths or []
         self.set_catalog_and_url()
         self.available_services = self.get_available_services()
 
-        self.discover()
+        if backend == C.DISCOVERY_BACKEND_ASYNCIO:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self.async_discover())
+            finally:
+                loop.close()
+        else:
+            self.discover()
 
     @property
     def service_classes(self):
@@ -52,10 +78,11 @@ class Services(object):
             prefix = config_tempest.services.__name__ + '.'
             for importer, modname, ispkg in pkgutil.walk_packages(
                     path=path, prefix=prefix, onerror=lambda x: None):
-                module_info = pyclbr.readmodule(modname)
-                for item in module_info.values():
-                    m = importlib.import_module(modname)
-                    c = getattr(m, item.name)
+                m = importlib.import_module(modname)
+                # classes defined in the module, in the order of its source
+                classes = [c for c in vars(m).values()
+                           if isinstance(c, type) and c.__module__ == modname]
+                for c in classes:
                     if issubclass(c, config_tempest.services.base.Service):
                         self._service_classes.append(c)
 
@@ -77,59 +104,184 @@ class Services(object):
                 return s
         return None
 
+    def get_service_name(self, s_type):
+        """Return the name of an available service of the given type.
+
+        :param s_type: type of a service
+        :type s_type: string
+        :return: name of the service or None if the type isn't available
+        :rtype: string or None
+        """
+        s_name = [t['name'] for t in self.available_services
+                  if t['type'] == s_type]
+        if not s_name:
+            return None
+        # In the general case, there should only be one service in
+        # a deployment per service type
+        # https://docs.openstack.org/keystone/latest/contributor/
+        # service-catalog.html#services
+        if len(s_name) > 1:
+            C.LOG.warning("There are more service names ('%s') for"
+                          " '%s' service type, which is undefined"
+                          " behavior. Continuing with '%s'.",
+                          str(s_name), s_type, s_name[0])
+        return s_name[0]
+
+    def get_service_url(self, s_name, s_type):
+        service_data = self.get_service_data(s_name, s_type)
+        if not service_data:
+            C.LOG.warning('No endpoint data found for {}'.format(s_name))
+            return None
+        return self.parse_endpoints(self.get_endpoints(service_data), s_type)
+
+    def create_service(self, s_class):
+        """Create an instance of a service class.
+
+        If the service isn't available, its availability is set to False
+        and None is returned.
+
+        :param s_class: class inheriting from base.Service
+        :rtype: base.Service or None
+        """
+        s_names = [(s_type, self.get_service_name(s_type))
+                   for s_type in s_class.get_service_type()]
+        s_names = [(s_type, s_name) for s_type, s_name in s_names
+                   if s_name]
+        if not s_names:
+            # service is not available
+            # quickly instantiate a class in order to set
+            # availability of the service
+            s = s_class(None, None, None, None, None)
+            s.set_availability(self._get_conf(None), False)
+            return None
+
+        # Versioned twins of a service, like volumev2 and volumev3, are
+        # discovered as one service. The newest available type is the
+        # primary one, the endpoints of the others are only added to it,
+        # so that the discovery common to them is done just once.
+        s_type, s_name = s_names[-1]
+        service = s_class(s_name, s_type,
+                          self.get_service_url(s_name, s_type),
+                          self.token, self._ssl_validation,
+                          self._clients.get_service_client(s_type))
+        for twin_type, twin_name in s_names[:-1]:
+            service.add_endpoint(
+                twin_type, self.get_service_url(twin_name, twin_type))
+        if isinstance(service, object_storage.ObjectStorageService):
+            service.add_healthcheck_paths(self._healthcheck_paths)
+        return service
+
+    def _set_unreachable(self, service, error, keys=None):
+        C.LOG.warning("Service '%s' is not reachable, it will be "
+                      "marked as unavailable: %s", service.s_type, error)
+        service.set_availability(self._get_conf(service, keys), False)
+
+    def _get_conf(self, service, keys=None):
+        """Return the conf attributing options set to the service.
+
+        :type service: Service object or None
+        :param keys: container the options set through the conf are added
+            to, see SourcedConf
+        :rtype: SourcedConf
+        """
+        if service is None:
+            return self._conf.with_source(C.SOURCE_DISCOVERY, keys=keys)
+        return self._conf.with_source(
+            '%s %s' % (C.SOURCE_DISCOVERY, service.s_type),
+            lambda: service.last_url, keys)
+
+    def get_conf(self, s_type):
+        """Return the conf attributing options set to a service type.
+
+        :type s_type: string
+        :rtype: SourcedConf
+        """
+        return self._get_conf(self.get_service(s_type))
+
+    def start_horizon_probe(self):
+        """Probe the dashboard in the background.
+
+        The result is needed only by post_configuration, so the probe runs
+        concurrently with the discovery of the services.
+        """
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        self._horizon_probe = executor.submit(
+            horizon.probe, horizon.get_dashboard_url(self._conf),
+            self._ssl_validation)
+        executor.shutdown(wait=False)
+
     def discover(self):
+        self.start_horizon_probe()
         # We loop through the classes we have for each service, and if we find
         # a class that match a service enabled, we add it in our services list.
         # some services doesn't have endpoints, so we need to check first
         for s_class in self.service_classes:
-            s_types = s_class.get_service_type()
-            for s_type in s_types:
-                s_name = [t['name'] for t in self.available_services
-                          if t['type'] == s_type]
-                if s_name:
-                    # In the general case, there should only be one service in
-                    # a deployment per service type
-                    # https://docs.openstack.org/keystone/latest/contributor/
-                    # service-catalog.html#services
-                    if len(s_name) > 1:
-                        C.LOG.warning("There are more service names ('%s') for"
-                                      " '%s' service type, which is undefined"
-                                      " behavior. Continuing with '%s'.",
-                                      str(s_name), s_type, s_name[0])
-                    s_name = s_name[0]
-                    service_data = self.get_service_data(s_name, s_type)
-                    url = None
-                    if not service_data:
-                        C.LOG.warning('No endpoint data found for {}'.format(
-                            s_name))
-                    else:
-                        url = self.parse_endpoints(self.get_endpoints(
-                            service_data), s_type)
-
-                    # Create the service class and add it to services list
-                    service = s_class(s_name, s_type, url, self.token,
-                                      self._ssl_validation,
-                                      self._clients.get_service_client(
-                                          s_type))
-                    # discover extensions of the service
-                    service.set_extensions()
-
-                    # discover versions of the service
-                    service.set_versions()
-                    self.merge_exts_multiversion_service(service)
-
-                    # default tempest options
-                    service.set_default_tempest_options(self._conf)
-
-                    service.set_availability(self._conf, True)
-
-                    self._services.append(service)
-                else:
-                    # service is not available
-                    # quickly instantiate a class in order to set
-                    # availability of the service
-                    s = s_class(None, None, None, None, None)
-                    s.set_availability(self._conf, False)
+            service = self.create_service(s_class)
+            if service is None:
+                continue
+            try:
+                # discover extensions of the service
+                service.set_extensions()
+
+                # discover versions of the service
+                service.set_versions()
+                self.merge_exts_multiversion_service(service)
+
+                # default tempest options
+                service.set_default_tempest_options(self._get_conf(service))
+            except resilience.EndpointUnavailable as e:
+                self._set_unreachable(service, e)
+                continue
+
+            service.set_availability(self._get_conf(service), True)
+
+            self._services.append(service)
+
+    async def async_discover(self):
+        """Discover all services concurrently.
+
+        Async counterpart of discover, the Horizon probe is run concurrently
+        with the discovery of the services too. The services set options in
+        the order their requests finish, the options are moved to the order
+        the synchronous discovery sets them in afterwards, so that both
+        backends write the same file.
+        """
+        old_keys = set(self._conf.get_keys())
+        old_sections = set(self._conf.sections())
+        # [(service or None, options set by the service)] in class order
+        services = []
+        for s_class in self.service_classes:
+            with self._conf.collect_keys(ListValue()) as keys:
+                services.append((self.create_service(s_class), keys))
+        discovered = [(s, keys) for s, keys in services if s is not None]
+        async with async_http.AsyncSession(self._ssl_validation) as session:
+            horizon_probe = asyncio.ensure_future(horizon.async_probe(
+                session, horizon.get_dashboard_url(self._conf)))
+            available = await asyncio.gather(
+                *[self._async_discover_service(session, s, keys)
+                  for s, keys in discovered])
+            self._has_horizon = await horizon_probe
+        for (service, keys), is_available in zip(discovered, available):
+            if is_available:
+                service.set_availability(self._get_conf(service, keys), True)
+                self._services.append(service)
+        new_keys = ListValue()
+        for _, keys in services:
+            new_keys.update(k for k in keys if k not in old_keys)
+        self._conf.reorder(ListValue(s for s, _ in new_keys
+                                     if s not in old_sections), new_keys)
+
+    async def _async_discover_service(self, session, service, keys):
+        try:
+            await service.async_set_extensions(session)
+            await service.async_set_versions(session)
+            self.merge_exts_multiversion_service(service)
+            await service.async_set_default_tempest_options(
+                session, self._get_conf(service, keys))
+        except resilience.EndpointUnavailable as e:
+            self._set_unreachable(service, e, keys)
+            return False
+        return True
 
     def merge_exts_multiversion_service(self, service):
         """Merges extensions of a service given by its name
@@ -144,7 +296,11 @@ class Services(object):
         services_lst = []
         for v in versions:
             if self.is_service(**{'type': service_type + v}):
-                services_lst.append(self.get_service(service_type + v))
+                twin = self.get_service(service_type + v)
+                # versioned twins may be the very same object, twins which
+                # weren't reachable weren't discovered
+                if twin is not None and twin is not service:
+                    services_lst.append(twin)
         services_lst.append(service)
         service.extensions = self.merge_extensions(services_lst)
 
@@ -217,7 +373,7 @@ class Services(object):
         :return: Service object
         """
         for service in self._services:
-            if service.s_type == s_type:
+            if service.s_type == s_type or s_type in service.endpoints:
                 return service
         return None
 
@@ -239,11 +395,53 @@ class Services(object):
             return False
         return False
 
+    def _get_pools(self, service):
+        try:
+            return service.get_pools()
+        except exceptions.Forbidden:
+            C.LOG.warning("User has no permissions to list back-end storage "
+                          "pools of %s - storage back-ends can't be "
+                          "discovered.", service.s_type)
+            return []
+
+    def discover_capabilities(self):
+        """Discover storage back-ends and their capabilities.
+
+        Pools of all the storage services, f.e. cinder and manila, are
+        listed concurrently with their capabilities into one table, the
+        services set their options from it.
+
+        :rtype: config_tempest.capabilities.CapabilityTable
+        """
+        services = [s for s in self._services if s.pools_path is not None]
+        table = capabilities.CapabilityTable()
+        if not services:
+            return table
+        with futures.ThreadPoolExecutor(max_workers=len(services)) as executor:
+            all_pools = list(executor.map(self._get_pools, services))
+        for service, pools in zip(services, all_pools):
+            for pool in pools:
+                table.add(service.get_feature_name(),
+                          service.get_pool_backend(pool),
+                          pool.get('capabilities', {}))
+        for service in services:
+            service.set_capabilities(self._get_conf(service), table)
+        return table
+
     def post_configuration(self):
+        self.post_configure_services()
+        self.configure_horizon()
+
+    def post_configure_services(self):
         for s in self._services:
-            s.post_configuration(self._conf, self.is_service)
+            s.post_configuration(self._get_conf(s), self.is_service)
 
-        horizon.configure_horizon(self._conf)
+    def configure_horizon(self):
+        if self._has_horizon is None and self._horizon_probe is not None:
+            self._has_horizon = self._horizon_probe.result()
+        horizon.configure_horizon(
+            self._conf.with_source(C.SOURCE_DISCOVERY + ' dashboard'),
+            self._has_horizon)
 
     def set_supported_api_versions(self):
         # set supported API versions for services with more of them
@@ -255,7 +453,7 @@ class Services(object):
                 for s_version in supported_versions:
                     is_supported = any(s_version in item
                                        for item in versions)
-                    self._conf.set(
+                    self._get_conf(service).set(
                         section, 'api_' + s_version, str(is_supported))
 
     def merge_extensions(self, service_objects):
@@ -263,14 +461,15 @@ class Services(object):
 
         :param service_objects:
         :type service_objects: list
-        :return: Merged extensions
+        :return: Merged extensions without duplicates, in the order of
+            the service objects
         :rtype: list
         """
-        extensions = []
+        extensions = ListValue()
         for o in service_objects:
             if o:
-                extensions += o.extensions
-        return extensions
+                extensions.update(o.extensions)
+        return list(extensions)
 
     def set_service_extensions(self):
         postfix = "-feature-enabled"
@@ -279,12 +478,14 @@ class Services(object):
                                                         'api_v3')
         except ValueError:
             keystone_v3_support = False
-        if keystone_v3_support:
-            self.get_service('identity').set_identity_v3_extensions()
+        identity = self.get_service('identity')
+        if keystone_v3_support and identity is not None:
+            identity.set_identity_v3_extensions()
 
         for service in self._services:
             ext_key = service.get_service_extension_key()
             if ext_key:
-                extensions = ','.join(service.get_extensions())
+                extensions = ListValue(service.get_extensions())
                 service_name = service.get_feature_name()
-                self._conf.set(service_name + postfix, ext_key, extensions)
+                self._get_conf(service).set(service_name + postfix, ext_key,
+                                            extensions)
@@ -13,40 +13,56 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import json
-
 from config_tempest import constants as C
 from config_tempest.services.base import VersionedService
 
-from tempest.lib import exceptions
+# options of manila-tempest-plugin set from the capabilities of the pools,
+# [(key, capability)]
+SHARE_CAPABILITY_OPTIONS = [
+    ('capability_snapshot_support', 'snapshot_support'),
+    ('capability_create_share_from_snapshot_support',
+     'create_share_from_snapshot_support'),
+    ('run_revert_to_snapshot_tests', 'revert_to_snapshot_support'),
+    ('run_mount_snapshot_tests', 'mount_snapshot_support'),
+]
 
 
 class ShareService(VersionedService):
+    __slots__ = ()
 
-    def get_share_pools(self):
-        body = self.do_get(self.service_url + '/scheduler-stats/pools')
-        body = json.loads(body)
-        return body
+    pools_path = '/scheduler-stats/pools/detail'
 
     def set_default_tempest_options(self, conf):
+        self.set_microversions(conf)
+
+    def set_microversions(self, conf):
         if 'v2' in self.service_url:
-            m_vs = self.filter_api_microversions()
-            conf.set('share', 'min_api_microversion', m_vs['min_microversion'])
-            conf.set('share', 'max_api_microversion', m_vs['max_microversion'])
-
-        try:
-            pools = self.get_share_pools()['pools']
-        except exceptions.Forbidden:
-            C.LOG.warning("User has no permissions to list back-end storage "
-                          "pools - storage back-ends can't be discovered.")
+            self.set_microversion_options(conf, 'share',
+                                          '%s_api_microversion')
+
+    def get_pool_backend(self, pool):
+        return pool['backend']
+
+    def set_capabilities(self, conf, table):
+        backends = table.get_backends('share')
+        if not backends:
             return
-        if pools:
-            backends = [
-                pool['backend'] for pool in pools
-            ]
-            conf.set('share', 'backend_names', ','.join(backends))
-            if len(backends) > 1:
-                conf.set('share', 'multi_backend', 'True')
+        conf.set('share', 'backend_names', backends)
+        if len(backends) > 1:
+            conf.set('share', 'multi_backend', 'True')
+        for key, capability in SHARE_CAPABILITY_OPTIONS:
+            conf.set('share', key,
+                     str(table.supports('share', capability)))
+        replication_types = [t for t in table.get_values('share',
+                                                         'replication_type')
+                             if t]
+        if replication_types:
+            conf.set('share', 'run_replication_tests', 'True')
+            conf.set('share', 'backend_replication_type',
+                     replication_types[0])
+        thin = table.get_backends('share', 'thin_provisioning')
+        C.LOG.info("Share back-ends with thin provisioning: %s",
+                   thin or 'none')
 
     def get_unversioned_service_type(self):
         return 'share'
@@ -14,7 +14,6 @@
 # under the License.
 
 import json
-import re
 
 from config_tempest import constants as C
 from config_tempest.services.base import VersionedService
@@ -23,42 +22,54 @@ from tempest.lib import exceptions
 
 
 class VolumeService(VersionedService):
+    __slots__ = ()
+
+    pools_path = '/scheduler-stats/get_pools?detail=true'
+
     def set_extensions(self):
         body = self.do_get(self.service_url + '/extensions')
-        body = json.loads(body)
-        self.extensions = list(map(lambda x: x['alias'], body['extensions']))
+        self.set_extensions_body(body)
 
-    def set_versions(self):
-        url, top_level = self.no_port_cut_url()
-        body = self.do_get(url, top_level=top_level)
-        self.versions_body = json.loads(body)
-        self.versions = self.deserialize_versions(self.versions_body)
+    async def async_set_extensions(self, session):
+        body = await self.async_do_get(session,
+                                       self.service_url + '/extensions')
+        self.set_extensions_body(body)
 
-    def get_volume_pools(self):
-        body = self.do_get(self.service_url + '/scheduler-stats/get_pools')
+    def set_extensions_body(self, body):
         body = json.loads(body)
-        return body
+        self.extensions = list(map(lambda x: x['alias'], body['extensions']))
+
+    def get_versions_url(self):
+        return self.no_port_cut_url()
 
     def set_default_tempest_options(self, conf):
-        if 'v3' in self.service_url:
-            m_vs = self.filter_api_microversions()
-            conf.set('volume', 'min_microversion', m_vs['min_microversion'])
-            conf.set('volume', 'max_microversion', m_vs['max_microversion'])
+        self.set_microversions(conf)
 
-        try:
-            pools = self.get_volume_pools()['pools']
-        except exceptions.Forbidden:
-            C.LOG.warning("User has no permissions to list back-end storage "
-                          "pools - storage back-ends can't be discovered.")
+    def set_microversions(self, conf):
+        if 'v3' in self.service_url:
+            self.set_microversion_options(conf, 'volume')
+
+    def get_pool_backend(self, pool):
+        capabilities = pool.get('capabilities', {})
+        if capabilities.get('volume_backend_name'):
+            return capabilities['volume_backend_name']
+        # name of a pool is host@backend#pool
+        return pool['name'].partition('@')[2].partition('#')[0]
+
+    def set_capabilities(self, conf, table):
+        backends = table.get_backends('volume')
+        if not backends:
             return
-        if pools:
-            backends = [
-                re.findall(r'(\w*)@(\w*)', pool['name'])[0][1]
-                for pool in pools
-            ]
-            conf.set('volume', 'backend_names', ','.join(backends))
-            if len(backends) > 1:
-                conf.set('volume-feature-enabled', 'multi_backend', 'True')
+        conf.set('volume', 'backend_names', backends)
+        if len(backends) > 1:
+            conf.set('volume-feature-enabled', 'multi_backend', 'True')
+        if table.supports('volume', 'replication_enabled'):
+            conf.set('volume-feature-enabled', 'replication', 'True')
+        if table.supports('volume', 'multiattach'):
+            conf.set('compute-feature-enabled', 'volume_multiattach', 'True')
+        thin = table.get_backends('volume', 'thin_provisioning_support')
+        C.LOG.info("Volume back-ends with thin provisioning: %s",
+                   thin or 'none')
 
     def get_service_extension_key(self):
         return 'api_extensions'
@@ -101,9 +112,4 @@ class VolumeService(VersionedService):
             if not service or service[0]['state'] == 'down':
                 conf.set('volume-feature-enabled', 'backup', 'False')
             else:
-                # post_configuration method is called with every volume (v2,
-                # v3) service, therefore set the value with priority so that it
-                # can't be overrided by this method called from other instance
-                # of volume service
-                conf.set('volume-feature-enabled', 'backup', 'True',
-                         priority=True)
+                conf.set('volume-feature-enabled', 'backup', 'True')
@@ -13,28 +13,212 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import contextlib
+import difflib
+import hashlib
 import os
 import six
 import sys
+import threading
+import time
 
 from config_tempest import constants as C
-from oslo_config import cfg
+from config_tempest import schema
+from config_tempest import utils
 from six.moves import configparser
-import tempest.config
+
+
+class OptionSource(object):
+    """Where the value of an option comes from.
+
+    There is one instance per option, hence the slots.
+    """
+
+    __slots__ = ('layer', 'timestamp', 'response')
+
+    def __init__(self, layer=None, response=None, timestamp=None):
+        """Init method of OptionSource.
+
+        :param layer: f.e. constants.SOURCE_DEFAULT or 'discovery compute'
+        :type layer: string or None
+        :param response: url of the HTTP response the value is based on
+        :type response: string or None
+        :param timestamp: time the value was set, now if not given
+        :type timestamp: float
+        """
+        self.layer = layer
+        self.response = response
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def __repr__(self):
+        return "OptionSource(%r, response=%r)" % (self.layer, self.response)
+
+
+class ListValue(object):
+    """Value of a list option, f.e. api_extensions.
+
+    The items are kept as an ordered set, in the order they were added and
+    without duplicates, so that the option is the same run to run. Union
+    and difference don't split and join strings, the value is converted to
+    the comma separated string only when it's set to TempestConf.
+    """
+
+    __slots__ = ('_items',)
+
+    def __init__(self, items=()):
+        # dict keeps the order of its keys, it's used as an ordered set
+        self._items = dict.fromkeys(items)
+
+    @classmethod
+    def parse(cls, value):
+        """Return the list value of a comma separated string.
+
+        :type value: string
+        :rtype: ListValue
+        """
+        return cls(item for item in value.split(',') if item)
+
+    def add(self, item):
+        """Add an item if it's not present yet, in place."""
+        self._items.setdefault(item)
+
+    def update(self, items):
+        """Add items which are not present yet, in place."""
+        self._items.update(dict.fromkeys(items))
+
+    def __or__(self, items):
+        union = ListValue(self._items)
+        union.update(items)
+        return union
+
+    def __sub__(self, items):
+        if not isinstance(items, (set, frozenset, dict, ListValue)):
+            items = set(items)
+        return ListValue(item for item in self._items if item not in items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __eq__(self, other):
+        if isinstance(other, ListValue):
+            return list(self._items) == list(other._items)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __str__(self):
+        return ','.join(self._items)
+
+    def __repr__(self):
+        return "ListValue(%r)" % list(self._items)
+
+
+class ValuesPlan(object):
+    """Values to be removed from and appended to a list option.
+
+    The values of the option are handled as a ListValue, the order of the
+    existing values is kept and the appended ones follow in the order they
+    were given, values already present are not duplicated.
+    """
+
+    __slots__ = ('remove_all', 'removed', 'appended')
+
+    def __init__(self):
+        self.remove_all = False
+        self.removed = set()
+        self.appended = ListValue()
+
+    def remove(self, values):
+        """Add values to be removed, all of them if values is empty."""
+        if not values:
+            self.remove_all = True
+        self.removed.update(values)
+
+    def append(self, values):
+        self.appended.update(values)
+
+    def apply(self, values):
+        """Return the values of an option after the changes.
+
+        :param values: current values of the option
+        :type values: ListValue
+        :return: new values or None if the option is to be removed, which
+            happens when all values are removed or when the only value of
+            the option is removed and nothing is appended
+        :rtype: ListValue or None
+        """
+        if self.remove_all:
+            return None
+        kept = (values - self.removed) | self.appended
+        if not kept and len(values) == 1:
+            return None
+        return kept
+
+
+class SourcedConf(object):
+    """View of a TempestConf which attributes the options set to a layer.
+
+    It's passed instead of the TempestConf object to the code setting
+    options on behalf of the layer, f.e. to a service, other attributes
+    are the ones of the TempestConf object.
+    """
+
+    def __init__(self, conf, layer, response=None, keys=None):
+        """Init method of SourcedConf.
+
+        :type conf: TempestConf object
+        :type layer: string
+        :param response: url of the HTTP response the options are based on
+            or a callable returning it at the time an option is set
+        :type response: string, callable or None
+        :param keys: container `(section, key)` pairs written through the
+            view are added to, like TempestConf.collect_keys but not bound
+            to a thread
+        """
+        self._conf = conf
+        self._layer = layer
+        self._response = response
+        self._keys = keys
+
+    def set(self, section, key, value, priority=False):
+        response = self._response
+        if callable(response):
+            response = response()
+        written = self._conf.set(section, key, value, priority,
+                                 layer=self._layer, response=response)
+        if written and self._keys is not None:
+            self._keys.add((section, key))
+        return written
+
+    def __getattr__(self, name):
+        return getattr(self._conf, name)
 
 
 class TempestConf(configparser.SafeConfigParser):
     # causes the config parser to preserve case of the options
     optionxform = str
 
-    # set of pairs `(section, key)` which have a higher priority (are
-    # user-defined) and will usually not be overwritten by `set()`
-    priority_sectionkeys = set()
-
-    CONF = tempest.config.TempestConfigPrivate(parse_conf=False)
-
     def __init__(self, write_credentials=True, **kwargs):
         self.write_credentials = write_credentials
+        # set of pairs `(section, key)` which have a higher priority (are
+        # user-defined) and will usually not be overwritten by `set()`
+        self.priority_sectionkeys = set()
+        # {(section, key): OptionSource}
+        self.sources = {}
+        # collectors of the keys set are per thread, so that options set by
+        # stages running at the same time are attributed correctly
+        self._local = threading.local()
+        # stages running at the same time share the parser, its changes and
+        # walks over all the options are serialized
+        self._lock = threading.RLock()
         if six.PY3:
             configparser.ConfigParser.__init__(self, **kwargs)
         else:
@@ -66,111 +250,266 @@ class TempestConf(configparser.SafeConfigParser):
         :returns: default value for the section.key pair
         :rtype: String
         """
+        if self.has_option(section, key):
+            return self.get(section, key)
         try:
-            if self.has_option(section, key):
-                return self.get(section, key)
-            else:
-                return self.CONF.get(section).get(key)
-        except cfg.NoSuchOptError:
+            return schema.get_schema().get_default(section, key)
+        except KeyError:
             C.LOG.warning("Option %s is not defined in %s section",
                           key, section)
 
-    def set(self, section, key, value, priority=False):
+    def set(self, section, key, value, priority=False, layer=None,
+            response=None):
         """Set value in configuration, similar to `SafeConfigParser.set`
 
         Creates non-existent sections. Keeps track of options which were
-        specified by the user and should not be normally overwritten.
+        specified by the user and should not be normally overwritten and
+        of the sources of the options.
 
         :param section: a section in a tempest.conf file
         :type section: String
         :param key: a key in a section in a tempest.conf file
         :type key: String
         :param value: a value to be set to the section.key
-        :type value: String
+        :type value: String or ListValue
         :param priority: if True, always over-write the value. If False, don't
             over-write an existing value if it was written before with a
             priority (i.e. if it was specified by the user)
         :type priority: Boolean
+        :param layer: layer the value comes from, f.e.
+            constants.SOURCE_DEPLOYER_INPUT
+        :type layer: String
+        :param response: url of the HTTP response the value is based on
+        :type response: String
         :returns: True if the value was written, False if not (because of
             priority)
         :rtype: Boolean
         """
-        if not self.has_section(section) and section.lower() != "default":
-            self.add_section(section)
-        if not priority and (section, key) in self.priority_sectionkeys:
-            C.LOG.debug("Option '[%s] %s = %s' was defined by user, NOT"
-                        " overwriting into value '%s'", section, key,
-                        self.get(section, key), value)
-            return False
-        if priority:
-            self.priority_sectionkeys.add((section, key))
-        C.LOG.debug("Setting [%s] %s = %s", section, key, value)
-        if six.PY3:
-            configparser.ConfigParser.set(self, section, key, value)
-        else:
-            configparser.SafeConfigParser.set(self, section, key, value)
-        return True
+        with self._lock:
+            if not self.has_section(section) and section.lower() != "default":
+                self.add_section(section)
+            if not priority and (section, key) in self.priority_sectionkeys:
+                C.LOG.debug("Option '[%s] %s = %s' was defined by user, NOT"
+                            " overwriting into value '%s'", section, key,
+                            self.get(section, key), value)
+                return False
+            if priority:
+                self.priority_sectionkeys.add((section, key))
+            for keys in self._collectors:
+                keys.add((section, key))
+            self.sources[(section, key)] = OptionSource(layer, response)
+            if isinstance(value, ListValue):
+                value = str(value)
+            C.LOG.debug("Setting [%s] %s = %s (%s)", section, key, value,
+                        layer or 'unknown source')
+            if six.PY3:
+                configparser.ConfigParser.set(self, section, key, value)
+            else:
+                configparser.SafeConfigParser.set(self, section, key, value)
+            return True
 
-    def write(self, out_path):
-        C.LOG.info("Creating configuration file %s", os.path.abspath(out_path))
+    def add_section(self, section):
+        with self._lock:
+            if six.PY3:
+                configparser.ConfigParser.add_section(self, section)
+            else:
+                configparser.SafeConfigParser.add_section(self, section)
+
+    def remove_option(self, section, key):
+        with self._lock:
+            self.sources.pop((section, key), None)
+            if six.PY3:
+                return configparser.ConfigParser.remove_option(self, section,
+                                                               key)
+            return configparser.SafeConfigParser.remove_option(self, section,
+                                                               key)
+
+    def get_source(self, section, key):
+        """Return the source of the option.
+
+        :rtype: OptionSource or None if the option wasn't set by `set()`
+        """
+        return self.sources.get((section, key))
+
+    def with_source(self, layer, response=None, keys=None):
+        """Return a view of the conf attributing options set to a layer.
+
+        See SourcedConf.
+
+        :rtype: SourcedConf
+        """
+        return SourcedConf(self, layer, response, keys)
+
+    @property
+    def _collectors(self):
+        collectors = getattr(self._local, 'collectors', None)
+        if collectors is None:
+            collectors = self._local.collectors = []
+        return collectors
+
+    @contextlib.contextmanager
+    def collect_keys(self, keys=None):
+        """Collect options set within the context by the current thread.
+
+        :param keys: container the keys are added to, f.e. a ListValue to
+            keep their order, a new set if not given
+        :return: `(section, key)` pairs which were written by `set()`
+            while the context was active, it's filled in place
+        :rtype: set or the type of keys
+        """
+        if keys is None:
+            keys = set()
+        self._collectors.append(keys)
+        try:
+            yield keys
+        finally:
+            self._collectors.remove(keys)
+
+    def get_keys(self):
+        """Return all options in the order they are written in.
+
+        :return: `(section, key)` pairs, options inherited from the DEFAULT
+            section are not repeated in the other sections
+        :rtype: list
+        """
+        with self._lock:
+            keys = [(self.default_section, key) for key in self._defaults]
+            for section, options in self._sections.items():
+                keys += [(section, key) for key in options]
+            return keys
+
+    def reorder(self, sections, keys):
+        """Move sections and options to the end in the given order.
+
+        Used to write options set by stages running at the same time in
+        the order they would be set in if the stages ran one by one. Those
+        which don't exist are skipped.
+
+        :param sections: names of sections
+        :type sections: iterable
+        :param keys: `(section, key)` pairs, each option is moved to the end
+            of its section
+        :type keys: iterable
+        """
+        with self._lock:
+            for section in sections:
+                if section in self._sections:
+                    self._sections[section] = self._sections.pop(section)
+            for section, key in keys:
+                if section == self.default_section:
+                    options = self._defaults
+                else:
+                    options = self._sections.get(section, {})
+                if key in options:
+                    options[key] = options.pop(key)
+
+    def to_string(self):
+        """Return the configuration in the format of tempest.conf.
+
+        :rtype: String
+        """
+        with self._lock:
+            out = six.StringIO()
+            if six.PY3:
+                configparser.ConfigParser.write(self, out)
+            else:
+                configparser.SafeConfigParser.write(self, out)
+            return out.getvalue()
+
+    def write(self, out_path, show_diff=False):
+        """Write the configuration to a file.
+
+        The file is replaced atomically and only if its content changes.
+
+        :param out_path: path of the file
+        :type out_path: String
+        :param show_diff: print a unified diff against the previous content
+            of the file to the standard output
+        :type show_diff: Boolean
+        :returns: True if the file was written, False if it was up to date
+        :rtype: Boolean
+        """
         if not self.write_credentials:
             C.LOG.info("Credentials will not be printed to a tempest.conf, "
                        "writing credentials is disabled.")
             self.remove_values(C.ALL_CREDENTIALS_KEYS)
-        with open(out_path, 'w') as f:
-            if six.PY3:
-                configparser.ConfigParser.write(self, f)
-            else:
-                configparser.SafeConfigParser.write(self, f)
+        content = self.to_string()
+        previous_hash = utils.get_file_hash(out_path)
+        if show_diff:
+            self._print_diff(out_path, content, previous_hash is not None)
+        new_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        if new_hash == previous_hash:
+            C.LOG.info("Configuration file %s is up to date, not rewriting "
+                       "it", os.path.abspath(out_path))
+            return False
+        C.LOG.info("Creating configuration file %s", os.path.abspath(out_path))
+        utils.write_atomic(out_path, content)
+        return True
+
+    @staticmethod
+    def _print_diff(out_path, content, exists):
+        previous = []
+        if exists:
+            with open(out_path) as f:
+                previous = f.readlines()
+        sys.stdout.writelines(difflib.unified_diff(
+            previous, content.splitlines(True),
+            fromfile=out_path if exists else '/dev/null', tofile=out_path))
 
-    def remove_values(self, to_remove):
+    def remove_values(self, to_remove, layer=None):
         """Remove values from configuration file specified in arguments.
 
         :param to_remove: {'section.key': [values_to_be_removed], ...}
         :type to_remove: dict
+        :param layer: layer the removal comes from
+        :type layer: String
         """
-        for key_path in to_remove:
-            section, key = key_path.split('.')
-            try:
-                conf_values = self.get(section, key).split(',')
-                remove = to_remove[key_path]
-                if len(remove) == 0:
-                    # delete all values in section.key
-                    self.remove_option(section, key)
-                elif len(conf_values) == 1:
-                    # make sure only the value specified by user
-                    # will be deleted if in the key is other value
-                    # than expected, ignore it
-                    if conf_values[0] in to_remove[key_path]:
-                        self.remove_option(section, key)
-                else:
-                    # exclude all unwanted values from the list
-                    # and preserve the original order of items
-                    conf_values = [v for v in conf_values if v not in remove]
-                    self.set(section, key, ",".join(conf_values))
-            except configparser.NoOptionError:
-                # only inform a user, option specified by him doesn't exist
-                C.LOG.error(sys.exc_info()[1])
-            except configparser.NoSectionError:
-                # only inform a user, section specified by him doesn't exist
-                C.LOG.error(sys.exc_info()[1])
-
-    def append_values(self, to_append):
+        self.update_values(to_remove=to_remove, layer=layer)
+
+    def append_values(self, to_append, layer=None):
         """Appends values to configuration file specified in arguments.
 
         :param to_append: {'section.key': [values_to_be_added], ...}
         :type to_append: dict
+        :param layer: layer the appended values come from
+        :type layer: String
         """
-        for key_path in to_append:
-            section, key = key_path.split('.')
-            try:
-                conf_val = self.get(section, key).split(',')
-                # omit duplicates if found any
-                conf_val += list(set(to_append[key_path]) - set(conf_val))
-                self.set(section, key, ",".join(conf_val))
-            except configparser.NoOptionError:
-                # only inform a user, option specified by him doesn't exist
-                C.LOG.error(sys.exc_info()[1])
-            except configparser.NoSectionError:
-                # only inform a user, section specified by him doesn't exist
-                C.LOG.error(sys.exc_info()[1])
+        self.update_values(to_append=to_append, layer=layer)
+
+    def update_values(self, to_remove=None, to_append=None, layer=None):
+        """Remove and append values of options in one pass.
+
+        A plan is compiled for every option first, so that an option is
+        read and written back at most once however many values are removed
+        from and appended to it. Removals are applied before appends.
+
+        :param to_remove: {'section.key': [values_to_be_removed], ...}, all
+            values, i.e. the option, are removed if the list is empty
+        :type to_remove: dict
+        :param to_append: {'section.key': [values_to_be_added], ...}
+        :type to_append: dict
+        :param layer: layer the changes come from
+        :type layer: String
+        """
+        with self._lock:
+            plans = {}
+            for key_path, values in (to_remove or {}).items():
+                plans.setdefault(key_path, ValuesPlan()).remove(values)
+            for key_path, values in (to_append or {}).items():
+                plans.setdefault(key_path, ValuesPlan()).append(values)
+            for key_path, plan in plans.items():
+                section, key = key_path.split('.')
+                try:
+                    conf_values = ListValue.parse(self.get(section, key))
+                except (configparser.NoOptionError,
+                        configparser.NoSectionError):
+                    # only inform a user, option specified by him doesn't exist
+                    C.LOG.error(sys.exc_info()[1])
+                    continue
+                values = plan.apply(conf_values)
+                if values is None:
+                    self.remove_option(section, key)
+                elif values != conf_values:
+                    # values which can't be changed because the option was
+                    # defined by the user are kept by set()
+                    self.set(section, key, values, layer=layer)
@@ -17,6 +17,7 @@
 
 from unittest import mock
 
+import asyncio
 from fixtures import MonkeyPatch
 import json
 import logging
@@ -30,6 +31,15 @@ from config_tempest import tempest_conf
 logging.disable(logging.CRITICAL)
 
 
+def run_async(coroutine):
+    """Run a coroutine in a new event loop and return its result."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
 class BaseConfigTempestTest(base.BaseTestCase):
 
     """Test case base class for all config_tempest unit tests"""
@@ -288,6 +298,23 @@ class BaseServiceTest(base.BaseTestCase):
         def list_services(self, **kwargs):
             return self.services
 
+    class FakeAsyncSession(object):
+        """Session of the asyncio backend serving responses from a dict.
+
+        :param responses: {url: (status, data), ...}, data are serialized
+                          to json if they aren't bytes
+        """
+        def __init__(self, responses):
+            self.responses = responses
+            self.requests = []
+
+        async def get(self, url, headers=None):
+            self.requests.append(url)
+            status, data = self.responses[url]
+            if not isinstance(data, bytes):
+                data = json.dumps(data).encode('utf-8')
+            return status, data
+
     def _fake_service_do_get_method(self, fake_data):
         function2mock = 'config_tempest.services.base.Service.do_get'
         do_get_output = json.dumps(fake_data)
@@ -0,0 +1,78 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Fixture running config_tempest() against a fake cloud.
+
+The fixture runs config_tempest.fake_cloud.FakeCloud for the time of a test
+and runs config_tempest() against it in a temporary directory::
+
+    cloud = self.useFixture(FakeCloudFixture(networks=100))
+    options = cloud.run(stage_workers=1)
+    self.assertEqual(options[('compute', 'flavor_ref')], '1000')
+"""
+
+import os
+
+import fixtures
+
+from config_tempest import compare
+from config_tempest.fake_cloud import FakeCloud
+from config_tempest import main
+
+
+class FakeCloudFixture(fixtures.Fixture):
+    """FakeCloud running for the time of a test.
+
+    The keyword arguments are passed to FakeCloud. The fixture switches to
+    a temporary directory, so that files written by a run, f.e. the output
+    file or images, don't leak from the test, and a deployer input of the
+    user doesn't affect the run.
+    """
+
+    def __init__(self, **kwargs):
+        super(FakeCloudFixture, self).__init__()
+        self.cloud_kwargs = kwargs
+        self.cloud = None
+        self.workdir = None
+
+    def _setUp(self):
+        self.workdir = self.useFixture(fixtures.TempDir()).path
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        self.addCleanup(os.chdir, cwd)
+        self.useFixture(fixtures.MonkeyPatch(
+            'config_tempest.constants.DEPLOYER_INPUT',
+            os.path.join(self.workdir, 'deployer-input.conf')))
+        self.cloud = FakeCloud(**self.cloud_kwargs)
+        self.cloud.start()
+        self.addCleanup(self.cloud.stop)
+
+    @property
+    def out(self):
+        """Default path of the output file."""
+        return os.path.join(self.workdir, 'tempest.conf')
+
+    def run(self, **kwargs):
+        """Run config_tempest against the cloud.
+
+        :param kwargs: arguments of config_tempest, the credentials of the
+                       cloud and the output file are filled in if missing
+        :return: the written options, see config_tempest.compare.normalize
+        :rtype: dict
+        """
+        kwargs.setdefault('cloud_creds', self.cloud.cloud_creds)
+        kwargs.setdefault('out', self.out)
+        main.config_tempest(**kwargs)
+        return compare.read(kwargs['out'])
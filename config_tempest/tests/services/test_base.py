@@ -13,11 +13,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
 from unittest import mock
 
+from tempest.lib import exceptions
+
+from config_tempest.services import base
 from config_tempest.services.base import Service
 from config_tempest.services.base import VersionedService
 from config_tempest.tests.base import BaseServiceTest
+from config_tempest.tests.base import run_async
 
 
 class TestService(BaseServiceTest):
@@ -36,7 +41,7 @@ class TestService(BaseServiceTest):
                                           self.FAKE_HEADERS)
         return expected_resp.data.decode('utf-8')
 
-    @mock.patch('config_tempest.services.base.urllib3')
+    @mock.patch('config_tempest.resilience.urllib3')
     def test_do_get(self, mock_urllib3):
         mock_http = mock.Mock()
         mock_r = mock.Mock()
@@ -48,6 +53,19 @@ class TestService(BaseServiceTest):
         expected_resp = self._mocked_do_get(mock_urllib3)
         self.assertEqual(resp, expected_resp)
 
+    def test_async_do_get(self):
+        session = self.FakeAsyncSession({
+            'http://10.200.16.10:8774/info': (200, {'swift': {}})})
+        resp = run_async(self.Service.async_do_get(
+            session, self.FAKE_URL + 'v1/AUTH_x', top_level=True,
+            top_level_path='info'))
+        self.assertEqual(resp, '{"swift": {}}')
+
+    def test_async_do_get_forbidden(self):
+        session = self.FakeAsyncSession({self.FAKE_URL: (403, b'')})
+        self.assertRaises(exceptions.Forbidden, run_async,
+                          self.Service.async_do_get(session, self.FAKE_URL))
+
     def test_service_properties(self):
         self.assertEqual(self.Service.name, "ServiceName")
         self.assertEqual(self.Service.service_url, self.FAKE_URL)
@@ -57,6 +75,11 @@ class TestService(BaseServiceTest):
         self.assertEqual(self.Service.extensions, [])
         self.assertEqual(self.Service.versions, [])
 
+    def test_headers(self):
+        self.Service.token = 'new token'
+        self.assertEqual(self.Service.headers['X-Auth-Token'], 'new token')
+        self.assertRaises(AttributeError, setattr, self.Service, 'body', {})
+
     def test_set_extensions(self):
         self.Service.extensions = ['ext']
         self.Service.set_extensions()
@@ -93,6 +116,14 @@ class TestVersionedService(BaseServiceTest):
         self.assertItemsEqual(resp, expected_resp)
         self.assertItemsEqual(self.Service.versions, expected_resp)
 
+    def test_set_versions_body(self):
+        self.Service.set_versions_body(json.dumps(self.FAKE_VERSIONS))
+        self.assertEqual(self.Service.versions, ['v2.0', 'v2.1'])
+        self.assertEqual(self.Service.get_max_microversion().get_string(),
+                         '2.41')
+        # only the data derived from the body is kept
+        self.assertFalse(hasattr(self.Service, 'versions_body'))
+
     def test_deserialize_versions(self):
         expected_resp = ['v2.0', 'v2.1']
         self._test_deserialize_versions(self.Service,
@@ -109,3 +140,50 @@ class TestVersionedService(BaseServiceTest):
         self.Service.service_url = url + "/v3/cut/it/off"
         resp = self.Service.no_port_cut_url()
         self.assertEqual(resp, (url + '/', False))
+
+    def _set_versions(self, versions):
+        self.Service.set_versions_body(json.dumps({'versions': versions}))
+
+    def test_filter_api_microversions(self):
+        self._set_versions([
+            {'id': 'v2.0', 'status': 'SUPPORTED', 'version': '',
+             'min_version': ''},
+            {'id': 'v2.1', 'status': 'CURRENT', 'version': '2.10',
+             'min_version': '2.1'},
+            {'id': 'v1.0', 'status': 'DEPRECATED', 'version': '1.99',
+             'min_version': '1.0'}])
+        # compared as numbers, not as strings, versions without
+        # microversions and deprecated versions are left out
+        self.assertEqual(self.Service.filter_api_microversions(),
+                         {'max_microversion': '2.10',
+                          'min_microversion': '2.1'})
+
+    def test_filter_api_microversions_none(self):
+        self._set_versions([{'id': 'v2.0', 'status': 'CURRENT'}])
+        self.assertEqual(self.Service.filter_api_microversions(),
+                         {'max_microversion': '', 'min_microversion': ''})
+        self.assertIsNone(self.Service.get_max_microversion())
+
+    def test_microversion_queries(self):
+        self._set_versions([
+            {'id': 'v3.0', 'status': 'CURRENT', 'version': '3.9',
+             'min_version': '3.0'},
+            {'id': 'v4.0', 'status': 'EXPERIMENTAL', 'version': '4.2',
+             'min_version': '4.0'}])
+        self.assertEqual(self.Service.get_max_microversion().get_string(),
+                         '4.2')
+        self.assertEqual(
+            self.Service.get_max_microversion(stable=True).get_string(),
+            '3.9')
+        self.assertEqual(self.Service.get_min_microversion().get_string(),
+                         '3.0')
+        self.assertTrue(self.Service.supports_microversion('3.9'))
+        self.assertTrue(self.Service.supports_microversion('4.1'))
+        self.assertFalse(self.Service.supports_microversion('3.10'))
+        self.assertFalse(self.Service.supports_microversion('2.1'))
+
+    def test_parse_microversion(self):
+        self.assertTrue(base.parse_microversion('').is_null())
+        self.assertTrue(base.parse_microversion('v2').is_null())
+        self.assertGreater(base.parse_microversion('2.10'),
+                           base.parse_microversion('2.9'))
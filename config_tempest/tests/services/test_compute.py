@@ -15,6 +15,8 @@
 
 from unittest import mock
 
+from tempest.lib import exceptions
+
 from config_tempest.services.compute import ComputeService
 from config_tempest.tempest_conf import TempestConf
 from config_tempest.tests.base import BaseServiceTest
@@ -41,6 +43,8 @@ class TestComputeService(BaseServiceTest):
                 '.ComputeService._get_number_of_hosts')
     def test_set_default_tempest_options(self, mock_get_number_of_hosts):
         mock_get_number_of_hosts.return_value = 2
+        self.Service.client = mock.Mock()
+        self.Service.client.list_services.return_value = {'services': []}
         conf = TempestConf()
         self.Service.set_default_tempest_options(conf)
         self.assertEqual(
@@ -53,3 +57,60 @@ class TestComputeService(BaseServiceTest):
             conf.get('compute-feature-enabled',
                      'console_output'), 'True')
         mock_get_number_of_hosts.assert_called_once()
+
+    def _make_services(self, *hosts):
+        return {'services': [
+            {'binary': 'nova-compute', 'host': host, 'zone': zone,
+             'status': status, 'state': state}
+            for host, zone, status, state in hosts]}
+
+    def test_get_compute_hosts(self):
+        self.Service.client = mock.Mock()
+        self.Service.client.list_services.return_value = self._make_services(
+            ('compute-0', 'nova', 'enabled', 'up'),
+            ('compute-1', 'nova', 'disabled', 'up'),
+            ('compute-2', 'nova', 'enabled', 'down'),
+            ('compute-3', 'edge', 'enabled', 'up'))
+        hosts = self.Service.get_compute_hosts()
+        self.assertEqual({zone: list(h) for zone, h in hosts.items()},
+                         {'nova': ['compute-0'], 'edge': ['compute-3']})
+        self.assertEqual(self.Service._get_number_of_hosts(), 2)
+        # the services are listed only once
+        self.Service.client.list_services.assert_called_once_with(
+            binary='nova-compute')
+
+    def test_get_compute_hosts_forbidden(self):
+        self.Service.client = mock.Mock()
+        self.Service.client.list_services.side_effect = \
+            exceptions.Forbidden()
+        self.assertIsNone(self.Service.get_compute_hosts())
+        self.assertEqual(self.Service._get_number_of_hosts(), 1)
+        conf = TempestConf()
+        self.Service.set_migration_options(conf)
+        self.assertFalse(conf.has_section('compute-feature-enabled'))
+
+    def test_set_migration_options(self):
+        self.Service.client = mock.Mock()
+        self.Service.client.list_services.return_value = self._make_services(
+            ('compute-0', 'nova', 'enabled', 'up'),
+            ('compute-1', 'edge', 'enabled', 'up'))
+        conf = TempestConf()
+        # no zone with 2 hosts
+        self.Service.set_migration_options(conf)
+        self.assertEqual(conf.get('compute-feature-enabled',
+                                  'live_migration'), 'False')
+        self.assertEqual(conf.get('compute-feature-enabled',
+                                  'cold_migration'), 'False')
+
+    def test_set_migration_options_more_zones(self):
+        self.Service.client = mock.Mock()
+        self.Service.client.list_services.return_value = self._make_services(
+            ('compute-0', 'nova', 'enabled', 'up'),
+            ('compute-1', 'nova', 'enabled', 'up'),
+            ('compute-2', 'edge', 'enabled', 'up'))
+        conf = TempestConf()
+        self.Service.set_migration_options(conf)
+        self.assertFalse(conf.has_option('compute-feature-enabled',
+                                         'live_migration'))
+        self.assertEqual(conf.get('compute-feature-enabled',
+                                  'can_migrate_between_any_hosts'), 'False')
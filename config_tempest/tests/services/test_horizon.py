@@ -13,13 +13,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-from ssl import CertificateError
 from unittest import mock
 
 from fixtures import MonkeyPatch
+import urllib3
 
 from config_tempest.services import horizon
 from config_tempest.tests.base import BaseConfigTempestTest
+from config_tempest.tests.base import run_async
 
 
 class TestConfigTempest(BaseConfigTempestTest):
@@ -28,11 +29,21 @@ class TestConfigTempest(BaseConfigTempestTest):
         super(TestConfigTempest, self).setUp()
         self.conf = self._get_conf("v2.0", "v3")
 
+    def _mock_http(self, status=200, side_effect=None):
+        http = mock.Mock()
+        http.request.return_value = mock.Mock(status=status)
+        http.request.side_effect = side_effect
+        self.useFixture(MonkeyPatch(
+            'config_tempest.services.horizon.resilience.get_pool_manager',
+            mock.Mock(return_value=http)))
+        return http
+
     def test_configure_horizon_ipv4(self):
-        mock_function = mock.Mock(return_value=True)
-        self.useFixture(MonkeyPatch('six.moves.urllib.request.urlopen',
-                                    mock_function))
+        http = self._mock_http()
         horizon.configure_horizon(self.conf)
+        http.request.assert_called_once_with(
+            'HEAD', 'http://172.16.52.151/dashboard',
+            timeout=horizon.PROBE_TIMEOUT, retries=False)
         self.assertEqual(self.conf.get('service_available', 'horizon'), "True")
         self.assertEqual(self.conf.get('dashboard', 'dashboard_url'),
                          "http://172.16.52.151/dashboard/")
@@ -40,9 +51,7 @@ class TestConfigTempest(BaseConfigTempestTest):
                          "http://172.16.52.151/dashboard/auth/login/")
 
     def test_configure_horizon_ipv6(self):
-        mock_function = mock.Mock(return_value=True)
-        self.useFixture(MonkeyPatch('six.moves.urllib.request.urlopen',
-                                    mock_function))
+        self._mock_http()
         self.conf.set('identity', 'uri', 'http://[::1]:5000/v3', priority=True)
         horizon.configure_horizon(self.conf)
         self.assertEqual(self.conf.get('service_available', 'horizon'), "True")
@@ -52,11 +61,62 @@ class TestConfigTempest(BaseConfigTempestTest):
                          "http://[::1]/dashboard/auth/login/")
 
     def test_configure_horizon_certificate_error(self):
-        mock_function = mock.Mock(return_value=True)
-        mock_function.side_effect = CertificateError
-        self.useFixture(MonkeyPatch('six.moves.urllib.request.urlopen',
-                                    mock_function))
+        self._mock_http(side_effect=urllib3.exceptions.SSLError())
         horizon.configure_horizon(self.conf)
         self.assertEqual(self.conf.get('service_available', 'horizon'),
                          "False")
         self.assertFalse(self.conf.has_section('dashboard'))
+
+    def test_configure_horizon_not_found(self):
+        self._mock_http(status=404)
+        horizon.configure_horizon(self.conf)
+        self.assertEqual(self.conf.get('service_available', 'horizon'),
+                         "False")
+
+    def test_probe_head_not_allowed(self):
+        http = self._mock_http()
+        http.request.side_effect = [mock.Mock(status=405),
+                                    mock.Mock(status=206)]
+        self.assertTrue(horizon.probe('http://172.16.52.151/dashboard'))
+        self.assertEqual(http.request.call_args[0],
+                         ('GET', 'http://172.16.52.151/dashboard'))
+        self.assertEqual(http.request.call_args[1]['headers'],
+                         {'Range': 'bytes=0-0'})
+
+    class FakeSession(object):
+        """Session of the asyncio backend answering the given statuses."""
+
+        def __init__(self, *statuses, **kwargs):
+            self.statuses = list(statuses)
+            self.error = kwargs.get('error')
+            self.requests = []
+
+        async def get_status(self, method, url, headers=None, timeout=None):
+            self.requests.append((method, url, headers, timeout))
+            if self.error:
+                raise self.error
+            return self.statuses.pop(0)
+
+    def test_async_probe(self):
+        base = 'http://172.16.52.151/dashboard'
+        session = self.FakeSession(200)
+        self.assertTrue(run_async(horizon.async_probe(session, base)))
+        self.assertEqual(session.requests,
+                         [('HEAD', base, None, horizon.PROBE_TIMEOUT)])
+        self.assertFalse(run_async(
+            horizon.async_probe(self.FakeSession(404), base)))
+        self.assertFalse(run_async(
+            horizon.async_probe(self.FakeSession(error=IOError()), base)))
+
+    def test_async_probe_head_not_allowed(self):
+        base = 'http://172.16.52.151/dashboard'
+        session = self.FakeSession(405, 206)
+        self.assertTrue(run_async(horizon.async_probe(session, base)))
+        self.assertEqual(session.requests[1],
+                         ('GET', base, {'Range': 'bytes=0-0'},
+                          horizon.PROBE_TIMEOUT))
+
+    def test_configure_horizon_probed(self):
+        horizon.configure_horizon(self.conf, has_horizon=False)
+        self.assertEqual(self.conf.get('service_available', 'horizon'),
+                         "False")
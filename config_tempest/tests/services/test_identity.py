@@ -48,6 +48,13 @@ class TestIdentityService(BaseServiceTest):
         self.Service.extensions_v3 = exp_resp[2:]
         self.assertItemsEqual(self.Service.get_extensions(), exp_resp)
 
+    def test_get_extensions_order(self):
+        self.Service.extensions = ['OS-INHERIT', 'OS-OAUTH1']
+        self.Service.extensions_v3 = ['OS-SIMPLE-CERT', 'OS-INHERIT']
+        # duplicates are left out, the order is kept
+        self.assertEqual(self.Service.get_extensions(),
+                         ['OS-INHERIT', 'OS-OAUTH1', 'OS-SIMPLE-CERT'])
+
     def test_set_identity_v3_extensions(self):
         expected_resp = ['OS-INHERIT', 'OS-OAUTH1',
                          'OS-SIMPLE-CERT', 'OS-EP-FILTER']
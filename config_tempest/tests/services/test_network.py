@@ -15,6 +15,7 @@
 
 from unittest import mock
 
+from config_tempest.services import network
 from config_tempest.services.network import NetworkService
 from config_tempest.tempest_conf import TempestConf
 from config_tempest.tests.base import BaseServiceTest
@@ -82,3 +83,85 @@ class TestNetworkService(BaseServiceTest):
         self.Service._discover_network()
         # check if LOG.error was called
         self.assertTrue(mock_logging.error.called)
+
+    def test_list_networks_filters(self):
+        return_mock = mock.Mock(return_value=self.FAKE_NETWORK_LIST)
+        self.Service.client.list_networks = return_mock
+        self.Service._public_network_id = '1ea533d7-4c65-4f25'
+        self.Service._supplied_network()
+        return_mock.assert_called_once_with(
+            id='1ea533d7-4c65-4f25', fields=network.NETWORK_FIELDS,
+            limit=network.PAGE_SIZE)
+
+    @mock.patch('config_tempest.services.network.PAGE_SIZE', 2)
+    def test_list_networks_pages(self):
+        def make(i, external=False):
+            return {'id': 'net-%d' % i, 'name': 'net-%d' % i,
+                    'router:external': external, 'subnets': ['subnet']}
+        next_link = [{'rel': 'next', 'href': 'url'}]
+        return_mock = mock.Mock(side_effect=[
+            {'networks': [make(0), make(1)], 'networks_links': next_link},
+            {'networks': [make(2), make(3, True)],
+             'networks_links': next_link},
+            {'networks': [make(4, True)]}])
+        self.Service.client.list_networks = return_mock
+        self.Service._discover_network()
+        # networks are listed until an external one is found
+        self.assertEqual(self.Service._public_network_id, 'net-3')
+        self.assertEqual(return_mock.call_count, 2)
+        self.assertEqual(return_mock.call_args_list[1],
+                         mock.call(**{'router:external': True,
+                                      'fields': network.NETWORK_FIELDS,
+                                      'limit': 2, 'marker': 'net-1'}))
+
+    def _mock_list_resources(self, resources):
+        def list_resources(uri, **params):
+            name = uri.split('/')[-1]
+            items = [r for r in resources[uri]
+                     if all(str(r.get(k)) == str(v)
+                            for k, v in params.items()
+                            if k not in ('fields', 'limit'))]
+            return {name: items[:params['limit']]}
+        self.Service.client.list_resources = mock.Mock(
+            side_effect=list_resources)
+
+    def test_get_topology(self):
+        subnets = [
+            {'id': 'v4', 'network_id': 'public', 'ip_version': 4},
+            {'id': 'v6', 'network_id': 'public', 'ip_version': 6},
+            {'id': 'private', 'network_id': 'private', 'ip_version': 4}]
+        self._mock_list_resources({'/subnets': subnets})
+        self.Service._public_network_id = 'public'
+        topology = self.Service.get_topology()
+        self.assertEqual(topology, {'public_subnets': subnets[:2]})
+        self.Service.client.list_resources.assert_called_once_with(
+            '/subnets', network_id='public', fields=network.SUBNET_FIELDS,
+            limit=network.PAGE_SIZE)
+        # the topology is queried only once
+        self.assertIs(self.Service.get_topology(), topology)
+        self.assertEqual(self.Service.client.list_resources.call_count, 1)
+
+    def test_get_topology_no_public_network(self):
+        self.Service.client.list_resources = mock.Mock()
+        self.assertEqual(self.Service.get_topology(), {'public_subnets': []})
+        self.assertFalse(self.Service.client.list_resources.called)
+
+    def test_set_topology_options(self):
+        self.Service._topology = {
+            'public_subnets': [{'id': 'v6', 'ip_version': 6},
+                               {'id': 'v4', 'ip_version': 4}]}
+        self.Service.extensions = ['port-security', 'trunk']
+        self.Service.set_topology_options(self.conf)
+        self.assertEqual(self.conf.get('network', 'subnet_id'), 'v4')
+        feature = 'network-feature-enabled'
+        self.assertEqual(self.conf.get(feature, 'port_security'), 'True')
+        self.assertEqual(self.conf.get(feature, 'floating_ips'), 'False')
+
+    def test_set_topology_options_defaults(self):
+        # one public subnet and unknown extensions don't change any option
+        self.Service._topology = {
+            'public_subnets': [{'id': 'v4', 'ip_version': 4}]}
+        self.Service.extensions = []
+        self.Service.set_topology_options(self.conf)
+        self.assertFalse(self.conf.has_option('network', 'subnet_id'))
+        self.assertFalse(self.conf.has_section('network-feature-enabled'))
@@ -19,6 +19,7 @@ from config_tempest import main
 from config_tempest.services.object_storage import ObjectStorageService
 from config_tempest import tempest_conf
 from config_tempest.tests.base import BaseServiceTest
+from config_tempest.tests.base import run_async
 
 
 class TestObjectStorageService(BaseServiceTest):
@@ -29,7 +30,7 @@ class TestObjectStorageService(BaseServiceTest):
                                             self.FAKE_URL,
                                             self.FAKE_TOKEN,
                                             disable_ssl_validation=False)
-        self.Service.conf = tempest_conf.TempestConf()
+        self.conf = tempest_conf.TempestConf()
 
     def test_set_get_extensions(self):
         expected_resp = ['formpost', 'ratelimit',
@@ -46,9 +47,9 @@ class TestObjectStorageService(BaseServiceTest):
         self.assertItemsEqual(self.Service.get_extensions(), [])
 
     def test_list_create_roles(self):
-        conf = self.Service.conf
+        conf = self.conf
         # load default values
-        main.load_basic_defaults(self.Service.conf)
+        main.load_basic_defaults(self.conf)
         client = mock.Mock()
         return_mock = mock.Mock(return_value=self.FAKE_ROLES)
         client.list_roles = return_mock
@@ -66,19 +67,43 @@ class TestObjectStorageService(BaseServiceTest):
         return_mock = mock.Mock(return_value=self.FAKE_ACCOUNTS)
         self.Service.client.accounts.skip_check = mock.Mock()
         self.Service.client.accounts.get = return_mock
-        resp = self.Service.check_service_status(self.Service.conf)
+        resp = self.Service.check_service_status(self.conf)
         self.assertTrue(resp)
 
     def test_check_service_status(self):
         # discoverability set to False (e.g. via overrides)
-        self.Service.conf.set('object-storage-feature-enabled',
-                              'discoverability',
-                              str(False))
-        resp = self.Service.check_service_status(self.Service.conf)
+        self.conf.set('object-storage-feature-enabled',
+                      'discoverability',
+                      str(False))
+        resp = self.Service.check_service_status(self.conf)
         self.assertFalse(resp)
         # discoverability set to True (e.g. via overrides)
-        self.Service.conf.set('object-storage-feature-enabled',
-                              'discoverability',
-                              str(True))
-        resp = self.Service.check_service_status(self.Service.conf)
+        self.conf.set('object-storage-feature-enabled',
+                      'discoverability',
+                      str(True))
+        resp = self.Service.check_service_status(self.conf)
         self.assertTrue(resp)
+
+    def test_check_service_status_custom_path(self):
+        self.Service.add_healthcheck_paths(['/rgw/healthcheck/'])
+        self.assertEqual(self.Service.healthcheck_paths,
+                         ['healthcheck', 'swift/healthcheck',
+                          'rgw/healthcheck'])
+        self.Service.client = mock.Mock()
+
+        def get(path, headers):
+            status = '200' if path == 'rgw/healthcheck' else '404'
+            return {'status': status}, ''
+        self.Service.client.accounts.get.side_effect = get
+        self.assertTrue(self.Service.check_service_status(self.conf))
+        self.assertEqual(self.Service.client.accounts.get.call_count, 3)
+
+    def test_async_check_service_status(self):
+        session = self.FakeAsyncSession({
+            self.FAKE_URL + 'healthcheck': (404, b''),
+            self.FAKE_URL + 'swift/healthcheck': (200, b'OK')})
+        self.assertTrue(run_async(self.Service.async_check_service_status(
+            session, self.conf)))
+        self.assertEqual(sorted(session.requests),
+                         [self.FAKE_URL + 'healthcheck',
+                          self.FAKE_URL + 'swift/healthcheck'])
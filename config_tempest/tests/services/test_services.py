@@ -13,11 +13,40 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import asyncio
+
+from fixtures import MonkeyPatch
+
+from config_tempest import resilience
+from tempest.lib import exceptions
+from config_tempest.services.base import Service
 from config_tempest.services.services import Services
 from config_tempest.tests.base import BaseConfigTempestTest
+from config_tempest.tests.base import run_async
 from unittest import mock
 
 
+class FakeSession(object):
+    """Session of the asyncio discovery backend answering 200."""
+
+    def __init__(self, disable_ssl_validation):
+        self.requests = []
+
+    async def get(self, url, headers=None):
+        self.requests.append(url)
+        return 200, b''
+
+    async def get_status(self, method, url, headers=None, timeout=None):
+        self.requests.append(url)
+        return 200
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
 class TestServices(BaseConfigTempestTest):
 
     FAKE_ENTRY = {
@@ -35,6 +64,9 @@ class TestServices(BaseConfigTempestTest):
 
     def setUp(self):
         super(TestServices, self).setUp()
+        # don't probe a dashboard from the unit tests
+        self.useFixture(MonkeyPatch('config_tempest.services.horizon.probe',
+                                    mock.Mock(return_value=False)))
 
     @mock.patch('config_tempest.services.services.Services.discover')
     @mock.patch('config_tempest.services.services.Services.'
@@ -149,12 +181,222 @@ class TestServices(BaseConfigTempestTest):
         services = self._create_services_instance()
         exp_resp = mock.Mock()
         exp_resp.s_type = 'my_service_type'
+        exp_resp.endpoints = {'my_service_type': 'url'}
         services._services = [exp_resp]
         resp = services.get_service('my_service_type')
         self.assertEqual(resp, exp_resp)
         resp = services.get_service('my')
         self.assertEqual(resp, None)
 
+    def test_get_service_versioned_twin(self):
+        services = self._create_services_instance()
+        service = mock.Mock()
+        service.s_type = 'volumev3'
+        service.endpoints = {'volumev2': 'url/v2', 'volumev3': 'url/v3'}
+        services._services = [service]
+        self.assertEqual(services.get_service('volumev2'), service)
+        self.assertEqual(services.get_service('volumev3'), service)
+
+    def test_service_classes_have_slots(self):
+        # services are kept for the whole run, their instances don't have
+        # a __dict__ to keep anything else than the declared attributes
+        services = self._create_services_instance()
+        self.assertIn(Service, services.service_classes)
+        for s_class in services.service_classes:
+            self.assertEqual(s_class.__dictoffset__, 0, s_class.__name__)
+
+    def test_merge_extensions(self):
+        services = self._create_services_instance()
+        v2 = mock.Mock(extensions=['backups', 'qos-specs'])
+        v3 = mock.Mock(extensions=['qos-specs', 'os-types'])
+        self.assertEqual(services.merge_extensions([v2, None, v3]),
+                         ['backups', 'qos-specs', 'os-types'])
+
+    def test_merge_exts_multiversion_service_unreachable_twin(self):
+        services = self._create_services_instance()
+        services.available_services = [{'name': 'cinderv2',
+                                        'type': 'volumev2'}]
+        service = mock.Mock(extensions=['backups'])
+        service.get_supported_versions.return_value = ['v2', 'v3']
+        service.get_unversioned_service_type.return_value = 'volume'
+        with mock.patch.object(services, 'merge_extensions',
+                               return_value=[]) as mock_merge:
+            services.merge_exts_multiversion_service(service)
+        # volumev2 wasn't discovered, only the service itself is merged
+        mock_merge.assert_called_once_with([service])
+
+    def test_discover_versioned_twins(self):
+        services = self._create_services_instance()
+        services.available_services = [
+            {'name': 'cinderv2', 'type': 'volumev2'},
+            {'name': 'cinderv3', 'type': 'volumev3'}]
+        s_class = mock.Mock()
+        s_class.get_service_type.return_value = ['volumev2', 'volumev3']
+        service = s_class.return_value
+        service.s_type = 'volumev3'
+        service.get_supported_versions.return_value = []
+        service.extensions = []
+        services._service_classes = [s_class]
+        services.token = 'token'
+        with mock.patch.object(services, 'get_service_url',
+                               side_effect=lambda name, s_type: name):
+            services.discover()
+        # only one service is created and discovered
+        s_class.assert_called_once_with(
+            'cinderv3', 'volumev3', 'cinderv3', 'token',
+            services._ssl_validation,
+            services._clients.get_service_client.return_value)
+        service.add_endpoint.assert_called_once_with('volumev2', 'cinderv2')
+        service.set_extensions.assert_called_once_with()
+        service.set_versions.assert_called_once_with()
+        service.set_default_tempest_options.assert_called_once_with(
+            mock.ANY)
+        service.set_availability.assert_called_once_with(mock.ANY, True)
+        conf = service.set_availability.call_args[0][0]
+        self.assertIs(conf._conf, services._conf)
+        self.assertEqual(conf._layer, 'discovery volumev3')
+        self.assertEqual(services._services, [service])
+
+    def test_discover_unreachable(self):
+        services = self._create_services_instance()
+        services.available_services = [{'name': 'trove', 'type': 'database'}]
+        s_class = mock.Mock()
+        s_class.get_service_type.return_value = ['database']
+        service = s_class.return_value
+        service.set_versions.side_effect = resilience.EndpointUnavailable()
+        services._service_classes = [s_class]
+        services.token = 'token'
+        with mock.patch.object(services, 'get_service_url'):
+            services.discover()
+        service.set_availability.assert_called_once_with(mock.ANY, False)
+        self.assertEqual(services._services, [])
+
+    def test_async_discover(self):
+        class Compute(Service):
+            @staticmethod
+            def get_service_type():
+                return ['compute']
+
+            async def async_set_versions(self, session):
+                await session.get(self.service_url)
+                self.versions = ['v2.1']
+
+        class Database(Service):
+            @staticmethod
+            def get_service_type():
+                return ['database']
+
+            @staticmethod
+            def get_codename():
+                return 'trove'
+
+            async def async_set_versions(self, session):
+                raise resilience.EndpointUnavailable()
+
+        services = self._create_services_instance()
+        services.available_services = [
+            {'name': 'nova', 'type': 'compute'},
+            {'name': 'trove', 'type': 'database'}]
+        services._service_classes = [Compute, Database]
+        services.token = 'token'
+        with mock.patch('config_tempest.services.services.async_http.'
+                        'AsyncSession', FakeSession), \
+                mock.patch.object(services, 'get_service_url',
+                                  side_effect=lambda name, s_type: name):
+            run_async(services.async_discover())
+        self.assertEqual(services._services, [services.get_service('compute')])
+        self.assertEqual(services.get_service('compute').versions, ['v2.1'])
+        self.assertEqual(services._conf.get('service_available', 'trove'),
+                         'False')
+        self.assertEqual(services._conf.get_source('service_available',
+                                                   'trove').layer,
+                         'discovery database')
+        self.assertTrue(services._has_horizon)
+
+    def test_async_discover_order(self):
+        # compute finishes after database, the options are set in the order
+        # of the synchronous discovery anyway
+        class Compute(Service):
+            @staticmethod
+            def get_service_type():
+                return ['compute']
+
+            @staticmethod
+            def get_codename():
+                return 'nova'
+
+            async def async_set_versions(self, session):
+                await asyncio.sleep(0.01)
+
+            def set_default_tempest_options(self, conf):
+                conf.set('compute', 'flavor_ref', '42')
+
+        class Database(Compute):
+            @staticmethod
+            def get_service_type():
+                return ['database']
+
+            @staticmethod
+            def get_codename():
+                return 'trove'
+
+            async def async_set_versions(self, session):
+                pass
+
+            def set_default_tempest_options(self, conf):
+                conf.set('database', 'db_flavor_ref', '42')
+
+        class Missing(Compute):
+            @staticmethod
+            def get_service_type():
+                return ['missing']
+
+            @staticmethod
+            def get_codename():
+                return 'missing'
+
+        services = self._create_services_instance()
+        services.available_services = [
+            {'name': 'nova', 'type': 'compute'},
+            {'name': 'trove', 'type': 'database'}]
+        services._service_classes = [Compute, Database, Missing]
+        services.token = 'token'
+        with mock.patch('config_tempest.services.services.async_http.'
+                        'AsyncSession', FakeSession), \
+                mock.patch.object(services, 'get_service_url',
+                                  side_effect=lambda name, s_type: name):
+            run_async(services.async_discover())
+        conf = services._conf
+        self.assertEqual([k for k, _ in conf.items('service_available')
+                          if k in ('nova', 'trove', 'missing')],
+                         ['nova', 'trove', 'missing'])
+        self.assertLess(conf.sections().index('compute'),
+                        conf.sections().index('database'))
+
+    @mock.patch('config_tempest.services.services.horizon.'
+                'configure_horizon')
+    def test_post_configuration_horizon_probe(self, mock_configure):
+        services = self._create_services_instance()
+        services._horizon_probe = mock.Mock()
+        services._horizon_probe.result.return_value = True
+        services.post_configuration()
+        mock_configure.assert_called_once_with(mock.ANY, True)
+        conf = mock_configure.call_args[0][0]
+        self.assertIs(conf._conf, services._conf)
+        self.assertEqual(conf._layer, 'discovery dashboard')
+
+    def test_discover_not_available(self):
+        services = self._create_services_instance()
+        services.available_services = []
+        s_class = mock.Mock()
+        s_class.get_service_type.return_value = ['volumev2', 'volumev3']
+        services._service_classes = [s_class]
+        services.discover()
+        s_class.assert_called_once_with(None, None, None, None, None)
+        s_class.return_value.set_availability.assert_called_once_with(
+            mock.ANY, False)
+        self.assertEqual(services._services, [])
+
     def test_is_service(self):
         services = self._create_services_instance()
         service = mock.Mock()
@@ -169,3 +411,21 @@ class TestServices(BaseConfigTempestTest):
         self.assertEqual(resp, True)
         resp = services.is_service(**{'type': 'other_type'})
         self.assertEqual(resp, False)
+
+    def test_discover_capabilities(self):
+        services = self._create_services_instance()
+        volume = mock.Mock(pools_path='/pools', s_type='volumev3')
+        volume.get_feature_name.return_value = 'volume'
+        volume.get_pools.return_value = [
+            {'name': 'host@lvm#lvm', 'capabilities': {'multiattach': True}}]
+        volume.get_pool_backend.return_value = 'lvm'
+        share = mock.Mock(pools_path='/pools', s_type='share')
+        share.get_pools.side_effect = exceptions.Forbidden()
+        other = mock.Mock(pools_path=None)
+        services._services = [volume, share, other]
+        table = services.discover_capabilities()
+        self.assertEqual(list(table.get_backends('volume')), ['lvm'])
+        self.assertTrue(table.supports('volume', 'multiattach'))
+        self.assertFalse(other.get_pools.called)
+        for service in (volume, share):
+            service.set_capabilities.assert_called_once_with(mock.ANY, table)
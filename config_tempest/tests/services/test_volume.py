@@ -13,11 +13,14 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import json
 from unittest import mock
 
+from config_tempest import capabilities
 from config_tempest.services import volume
 from config_tempest.tempest_conf import TempestConf
 from config_tempest.tests.base import BaseServiceTest
+from config_tempest.tests.base import run_async
 
 
 class TestVolumeService(BaseServiceTest):
@@ -38,6 +41,49 @@ class TestVolumeService(BaseServiceTest):
         exp_resp = ['v2.0', 'v2.1']
         self._set_get_versions(self.Service, exp_resp, self.FAKE_VERSIONS)
 
+    def test_async_set_get_extensions(self):
+        session = self.FakeAsyncSession({
+            self.FAKE_URL + 'extensions': (200, self.FAKE_EXTENSIONS)})
+        run_async(self.Service.async_set_extensions(session))
+        self.assertEqual(self.Service.extensions, ['NMN', 'OS-DCF'])
+
+    def test_get_pools(self):
+        pools = {'pools': [{'name': 'host@lvm#lvm', 'capabilities': {}}]}
+        with mock.patch.object(volume.VolumeService, 'do_get',
+                               return_value=json.dumps(pools)) as mock_get:
+            self.assertEqual(self.Service.get_pools(), pools['pools'])
+        mock_get.assert_called_once_with(
+            self.FAKE_URL + '/scheduler-stats/get_pools?detail=true')
+
+    def test_get_pool_backend(self):
+        self.assertEqual(self.Service.get_pool_backend(
+            {'name': 'host@lvm-1#lvm'}), 'lvm-1')
+        self.assertEqual(self.Service.get_pool_backend(
+            {'name': 'host@lvm#lvm',
+             'capabilities': {'volume_backend_name': 'LVM'}}), 'LVM')
+
+    def test_set_capabilities(self):
+        table = capabilities.CapabilityTable()
+        table.add('volume', 'lvm', {'multiattach': '<is> True',
+                                    'replication_enabled': False})
+        table.add('volume', 'ceph', {'multiattach': False,
+                                     'replication_enabled': 'True'})
+        table.add('share', 'cephfs', {})
+        self.Service.set_capabilities(self.conf, table)
+        self.assertEqual(self.conf.get('volume', 'backend_names'),
+                         'lvm,ceph')
+        self.assertEqual(self.conf.get('volume-feature-enabled',
+                                       'multi_backend'), 'True')
+        self.assertEqual(self.conf.get('volume-feature-enabled',
+                                       'replication'), 'True')
+        self.assertEqual(self.conf.get('compute-feature-enabled',
+                                       'volume_multiattach'), 'True')
+
+    def test_set_capabilities_no_backends(self):
+        self.Service.set_capabilities(self.conf,
+                                      capabilities.CapabilityTable())
+        self.assertFalse(self.conf.has_option('volume', 'backend_names'))
+
     @mock.patch('config_tempest.services.services.Services.is_service')
     @mock.patch('config_tempest.services.volume.C.LOG')
     def test_post_configuration_no_volume(self, mock_logging, mock_is_service):
@@ -0,0 +1,79 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from config_tempest import capabilities
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestCapabilityTable(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestCapabilityTable, self).setUp()
+        self.table = capabilities.CapabilityTable()
+        self.table.add('volume', 'lvm', {'multiattach': True,
+                                         'storage_protocol': 'iSCSI'})
+        self.table.add('volume', 'ceph', {'multiattach': '<is> False',
+                                          'storage_protocol': 'ceph',
+                                          'pools': ['a', 'b']})
+        # another pool of the same back-end
+        self.table.add('volume', 'lvm', {'multiattach': 'True',
+                                         'storage_protocol': 'iSCSI'})
+        self.table.add('share', 'cephfs', {'snapshot_support': False})
+
+    def test_normalize_value(self):
+        self.assertTrue(capabilities.normalize_value('<is> True'))
+        self.assertFalse(capabilities.normalize_value(' false'))
+        self.assertEqual(capabilities.normalize_value('dr'), 'dr')
+        self.assertEqual(capabilities.normalize_value({'b': 1, 'a': 2}),
+                         '{"a": 2, "b": 1}')
+
+    def test_get_backends(self):
+        self.assertEqual(list(self.table.get_backends('volume')),
+                         ['lvm', 'ceph'])
+        self.assertEqual(list(self.table.get_backends('volume',
+                                                      'multiattach')),
+                         ['lvm'])
+        self.assertEqual(list(self.table.get_backends(
+            'volume', 'storage_protocol', 'ceph')), ['ceph'])
+        self.assertEqual(list(self.table.get_backends('object')), [])
+
+    def test_get_values(self):
+        self.assertEqual(list(self.table.get_values('volume',
+                                                    'storage_protocol')),
+                         ['iSCSI', 'ceph'])
+        self.assertEqual(list(self.table.get_values('volume', 'pools')),
+                         ['["a", "b"]'])
+
+    def test_bool_and_number(self):
+        self.table.add('volume', 'nfs', {'ratio': 1, 'multiattach': 1})
+        self.table.add('volume', 'lvm', {'ratio': 'true'})
+        self.table.add('volume', 'ceph', {'ratio': 1.0})
+        # True, 1 and 1.0 are equal, but they're different values
+        self.assertEqual(list(self.table.get_backends('volume', 'ratio')),
+                         ['lvm'])
+        self.assertEqual(list(self.table.get_backends('volume', 'ratio', 1)),
+                         ['nfs'])
+        self.assertEqual(self.table.get_values('volume', 'ratio'),
+                         [1, True, 1.0])
+        self.assertEqual([type(v) for v in self.table.get_values(
+            'volume', 'ratio')], [int, bool, float])
+        self.assertEqual(list(self.table.get_backends('volume',
+                                                      'multiattach')),
+                         ['lvm'])
+
+    def test_supports(self):
+        self.assertTrue(self.table.supports('volume', 'multiattach'))
+        self.assertFalse(self.table.supports('share', 'snapshot_support'))
+        self.assertFalse(self.table.supports('share', 'multiattach'))
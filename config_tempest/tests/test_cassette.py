@@ -0,0 +1,129 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+import urllib3
+from urllib3.connectionpool import HTTPConnectionPool
+
+from config_tempest import cassette
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestCassette(BaseConfigTempestTest):
+
+    URL = 'http://10.200.16.10:8774/v2.1/'
+
+    def setUp(self):
+        super(TestCassette, self).setUp()
+        self.path = os.path.join(tempfile.mkdtemp(), 'cassette.json')
+        self.pool = urllib3.PoolManager()
+
+    def _fake_urlopen(self, body=b'{"versions": []}', status=200):
+        def urlopen(pool, method, url, **kwargs):
+            return urllib3.HTTPResponse(
+                body=io.BytesIO(body), status=status, reason='OK',
+                headers={'Content-Type': 'application/json',
+                         'X-Subject-Token': 'secret'},
+                preload_content=kwargs.get('preload_content', True))
+        return mock.Mock(side_effect=urlopen)
+
+    def _record(self, fake_urlopen, url=None):
+        with mock.patch.object(HTTPConnectionPool, 'urlopen', fake_urlopen):
+            with cassette.use(record=self.path):
+                return self.pool.request('GET', url or self.URL)
+
+    def test_record(self):
+        fake_urlopen = self._fake_urlopen()
+        resp = self._record(fake_urlopen)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.data, b'{"versions": []}')
+        self.assertEqual(resp.headers['X-Subject-Token'], 'secret')
+        self.assertTrue(fake_urlopen.called)
+        with open(self.path) as f:
+            recorded = json.load(f)
+        interaction = recorded['GET ' + self.URL][0]
+        self.assertEqual(interaction['status'], 200)
+        self.assertEqual(interaction['body'], '{"versions": []}')
+        # secrets are not written to the cassette
+        self.assertIn(['X-Subject-Token', cassette.REDACTED],
+                      interaction['headers'])
+
+    def test_record_restores_urlopen(self):
+        original = HTTPConnectionPool.urlopen
+        with cassette.use(record=self.path):
+            self.assertNotEqual(HTTPConnectionPool.urlopen, original)
+        self.assertEqual(HTTPConnectionPool.urlopen, original)
+
+    def test_replay(self):
+        self._record(self._fake_urlopen())
+        fake_urlopen = self._fake_urlopen(body=b'live')
+        with mock.patch.object(HTTPConnectionPool, 'urlopen', fake_urlopen):
+            with cassette.use(replay=self.path):
+                resp = self.pool.request('GET', self.URL)
+        self.assertFalse(fake_urlopen.called)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(json.loads(resp.data.decode('utf-8')),
+                         {'versions': []})
+
+    def test_replay_binary_body_gzipped_cassette(self):
+        self.path += '.gz'
+        self._record(self._fake_urlopen(body=b'\xff\xfe\x00'))
+        with cassette.use(replay=self.path):
+            resp = self.pool.request('GET', self.URL)
+        self.assertEqual(resp.data, b'\xff\xfe\x00')
+
+    def test_replay_in_recorded_order(self):
+        c = cassette.Cassette(self.path, cassette.RECORD)
+        key = 'GET ' + self.URL
+        c.interactions[key] = [
+            {'status': 500, 'reason': 'Error', 'headers': [], 'body': '1'},
+            {'status': 200, 'reason': 'OK', 'headers': [], 'body': '2'}]
+        c.save()
+        with cassette.use(replay=self.path):
+            bodies = [self.pool.request('GET', self.URL).data
+                      for i in range(3)]
+        self.assertEqual(bodies, [b'1', b'2', b'2'])
+
+    def test_replay_not_recorded(self):
+        self._record(self._fake_urlopen())
+        with cassette.use(replay=self.path):
+            self.assertRaises(cassette.CassetteError, self.pool.request,
+                              'GET', self.URL + 'servers')
+
+    def test_replay_recorded_error(self):
+        fake_urlopen = mock.Mock(
+            side_effect=urllib3.exceptions.NewConnectionError(None, 'down'))
+        self.assertRaises(urllib3.exceptions.NewConnectionError,
+                          self._record, fake_urlopen)
+        with cassette.use(replay=self.path):
+            self.assertRaises(urllib3.exceptions.ProtocolError,
+                              self.pool.request, 'GET', self.URL)
+
+    def test_use_without_cassette(self):
+        original = HTTPConnectionPool.urlopen
+        with cassette.use() as c:
+            self.assertIsNone(c)
+            self.assertEqual(HTTPConnectionPool.urlopen, original)
+
+    def test_use_record_and_replay(self):
+        def use_both():
+            with cassette.use(record=self.path, replay=self.path):
+                pass
+        self.assertRaises(ValueError, use_both)
@@ -0,0 +1,118 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import six
+
+from config_tempest import compare
+from config_tempest.tests.base import BaseConfigTempestTest
+
+LEFT = """[DEFAULT]
+debug = true
+
+[network-feature-enabled]
+api_extensions = router,agent,quotas
+ipv6 = true
+
+[compute]
+image_ref = abc
+"""
+
+RIGHT = """[DEFAULT]
+debug = true
+
+[compute]
+image_ref = def
+
+[network-feature-enabled]
+ipv6 = true
+api_extensions = quotas,router,dvr
+
+[image]
+image_path = cirros.img
+"""
+
+
+class TestCompare(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestCompare, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.left = self._write('left.conf', LEFT)
+        self.right = self._write('right.conf', RIGHT)
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_read(self):
+        options = compare.read(self.left)
+        self.assertEqual(options[('DEFAULT', 'debug')], 'true')
+        self.assertEqual(
+            options[('network-feature-enabled', 'api_extensions')],
+            frozenset(['router', 'agent', 'quotas']))
+        # options of DEFAULT are not merged into other sections
+        self.assertNotIn(('compute', 'debug'), options)
+
+    def test_compare_identical(self):
+        reordered = self._write('reordered.conf', LEFT.replace(
+            'router,agent,quotas', 'quotas,router,agent'))
+        difference = compare.compare(compare.read(self.left),
+                                     compare.read(reordered))
+        self.assertTrue(compare.is_empty(difference))
+
+    def test_compare(self):
+        difference = compare.compare(compare.read(self.left),
+                                     compare.read(self.right))
+        self.assertEqual(difference, {
+            'only_left': [],
+            'only_right': [['image', 'image_path', 'cirros.img']],
+            'different': [
+                {'section': 'compute', 'key': 'image_ref',
+                 'left': 'abc', 'right': 'def'},
+                {'section': 'network-feature-enabled',
+                 'key': 'api_extensions',
+                 'left': ['agent', 'quotas', 'router'],
+                 'right': ['dvr', 'quotas', 'router'],
+                 'removed': ['agent'], 'added': ['dvr']}]})
+
+    def test_format_text(self):
+        difference = compare.compare(compare.read(self.left),
+                                     compare.read(self.right))
+        self.assertEqual(compare.format_text(difference, 'l', 'r'), [
+            "l doesn't have image.image_path option",
+            "abc in l != def in r under compute.image_ref",
+            "agent value not in network-feature-enabled.api_extensions of r",
+            "dvr value not in network-feature-enabled.api_extensions of l"])
+
+    def test_main_json(self):
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+            ret = compare.main(['--format', 'json', self.left, self.right])
+        self.assertEqual(ret, 1)
+        self.assertEqual(json.loads(out.getvalue())['only_right'],
+                         [['image', 'image_path', 'cirros.img']])
+
+    def test_main_identical(self):
+        with mock.patch('sys.stderr', new_callable=six.StringIO) as err:
+            self.assertEqual(compare.main([self.left, self.left]), 0)
+        self.assertEqual(err.getvalue(), '')
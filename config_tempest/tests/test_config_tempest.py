@@ -113,3 +113,25 @@ class TestOsClientConfigSupport(BaseConfigTempestTest):
                                 self.conf.get('auth', 'admin_username'),
                                 self.conf.get('auth', 'admin_password'),
                                 self.conf.get('auth', 'admin_project_name'))
+
+
+class TestParseValues(BaseConfigTempestTest):
+
+    def test_parse_values_to_remove(self):
+        parsed = tool.parse_values_to_remove([
+            'network-feature-enabled.api_extensions=dvr,tag',
+            'network-feature-enabled.api_extensions=rbac-policies',
+            'identity.username',
+            'identity.username=demo'])
+        # values of a key given more times are merged
+        self.assertEqual(parsed['network-feature-enabled.api_extensions'],
+                         ['dvr', 'tag', 'rbac-policies'])
+        # removal of all values wins
+        self.assertEqual(parsed['identity.username'], [])
+
+    def test_parse_values_to_append(self):
+        parsed = tool.parse_values_to_append([
+            'compute-feature-enabled.api_extensions=a,b',
+            'compute-feature-enabled.api_extensions=c'])
+        self.assertEqual(parsed, {
+            'compute-feature-enabled.api_extensions': ['a', 'b', 'c']})
@@ -15,12 +15,18 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import socket
 from unittest import mock
 
 from fixtures import MonkeyPatch
 
+from config_tempest import credentials
+from config_tempest import resilience
 from config_tempest.tests.base import BaseConfigTempestTest
 
+# the tests mock _list_versions, see BaseConfigTempestTest._get_creds
+_list_versions = credentials.Credentials._list_versions
+
 
 class TestCredentials(BaseConfigTempestTest):
 
@@ -50,6 +56,18 @@ class TestCredentials(BaseConfigTempestTest):
         resp = creds._get_identity_version()
         self.assertEqual(resp, 'v3')
 
+    def test_list_versions_timeout(self):
+        # the base url of keystone accepts the connection, but never answers
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        url = 'http://127.0.0.1:%d' % server.getsockname()[1]
+        policy = resilience.RetryPolicy(read_timeout=0.1, retries=0)
+        with resilience.use(policy):
+            self.assertRaises(resilience.EndpointUnavailable,
+                              _list_versions, self.creds, url)
+
     def test_get_creds_kwargs(self):
         expected_resp = {
             'username': 'demo',
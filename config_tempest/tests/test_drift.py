@@ -0,0 +1,155 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import six
+
+from config_tempest import drift
+from config_tempest.tests.base import BaseConfigTempestTest
+
+CONF = """[DEFAULT]
+debug = true
+
+[identity]
+password = %(password)s
+
+[network-feature-enabled]
+api_extensions = %(extensions)s
+"""
+
+
+class TestDrift(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestDrift, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        for i in range(9):
+            self._write('cloud%d/tempest.conf' % i, 'router,quotas')
+        # the order of list items doesn't matter
+        self._write('cloud9/tempest.conf', 'quotas,router')
+        self._write('odd/tempest.conf', 'router')
+        self._write('odd/README', 'not a conf')
+
+    def _write(self, name, extensions, password=None):
+        path = os.path.join(self.tmp_dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write(CONF % {'extensions': extensions,
+                            # credentials differ, but don't matter
+                            'password': password or name})
+        return path
+
+    def test_iter_paths(self):
+        paths = list(drift.iter_paths([self.tmp_dir]))
+        self.assertEqual(len(paths), 11)
+        self.assertTrue(all(p.endswith('tempest.conf') for p in paths))
+
+    def test_read_conf(self):
+        options = drift.read_conf(
+            os.path.join(self.tmp_dir, 'odd', 'tempest.conf'))
+        self.assertEqual(options[('DEFAULT', 'debug')], 'true')
+        self.assertNotIn(('identity', 'debug'), options)
+
+    def test_clusters(self):
+        index = drift.build_index([self.tmp_dir])
+        clusters = index.get_clusters()
+        self.assertEqual([len(c) for c in clusters], [10, 1])
+        self.assertTrue(clusters[1][0].endswith('odd/tempest.conf'))
+
+    def test_outliers(self):
+        index = drift.build_index([self.tmp_dir])
+        outliers = index.get_outliers(threshold=0.1)
+        self.assertEqual(len(outliers), 1)
+        self.assertEqual(outliers[0]['key'], 'api_extensions')
+        self.assertEqual(outliers[0]['value'], 'router')
+
+    def test_outliers_missing_option(self):
+        path = os.path.join(self.tmp_dir, 'cloud0', 'tempest.conf')
+        with open(path, 'w') as f:
+            f.write("[DEFAULT]\ndebug = true\n")
+        index = drift.build_index([self.tmp_dir])
+        outliers = index.get_outliers(threshold=0.1)
+        self.assertEqual([(o['key'], o['value']) for o in outliers],
+                         [('api_extensions', None), ('api_extensions',
+                                                     'router')])
+
+    def test_snapshot_changes(self):
+        snapshot = os.path.join(self.tmp_dir, 'snapshot.json')
+        drift.build_index([self.tmp_dir]).save(snapshot)
+        changed = self._write('cloud1/tempest.conf', 'router,quotas,dvr')
+        previous = drift.Index.load(snapshot)
+        changes = drift.build_index([self.tmp_dir]).get_changes(previous)
+        self.assertEqual(changes, [{
+            'section': 'network-feature-enabled', 'key': 'api_extensions',
+            'files': [[changed, ['quotas', 'router'],
+                       ['dvr', 'quotas', 'router']]]}])
+
+    def test_format_text_changes(self):
+        lines = drift.format_text({
+            'files': 1, 'clusters': [['cloud']], 'outliers': [],
+            'changes': [{'section': 'network-feature-enabled',
+                         'key': 'api_extensions',
+                         'files': [['cloud', ['quotas', 'router'], None]]},
+                        {'section': 'compute', 'key': 'flavor_ref',
+                         'files': [['cloud', None, '42']]}]})
+        # values are written the same way as in tempest.conf
+        self.assertEqual(lines[2:], [
+            "changed network-feature-enabled.api_extensions in cloud: "
+            "quotas,router -> (missing)",
+            "changed compute.flavor_ref in cloud: (missing) -> 42"])
+
+    def test_main_json(self):
+        snapshot = os.path.join(self.tmp_dir, 'snapshot.json')
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+            drift.main(['--save-snapshot', snapshot, '--format', 'json',
+                        '--outlier-threshold', '0.1', self.tmp_dir])
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['files'], 11)
+        self.assertEqual(len(report['clusters']), 2)
+        self.assertNotIn('changes', report)
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+            drift.main(['--snapshot', snapshot, self.tmp_dir])
+        self.assertIn("11 files, 2 clusters", out.getvalue())
+
+    def test_credentials_left_out(self):
+        snapshot = os.path.join(self.tmp_dir, 'snapshot.json')
+        self._write('cloud1/tempest.conf', 'router,quotas',
+                    password='old-secret')
+        with mock.patch('sys.stdout', new_callable=six.StringIO):
+            drift.main(['--save-snapshot', snapshot, self.tmp_dir])
+        with open(snapshot) as f:
+            self.assertNotIn('old-secret', f.read())
+        self._write('cloud1/tempest.conf', 'router,quotas',
+                    password='new-secret')
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+            drift.main(['--snapshot', snapshot, '--format', 'json',
+                        self.tmp_dir])
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['changes'], [])
+        self.assertNotIn('secret', out.getvalue())
+
+    def test_changes_old_snapshot_with_credentials(self):
+        previous = drift.Index(ignored=())
+        previous.add('cloud', {('identity', 'password'): 'old-secret'})
+        index = drift.Index()
+        index.add('cloud', {('identity', 'password'): 'new-secret'})
+        self.assertEqual(index.get_changes(previous), [])
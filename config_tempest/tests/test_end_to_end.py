@@ -0,0 +1,142 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Runs of config_tempest() against a fake cloud served on local ports.
+
+The whole stack, Services, ClientManager, tempest clients and HTTP, is
+exercised, no OpenStack is needed.
+"""
+
+import os
+
+import testtools
+
+from config_tempest import async_http
+from config_tempest import constants as C
+from config_tempest import schema
+from config_tempest.tests.base import BaseConfigTempestTest
+from config_tempest.tests.fake_cloud import FakeCloudFixture
+
+
+class TestEndToEnd(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestEndToEnd, self).setUp()
+        self.cloud = self.useFixture(FakeCloudFixture(
+            flavors=5, images=3, networks=3, hosts=2, pools=2, services=9))
+
+    def test_run(self):
+        options = self.cloud.run()
+        self.assertEqual(options[('compute', 'flavor_ref')], '1000')
+        self.assertEqual(options[('compute', 'flavor_ref_alt')], '1001')
+        self.assertEqual(options[('compute', 'image_ref')],
+                         self.cloud.cloud.images[0]['id'])
+        self.assertEqual(options[('compute', 'min_compute_nodes')], '2')
+        self.assertEqual(options[('compute', 'max_microversion')], '2.87')
+        self.assertEqual(options[('network', 'public_network_id')],
+                         self.cloud.cloud.networks[-1]['id'])
+        self.assertEqual(options[('volume', 'backend_names')],
+                         frozenset(['lvm-0', 'lvm-1']))
+        self.assertEqual(options[('service_available', 'nova')], 'True')
+        self.assertEqual(options[('service_available', 'heat')], 'True')
+        self.assertEqual(options[('service_available', 'horizon')], 'False')
+        self.assertEqual(options[('identity', 'uri_v3')],
+                         self.cloud.cloud.auth_url)
+
+    def test_network_queries(self):
+        # the public network is found by one filtered request however many
+        # networks the cloud has
+        self.cloud.run()
+        self.assertEqual(self.cloud.cloud.requests[
+            ('network', 'GET', '/v2.0/networks')], 1)
+
+    def _assert_same_output(self, **kwargs):
+        serial_out = os.path.join(self.cloud.workdir, 'serial.conf')
+        serial = self.cloud.run(stage_workers=1, out=serial_out)
+        with open(serial_out) as f:
+            serial_text = f.read()
+        self.assertEqual(self.cloud.run(**kwargs), serial)
+        # the options are in the same order too
+        with open(self.cloud.out) as f:
+            self.assertEqual(f.read(), serial_text)
+
+    def test_same_output(self):
+        self._assert_same_output(stage_workers=4)
+
+    @testtools.skipUnless(async_http.is_available(),
+                          "The asyncio discovery backend requires aiohttp")
+    def test_same_output_asyncio(self):
+        self._assert_same_output(
+            discovery_backend=C.DISCOVERY_BACKEND_ASYNCIO)
+
+    def test_replay(self):
+        cassette = os.path.join(self.cloud.workdir, 'cassette.json')
+        recorded = self.cloud.run(record=cassette)
+        calls = self.cloud.cloud.http_calls
+        replayed = self.cloud.run(replay=cassette)
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(self.cloud.cloud.http_calls, calls)
+
+    def test_incremental(self):
+        self.cloud.run(incremental=True)
+        flavors = self.cloud.cloud.requests[('compute', 'GET',
+                                             '/v2.1/flavors')]
+        options = self.cloud.run(incremental=True)
+        # flavors didn't change, they're not listed again
+        self.assertEqual(self.cloud.cloud.requests[
+            ('compute', 'GET', '/v2.1/flavors')], flavors)
+        self.assertEqual(options[('compute', 'flavor_ref')], '1000')
+
+    def test_incremental_image_deleted(self):
+        options = self.cloud.run(incremental=True)
+        self.assertEqual(options[('compute', 'image_ref')],
+                         self.cloud.cloud.images[0]['id'])
+        # the image is uploaded again, it's found under a new ID
+        self.cloud.cloud.images[0] = dict(self.cloud.cloud.images[0],
+                                          id='a1b2c3d4-0000-4000-8000-new')
+        options = self.cloud.run(incremental=True)
+        self.assertEqual(options[('compute', 'image_ref')],
+                         'a1b2c3d4-0000-4000-8000-new')
+
+    def test_incremental_image_file_deleted(self):
+        options = self.cloud.run(incremental=True)
+        img_file = os.path.join(self.cloud.workdir,
+                                options[('scenario', 'img_dir')],
+                                options[('scenario', 'img_file')])
+        os.remove(img_file)
+        self.cloud.run(incremental=True)
+        # the images step runs again and downloads the file
+        self.assertTrue(os.path.isfile(img_file))
+
+    def test_invalid_override(self):
+        self.assertRaises(schema.ValidationError, self.cloud.run,
+                          overrides=[('compute', 'build_timeout', '5min')])
+        self.assertFalse(os.path.exists(self.cloud.out))
+
+
+class TestEndToEndEndpointDown(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestEndToEndEndpointDown, self).setUp()
+        self.cloud = self.useFixture(FakeCloudFixture(down=['image']))
+
+    def test_run(self):
+        # the image service is in the catalog, but its endpoint fails,
+        # it's marked unavailable and its setup stage is skipped
+        options = self.cloud.run(retries=0)
+        self.assertEqual(options[('service_available', 'glance')], 'False')
+        self.assertEqual(options[('service_available', 'nova')], 'True')
+        self.assertNotIn(('compute', 'image_ref'), options)
+        self.assertEqual(options[('compute', 'flavor_ref')], '1000')
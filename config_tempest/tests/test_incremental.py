@@ -0,0 +1,129 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from tempest.lib import exceptions
+
+from config_tempest import incremental
+from config_tempest.tempest_conf import TempestConf
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestRecord(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestRecord, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'tempest.conf.provenance.json')
+
+    def test_get_fingerprint(self):
+        self.assertEqual(incremental.get_fingerprint({'a': 1, 'b': [2]}),
+                         incremental.get_fingerprint({'b': [2], 'a': 1}))
+        self.assertNotEqual(incremental.get_fingerprint({'a': 1}),
+                            incremental.get_fingerprint({'a': 2}))
+
+    def test_save_load(self):
+        record = incremental.Record()
+        record.add('images', 'abc', {('compute', 'image_ref')})
+        record.save(self.path)
+        record = incremental.Record.load(self.path)
+        self.assertEqual(record.get_options('images', 'abc'),
+                         [('compute', 'image_ref')])
+        self.assertIsNone(record.get_options('images', 'changed'))
+        self.assertIsNone(record.get_options('flavors', 'abc'))
+
+    def test_load_missing(self):
+        record = incremental.Record.load(self.path)
+        self.assertEqual(record.steps, {})
+
+    def test_load_invalid(self):
+        with open(self.path, 'w') as f:
+            f.write('{"version": 0, "steps": {"images": {}}}')
+        self.assertEqual(incremental.Record.load(self.path).steps, {})
+
+
+class TestRegeneration(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestRegeneration, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.out_path = os.path.join(self.tmp_dir, 'tempest.conf')
+
+    def _run(self, data, enabled=True, checks=None):
+        conf = TempestConf()
+        regeneration = incremental.Regeneration(self.out_path, enabled)
+        setup = mock.Mock(
+            side_effect=lambda: conf.set('compute', 'image_ref', 'id'))
+        regeneration.run(conf, 'images', data, setup, checks=checks)
+        conf.write(self.out_path)
+        regeneration.save()
+        return conf, setup
+
+    def test_run_reuses_options(self):
+        _, setup = self._run({'versions': ['v2.0']})
+        self.assertEqual(setup.call_count, 1)
+        conf, setup = self._run({'versions': ['v2.0']})
+        self.assertFalse(setup.called)
+        self.assertEqual(conf.get('compute', 'image_ref'), 'id')
+        self.assertEqual(conf.get_source('compute', 'image_ref').layer,
+                         'previous run')
+
+    def test_run_inputs_changed(self):
+        self._run({'versions': ['v2.0']})
+        _, setup = self._run({'versions': ['v2.0', 'v2.1']})
+        self.assertEqual(setup.call_count, 1)
+
+    def test_run_option_removed(self):
+        self._run({'versions': ['v2.0']})
+        # the option isn't in the output file anymore, f.e. due to --remove
+        with open(self.out_path, 'w') as f:
+            f.write('[compute]\n')
+        _, setup = self._run({'versions': ['v2.0']})
+        self.assertEqual(setup.call_count, 1)
+
+    def test_run_resource_exists(self):
+        self._run({'versions': ['v2.0']})
+        show_image = mock.Mock()
+        _, setup = self._run({'versions': ['v2.0']},
+                             checks={('compute', 'image_ref'): show_image})
+        show_image.assert_called_once_with('id')
+        self.assertFalse(setup.called)
+
+    def test_run_resource_deleted(self):
+        self._run({'versions': ['v2.0']})
+        show_image = mock.Mock(side_effect=exceptions.NotFound)
+        _, setup = self._run({'versions': ['v2.0']},
+                             checks={('compute', 'image_ref'): show_image})
+        self.assertEqual(setup.call_count, 1)
+
+    def test_run_file_deleted(self):
+        self._run({'versions': ['v2.0']})
+        _, setup = self._run({'versions': ['v2.0']},
+                             checks={('compute', 'image_ref'): os.path.isfile})
+        self.assertEqual(setup.call_count, 1)
+
+    def test_run_disabled(self):
+        self._run({'versions': ['v2.0']}, enabled=False)
+        self.assertFalse(os.path.exists(
+            incremental.get_record_path(self.out_path)))
+        self._run({'versions': ['v2.0']})
+        _, setup = self._run({'versions': ['v2.0']}, enabled=False)
+        self.assertEqual(setup.call_count, 1)
@@ -0,0 +1,144 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+from unittest import mock
+
+from config_tempest import pipeline
+from config_tempest.tempest_conf import TempestConf
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestOverlap(BaseConfigTempestTest):
+
+    def test_overlap(self):
+        self.assertTrue(pipeline.overlap(['compute.image_ref'],
+                                         ['compute.image_ref']))
+        self.assertTrue(pipeline.overlap(['compute'], ['compute.image_ref']))
+        self.assertTrue(pipeline.overlap(['*'], ['network.public_id']))
+        self.assertTrue(pipeline.overlap(['*-feature-enabled.api_v*'],
+                                         ['identity-feature-enabled.api_v3']))
+        self.assertFalse(pipeline.overlap(['compute.image_ref'],
+                                          ['compute.flavor_ref']))
+        self.assertFalse(pipeline.overlap(['*-feature-enabled.api_v*'],
+                                          ['compute.image_ref']))
+        self.assertFalse(pipeline.overlap([], ['*']))
+
+    def test_depends_on(self):
+        flavors = pipeline.Stage('flavors', None,
+                                 writes=['compute.flavor_ref'],
+                                 clients=['flavors'])
+        images = pipeline.Stage('images', None, writes=['compute.image_ref'],
+                                clients=['images'])
+        heat = pipeline.Stage('heat', None, reads=['compute'],
+                              writes=['heat_plugin'])
+        self.assertFalse(images.depends_on(flavors))
+        self.assertTrue(heat.depends_on(flavors))
+        self.assertTrue(heat.depends_on(images))
+        # stages sharing a client don't run at the same time
+        other = pipeline.Stage('other', None, clients=['flavors'])
+        self.assertTrue(other.depends_on(flavors))
+
+
+class TestPipeline(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestPipeline, self).setUp()
+        self.conf = TempestConf()
+        self.conf.set('compute', 'region', 'RegionOne')
+        self.context = pipeline.Context(conf=self.conf)
+
+    def test_add(self):
+        p = pipeline.Pipeline([pipeline.Stage('a', None),
+                               pipeline.Stage('c', None)])
+        p.add(pipeline.Stage('b', None), before='c')
+        self.assertEqual([s.name for s in p.stages], ['a', 'b', 'c'])
+        self.assertRaises(ValueError, p.add, pipeline.Stage('a', None))
+        self.assertRaises(ValueError, p.add, pipeline.Stage('d', None),
+                          before='x')
+
+    def test_get_dependencies(self):
+        p = pipeline.Pipeline([
+            pipeline.Stage('flavors', None, writes=['compute.flavor_ref']),
+            pipeline.Stage('images', None, writes=['compute.image_ref']),
+            pipeline.Stage('post', None, reads=['*'], writes=['*'])])
+        self.assertEqual(p.get_dependencies(),
+                         {'flavors': [], 'images': [],
+                          'post': ['flavors', 'images']})
+
+    def test_run_order(self):
+        # the first stage finishes last, the options are still written in
+        # the order the stages were declared in
+        first_may_finish = threading.Event()
+        order = []
+
+        def last(context):
+            order.append('last')
+            context.conf.set('compute', 'flavor_ref', '42')
+
+        def notify(context):
+            context.conf.set('network', 'public_network_id', 'net')
+            order.append('second')
+            first_may_finish.set()
+
+        def first(context):
+            self.assertTrue(first_may_finish.wait(5))
+            order.append('first')
+            context.conf.set('compute', 'image_ref', 'img')
+            context.conf.set('heat_plugin', 'image_ref', 'img')
+        p = pipeline.Pipeline([
+            pipeline.Stage('first', first, writes=['compute.image_ref',
+                                                   'heat_plugin']),
+            pipeline.Stage('second', notify, writes=['network']),
+            pipeline.Stage('last', last, reads=['compute'],
+                           writes=['compute.flavor_ref'])])
+        p.run(self.context, workers=2)
+        self.assertEqual(order, ['second', 'first', 'last'])
+        self.assertEqual(self.conf.get_keys()[-5:], [
+            ('compute', 'region'), ('compute', 'image_ref'),
+            ('compute', 'flavor_ref'), ('heat_plugin', 'image_ref'),
+            ('network', 'public_network_id')])
+        self.assertEqual(self.conf.sections()[-2:],
+                         ['heat_plugin', 'network'])
+
+    def test_run_serial(self):
+        order = []
+        p = pipeline.Pipeline([
+            pipeline.Stage(name, lambda c, name=name: order.append(name))
+            for name in ('a', 'b', 'c')])
+        p.run(self.context, workers=1)
+        self.assertEqual(order, ['a', 'b', 'c'])
+
+    def test_run_error(self):
+        run_after = mock.Mock()
+
+        def fail(context):
+            raise ValueError('failed')
+        p = pipeline.Pipeline([
+            pipeline.Stage('fail', fail, writes=['compute']),
+            pipeline.Stage('after', run_after, reads=['compute'])])
+        self.assertRaises(ValueError, p.run, self.context, workers=2)
+        self.assertFalse(run_after.called)
+
+    @mock.patch('config_tempest.pipeline.utils.get_entry_points')
+    def test_load_plugin_stages(self, mock_entry_points):
+        stage = pipeline.Stage('plugin', None)
+        good = mock.Mock()
+        good.load.return_value = lambda context: [stage]
+        broken = mock.Mock()
+        broken.load.side_effect = ImportError('no module')
+        mock_entry_points.return_value = [broken, good]
+        self.assertEqual(pipeline.load_plugin_stages(self.context), [stage])
+        mock_entry_points.assert_called_once_with('tempestconf.stages')
@@ -0,0 +1,110 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import threading
+from unittest import mock
+
+from config_tempest import request_cache
+from config_tempest.services.base import Service
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestRequestCache(BaseConfigTempestTest):
+
+    URL = 'http://10.200.16.10:8776/'
+
+    def setUp(self):
+        super(TestRequestCache, self).setUp()
+        self.cache = request_cache.RequestCache()
+
+    def test_get_memoized(self):
+        fetch = mock.Mock(return_value='response')
+        self.assertEqual(self.cache.get(self.URL, None, fetch), 'response')
+        self.assertEqual(self.cache.get(self.URL, None, fetch), 'response')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+
+    def test_get_headers_are_part_of_key(self):
+        fetch = mock.Mock(side_effect=['json', 'json-home'])
+        self.cache.get(self.URL, {'Accept': 'application/json'}, fetch)
+        resp = self.cache.get(self.URL,
+                              {'Accept': 'application/json-home'}, fetch)
+        self.assertEqual(resp, 'json-home')
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_get_exception_not_memoized(self):
+        fetch = mock.Mock(side_effect=[IOError('down'), 'response'])
+        self.assertRaises(IOError, self.cache.get, self.URL, None, fetch)
+        self.assertEqual(self.cache.get(self.URL, None, fetch), 'response')
+
+    def test_get_single_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch():
+            started.set()
+            release.wait()
+            return 'response'
+        fetch = mock.Mock(side_effect=slow_fetch)
+        results = []
+
+        def worker():
+            results.append(self.cache.get(self.URL, None, fetch))
+        threads = [threading.Thread(target=worker) for i in range(5)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(results, ['response'] * 5)
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_clear(self):
+        fetch = mock.Mock(return_value='response')
+        self.cache.get(self.URL, None, fetch)
+        self.cache.clear()
+        self.cache.get(self.URL, None, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_module_get_without_cache(self):
+        fetch = mock.Mock(return_value='response')
+        request_cache.get(self.URL, None, fetch)
+        request_cache.get(self.URL, None, fetch)
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_use(self):
+        fetch = mock.Mock(return_value='response')
+        with request_cache.use(self.cache) as cache:
+            self.assertIs(cache, self.cache)
+            request_cache.get(self.URL, None, fetch)
+            request_cache.get(self.URL, None, fetch)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertIsNone(request_cache._active)
+
+    @mock.patch('config_tempest.resilience.urllib3')
+    def test_do_get_uses_cache(self, mock_urllib3):
+        mock_http = mock_urllib3.PoolManager.return_value
+        mock_http.request.return_value = mock.Mock(status=200,
+                                                   data=b'{"versions": []}')
+        volumev2 = Service('cinderv2', 'volumev2', self.URL + 'v2',
+                           'token', False)
+        volumev3 = Service('cinderv3', 'volumev3', self.URL + 'v3',
+                           'token', False)
+        with request_cache.use():
+            volumev2.do_get(self.URL)
+            volumev3.do_get(self.URL)
+        self.assertEqual(mock_http.request.call_count, 1)
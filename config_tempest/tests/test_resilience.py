@@ -0,0 +1,264 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from concurrent import futures
+import http.server
+import socketserver
+import threading
+from unittest import mock
+
+import urllib3
+
+from config_tempest import resilience
+from config_tempest.tests.base import BaseConfigTempestTest
+from config_tempest.tests.base import run_async
+
+
+class TestCircuitBreaker(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestCircuitBreaker, self).setUp()
+        self.breaker = resilience.CircuitBreaker(failure_threshold=2,
+                                                 reset_timeout=60)
+
+    def test_opens_after_threshold(self):
+        self.breaker.failure('host')
+        self.assertTrue(self.breaker.allow('host'))
+        self.breaker.failure('host')
+        self.assertFalse(self.breaker.allow('host'))
+        # other hosts are not affected
+        self.assertTrue(self.breaker.allow('other'))
+
+    def test_success_resets_failures(self):
+        self.breaker.failure('host')
+        self.breaker.success('host')
+        self.breaker.failure('host')
+        self.assertTrue(self.breaker.allow('host'))
+
+    @mock.patch('config_tempest.resilience.time')
+    def test_half_open(self, mock_time):
+        mock_time.time.return_value = 100
+        self.breaker.failure('host')
+        self.breaker.failure('host')
+        self.assertFalse(self.breaker.allow('host'))
+        mock_time.time.return_value = 160
+        # one request is let through, the next one waits for its result
+        self.assertTrue(self.breaker.allow('host'))
+        self.assertFalse(self.breaker.allow('host'))
+        self.breaker.success('host')
+        self.assertTrue(self.breaker.allow('host'))
+
+
+@mock.patch('config_tempest.resilience.time.sleep')
+class TestRetryPolicy(BaseConfigTempestTest):
+
+    URL = 'http://10.200.16.10:8779/v2.1/'
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.policy = resilience.RetryPolicy(connect_timeout=1,
+                                             read_timeout=2, retries=2,
+                                             failure_threshold=3)
+        self.http = mock.Mock()
+
+    def test_request(self, mock_sleep):
+        self.http.request.return_value = mock.Mock(status=200)
+        resp = self.policy.request(self.http, 'GET', self.URL, headers={})
+        self.assertEqual(resp.status, 200)
+        args, kwargs = self.http.request.call_args
+        self.assertEqual(args, ('GET', self.URL))
+        self.assertEqual((kwargs['timeout'].connect_timeout,
+                          kwargs['timeout'].read_timeout), (1, 2))
+        # urllib3 follows redirects, but doesn't retry failed attempts
+        self.assertEqual((kwargs['retries'].connect, kwargs['retries'].read,
+                          kwargs['retries'].status, kwargs['retries'].other,
+                          kwargs['retries'].redirect),
+                         (0, 0, 0, 0, resilience.MAX_REDIRECTS))
+        self.assertFalse(mock_sleep.called)
+
+    def test_request_redirect(self, mock_sleep):
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/identity':
+                    self.send_response(302)
+                    self.send_header('Location', '/identity/')
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body = b'{"versions": {}}'
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:%d/identity' % server.server_address[1]
+        resp = self.policy.request(urllib3.PoolManager(), 'GET', url)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.data, b'{"versions": {}}')
+
+    def test_request_retry_5xx(self, mock_sleep):
+        self.http.request.side_effect = [mock.Mock(status=503),
+                                         mock.Mock(status=200)]
+        resp = self.policy.request(self.http, 'GET', self.URL)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(mock_sleep.call_count, 1)
+
+    def test_request_5xx_after_retries(self, mock_sleep):
+        self.http.request.return_value = mock.Mock(status=500)
+        self.assertRaises(resilience.EndpointUnavailable,
+                          self.policy.request, self.http, 'GET', self.URL)
+        self.assertEqual(self.http.request.call_count, 3)
+
+    def test_request_connection_error(self, mock_sleep):
+        self.http.request.side_effect = \
+            urllib3.exceptions.NewConnectionError(None, 'refused')
+        self.assertRaises(resilience.EndpointUnavailable,
+                          self.policy.request, self.http, 'GET', self.URL)
+        self.assertEqual(self.http.request.call_count, 3)
+        # a request failing all its attempts is one failure of the endpoint
+        for _ in range(2):
+            self.assertRaises(resilience.EndpointUnavailable,
+                              self.policy.request, self.http, 'GET',
+                              self.URL)
+        self.assertEqual(self.http.request.call_count, 9)
+        # the circuit is open now, the endpoint isn't queried anymore
+        self.assertRaises(resilience.EndpointUnavailable,
+                          self.policy.request, self.http, 'GET',
+                          self.URL + 'flavors')
+        self.assertEqual(self.http.request.call_count, 9)
+
+    def test_request_other_endpoint_of_host(self, mock_sleep):
+        url = 'http://10.200.16.10/'
+        self.http.request.side_effect = \
+            urllib3.exceptions.NewConnectionError(None, 'refused')
+        for _ in range(3):
+            self.assertRaises(resilience.EndpointUnavailable,
+                              self.policy.request, self.http, 'GET',
+                              url + 'image/v2/images')
+        # the compute API served by the same host is still queried
+        self.http.request.side_effect = None
+        self.http.request.return_value = mock.Mock(status=200)
+        resp = self.policy.request(self.http, 'GET', url + 'compute/v2.1')
+        self.assertEqual(resp.status, 200)
+
+    def test_get_endpoint(self, mock_sleep):
+        self.assertEqual(resilience.get_endpoint(
+            'http://host/compute/v2.1/flavors'), 'http://host/compute')
+        self.assertEqual(resilience.get_endpoint(
+            'https://host:8774/v2.1/flavors?limit=1'),
+            'https://host:8774/v2.1')
+        self.assertEqual(resilience.get_endpoint('http://host:5000'),
+                         'http://host:5000/')
+
+    def _async_send(self, *responses):
+        responses = list(responses)
+
+        async def send():
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return send
+
+    def test_async_request_retry(self, mock_sleep):
+        self.policy.backoff = 0
+        send = self._async_send(ConnectionError('refused'), (503, b''),
+                                (200, b'body'))
+        self.assertEqual(run_async(self.policy.async_request(
+            send, self.URL, (ConnectionError,))), (200, b'body'))
+
+    def test_async_request_failed(self, mock_sleep):
+        self.policy.backoff = 0
+        for _ in range(3):
+            # a fourth attempt, which isn't sent, would succeed
+            send = self._async_send(*[(500, b'')] * 3 + [(200, b'')])
+            self.assertRaises(resilience.EndpointUnavailable, run_async,
+                              self.policy.async_request(send, self.URL))
+        # the circuit of the endpoint is open, nothing is sent anymore
+        send = mock.Mock()
+        self.assertRaises(resilience.EndpointUnavailable, run_async,
+                          self.policy.async_request(send, self.URL))
+        self.assertFalse(send.called)
+
+    def test_pool_reuses_connections(self, mock_sleep):
+        connections = []
+        barrier = threading.Barrier(4)
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super(Handler, self).setup()
+                connections.append(self.client_address)
+
+            def do_GET(self):
+                # the requests of one round run at once
+                barrier.wait(timeout=10)
+                self.send_response(200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+            daemon_threads = True
+
+        server = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:%d/' % server.server_address[1]
+        policy = resilience.RetryPolicy(pool_maxsize=4)
+        http_pool = policy.get_pool_manager()
+        for _ in range(3):
+            with futures.ThreadPoolExecutor(max_workers=4) as executor:
+                statuses = list(executor.map(
+                    lambda _: policy.request(http_pool, 'GET', url).status,
+                    range(4)))
+            self.assertEqual(statuses, [200] * 4)
+        # the connections of the first round are reused by the others
+        self.assertLessEqual(len(connections), 4)
+
+    def test_get_delay(self, mock_sleep):
+        for attempt in range(4):
+            delay = self.policy.get_delay(attempt)
+            self.assertTrue(0 <= delay <= self.policy.backoff * 2 ** attempt)
+
+    def test_request_without_policy(self, mock_sleep):
+        resilience.request(self.http, 'GET', self.URL, headers={})
+        self.http.request.assert_called_once_with('GET', self.URL,
+                                                  headers={})
+        self.assertIsNone(resilience.get_timeout())
+
+    def test_use(self, mock_sleep):
+        self.http.request.return_value = mock.Mock(status=200)
+        with resilience.use(self.policy):
+            self.assertEqual(resilience.get_timeout(), (1, 2))
+            resilience.request(self.http, 'GET', self.URL)
+        self.assertIn('timeout', self.http.request.call_args[1])
+        self.assertIsNone(resilience._active)
@@ -0,0 +1,219 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from config_tempest import schema
+from config_tempest.tempest_conf import TempestConf
+from config_tempest.tests.base import BaseConfigTempestTest
+
+
+class TestSchema(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestSchema, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def test_from_registry(self):
+        options = schema.Schema.from_registry()
+        self.assertEqual(options.get_default('identity', 'catalog_type'),
+                         'identity')
+        # defaults are converted to the types of the options
+        self.assertIs(options.get_default('service_available', 'nova'),
+                      True)
+        self.assertIsInstance(options.get_default('compute',
+                                                  'build_timeout'), int)
+        self.assertTrue(options.has_option('DEFAULT', 'resource_name_prefix'))
+        self.assertFalse(options.has_option('compute', 'no_such_option'))
+        self.assertRaises(KeyError, options.get_default, 'compute',
+                          'no_such_option')
+
+    def test_from_registry_specs(self):
+        options = schema.Schema.from_registry().options
+        self.assertEqual(options[('service_available', 'nova')].kind,
+                         'boolean')
+        self.assertEqual(options[('compute', 'build_timeout')].kind,
+                         'integer')
+        self.assertIn('direct', options[('network', 'port_vnic_type')].choices)
+        # options of oslo.log are known too
+        self.assertEqual(options[('DEFAULT', 'debug')].kind, 'boolean')
+
+    def test_from_registry_owned_sections(self):
+        owned = schema.Schema.from_registry().owned_sections
+        self.assertIn('compute', owned)
+        # plugins add their options to these
+        self.assertNotIn('service_available', owned)
+        self.assertNotIn('compute-feature-enabled', owned)
+        manager = mock.Mock()
+        manager.get_plugin_options_list.return_value = [('compute', [])]
+        with mock.patch('tempest.test_discover.plugins.'
+                        'TempestTestPluginManager', return_value=manager):
+            owned = schema.Schema.from_registry().owned_sections
+        # a section an installed plugin adds its options to isn't owned
+        self.assertNotIn('compute', owned)
+        self.assertIn('identity', owned)
+
+    def test_save_load(self):
+        path = os.path.join(self.tmp_dir, 'options.json')
+        schema.Schema({
+            ('compute', 'image_ref'): schema.OptionSpec(None, 'string'),
+            ('identity', 'catalog_type'): schema.OptionSpec(
+                'identity', 'string', ['identity', 'keystone']),
+            ('network', 'object'): schema.OptionSpec(object())},
+            owned_sections=['compute']).save(path)
+        options = schema.Schema.load(path)
+        self.assertEqual(sorted(options.options),
+                         [('compute', 'image_ref'),
+                          ('identity', 'catalog_type')])
+        self.assertEqual(options.owned_sections, {'compute'})
+        spec = options.options[('identity', 'catalog_type')]
+        self.assertEqual(spec.to_list(),
+                         ['identity', 'string', ['identity', 'keystone'],
+                          None, None])
+
+    def test_load_cache(self):
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        registry = schema.Schema(
+            {('identity', 'catalog_type'): schema.OptionSpec('identity')})
+        with mock.patch.object(schema.Schema, 'from_registry',
+                               return_value=registry) as mock_registry:
+            schema.load(cache_dir)
+            options = schema.load(cache_dir)
+        # the registry is read only once, then the cache file is used
+        self.assertEqual(mock_registry.call_count, 1)
+        self.assertEqual(options.get_default('identity', 'catalog_type'),
+                         'identity')
+        self.assertTrue(os.path.isfile(schema.get_cache_path(cache_dir)))
+
+    def test_get_cache_key(self):
+        self.assertEqual(schema.get_cache_key(), schema.get_cache_key())
+
+    def test_get_defaulted(self):
+        conf = TempestConf()
+        self.assertEqual(conf.get_defaulted('identity', 'catalog_type'),
+                         'identity')
+        conf.set('identity', 'catalog_type', 'keystone')
+        self.assertEqual(conf.get_defaulted('identity', 'catalog_type'),
+                         'keystone')
+        self.assertIsNone(conf.get_defaulted('identity', 'no_such_option'))
+
+
+class TestValidation(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestValidation, self).setUp()
+        self.schema = schema.Schema({
+            ('DEFAULT', 'debug'): schema.OptionSpec(False, 'boolean'),
+            ('compute', 'build_timeout'): schema.OptionSpec(
+                300, 'integer', min=0),
+            ('compute', 'flavor_ref'): schema.OptionSpec('1', 'string'),
+            ('network', 'port_vnic_type'): schema.OptionSpec(
+                None, 'string', ['normal', 'direct']),
+            ('service_available', 'swift'): schema.OptionSpec(
+                True, 'boolean'),
+            ('compute-feature-enabled', 'console_output'): schema.OptionSpec(
+                True, 'boolean'),
+            ('volume-feature-enabled', 'manage_volume'): schema.OptionSpec(
+                False, 'boolean'),
+        })
+        self.conf = TempestConf()
+
+    def test_check(self):
+        self.assertIsNone(self.schema.check('DEFAULT', 'debug', 'True'))
+        self.assertIn('not a boolean',
+                      self.schema.check('DEFAULT', 'debug', 'maybe'))
+        self.assertIn('not an integer',
+                      self.schema.check('compute', 'build_timeout', 'x'))
+        self.assertIn('less than',
+                      self.schema.check('compute', 'build_timeout', '-1'))
+        self.assertIn('not one of',
+                      self.schema.check('network', 'port_vnic_type', 'x'))
+        self.assertEqual(self.schema.check('compute', 'no_such', '1'),
+                         'unknown option')
+        self.assertEqual(self.schema.check('plugin', 'option', '1'),
+                         'unknown section')
+        self.assertIsNone(self.schema.check('image', 'image_path', 'x'))
+        self.assertEqual(self.schema.check('compute', 'flavor_rf', '1'),
+                         'unknown option, did you mean [compute] flavor_ref?')
+        self.assertEqual(self.schema.check('compte', 'flavor_ref', '1'),
+                         'unknown section, did you mean [compute] '
+                         'flavor_ref?')
+
+    def test_get_close_option(self):
+        self.assertEqual(
+            self.schema.get_close_option('compute', 'buildtimeout'),
+            ('compute', 'build_timeout'))
+        self.assertEqual(
+            self.schema.get_close_option('netwrok', 'port_vnic_typ'),
+            ('network', 'port_vnic_type'))
+        self.assertIsNone(self.schema.get_close_option('compute', 'typo'))
+        self.assertIsNone(self.schema.get_close_option('plugin', 'option'))
+
+    def test_validate(self):
+        self.conf.set('DEFAULT', 'debug', 'true', layer='default')
+        self.conf.set('compute', 'flavor_ref', '42', layer='override')
+        self.conf.set('compute', 'build_timeout', 'x', layer='override')
+        self.conf.set('compute', 'typo', '1', layer='deployer input')
+        self.conf.set('network', 'port_vnic_type', 'x',
+                      layer='discovery network')
+        self.conf.set('plugin', 'option', '1', layer='discovery')
+        errors, warnings = self.schema.validate(self.conf)
+        # wrong values given by the user are errors
+        self.assertEqual(len(errors), 1)
+        self.assertIn('[compute] build_timeout = x', errors[0])
+        # wrong discovered values and unknown options of the user are
+        # warnings, unknown discovered options are only logged
+        self.assertEqual(len(warnings), 2)
+        self.assertIn('[compute] typo = 1', warnings[0])
+        self.assertIn('[network] port_vnic_type', warnings[1])
+
+    def test_validate_typo(self):
+        self.conf.set('compute', 'flavor_rf', '42', layer='override')
+        self.conf.set('compute', 'buildtimeout', '60', layer='discovery')
+        errors, warnings = self.schema.validate(self.conf)
+        # unknown options of the user close to known ones are errors,
+        # unknown discovered options are only logged
+        self.assertEqual(len(errors), 1)
+        self.assertIn('did you mean [compute] flavor_ref?', errors[0])
+        self.assertEqual(len(warnings), 0)
+
+    def test_validate_plugin_near_miss(self):
+        # options of plugins which aren't installed, close to options of
+        # sections plugins add their options to, or in unknown sections
+        for section, key in (('service_available', 'swift3'),
+                             ('compute-feature-enabled',
+                              'console_output_ipv6'),
+                             ('volume-feature-enabled',
+                              'manage_volume_group'),
+                             ('compte', 'flavor_ref')):
+            self.conf.set(section, key, 'True', layer='deployer input')
+        errors, warnings = self.schema.validate(self.conf)
+        # they're only warned about, with the hint
+        self.assertEqual(errors, [])
+        self.assertEqual(len(warnings), 4)
+        self.assertIn('did you mean [service_available] swift?',
+                      warnings[0])
+
+    def test_check_conf(self):
+        self.conf.set('compute', 'build_timeout', 'x', layer='override')
+        with mock.patch.object(schema, '_schema', self.schema):
+            self.assertRaises(schema.ValidationError, schema.check,
+                              self.conf)
+            self.conf.set('compute', 'build_timeout', '60', layer='override')
+            schema.check(self.conf)
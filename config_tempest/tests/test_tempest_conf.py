@@ -15,8 +15,15 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import os
+import shutil
+import tempfile
+import threading
+import time
 from unittest import mock
 
+import six
+
 from config_tempest import tempest_conf
 from config_tempest.tests.base import BaseConfigTempestTest
 
@@ -44,6 +51,122 @@ class TestTempestConf(BaseConfigTempestTest):
         self.assertTrue(resp)
         self.assertEqual(conf.get("section", "key"), "new_value")
 
+    def test_collect_keys(self):
+        self.conf.set("section", "before", "value")
+        self.conf.set("section", "user", "value", priority=True)
+        with self.conf.collect_keys() as keys:
+            self.conf.set("section", "key", "value")
+            self.conf.set("section", "user", "new_value")
+        self.conf.set("section", "after", "value")
+        self.assertEqual(keys, {("section", "key")})
+
+    def test_set_concurrently(self):
+        # stages running at the same time add the same missing section
+        has_section = self.conf.has_section
+        errors = []
+
+        def slow_has_section(section):
+            found = has_section(section)
+            time.sleep(0.01)
+            return found
+
+        def set_option(key):
+            try:
+                self.conf.set("section", key, "value")
+            except Exception as e:
+                errors.append(e)
+        with mock.patch.object(self.conf, 'has_section', slow_has_section):
+            threads = [threading.Thread(target=set_option, args=(key,))
+                       for key in ("a", "b")]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(self.conf.options("section")), ["a", "b"])
+
+    def test_priority_not_shared(self):
+        self.conf.set("section", "key", "value", priority=True)
+        conf = tempest_conf.TempestConf()
+        self.assertTrue(conf.set("section", "key", "new_value"))
+
+    def test_get_source(self):
+        self.conf.set("section", "key", "value", layer="deployer input")
+        source = self.conf.get_source("section", "key")
+        self.assertEqual(source.layer, "deployer input")
+        self.assertIsNone(source.response)
+        self.assertIsNotNone(source.timestamp)
+        self.assertIsNone(self.conf.get_source("section", "other"))
+        self.conf.remove_option("section", "key")
+        self.assertIsNone(self.conf.get_source("section", "key"))
+
+    def test_get_source_not_overwritten_by_lower_priority(self):
+        self.conf.set("section", "key", "value", priority=True,
+                      layer="override")
+        self.conf.set("section", "key", "new_value", layer="discovery")
+        self.assertEqual(self.conf.get_source("section", "key").layer,
+                         "override")
+
+    def test_with_source(self):
+        urls = ['http://10.0.0.1/v2']
+        conf = self.conf.with_source("discovery compute", lambda: urls[-1])
+        conf.set("section", "key", "value")
+        urls.append('http://10.0.0.1/v2.1')
+        conf.set("section", "other", "value")
+        # other attributes are the ones of the TempestConf object
+        self.assertEqual(conf.get("section", "key"), "value")
+        self.assertEqual(self.conf.get_source("section", "key").response,
+                         'http://10.0.0.1/v2')
+        source = self.conf.get_source("section", "other")
+        self.assertEqual((source.layer, source.response),
+                         ("discovery compute", 'http://10.0.0.1/v2.1'))
+
+    def test_option_source_slots(self):
+        source = tempest_conf.OptionSource("default")
+        self.assertRaises(AttributeError, setattr, source, "other", None)
+
+    def _get_out_path(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        return os.path.join(tmp_dir, 'tempest.conf')
+
+    def test_write(self):
+        out_path = self._get_out_path()
+        self.conf.set("section", "key", "value")
+        self.assertTrue(self.conf.write(out_path))
+        with open(out_path) as f:
+            self.assertEqual(f.read(), "[section]\nkey = value\n\n")
+        # no temporary file is left behind
+        self.assertEqual(os.listdir(os.path.dirname(out_path)),
+                         ['tempest.conf'])
+
+    def test_write_identical(self):
+        out_path = self._get_out_path()
+        self.conf.set("section", "key", "value")
+        self.conf.write(out_path)
+        mtime = os.stat(out_path).st_mtime_ns
+        with mock.patch('config_tempest.utils.write_atomic') as mock_write:
+            self.assertFalse(self.conf.write(out_path))
+        self.assertFalse(mock_write.called)
+        self.assertEqual(os.stat(out_path).st_mtime_ns, mtime)
+
+    def test_write_keeps_mode(self):
+        out_path = self._get_out_path()
+        self.conf.write(out_path)
+        os.chmod(out_path, 0o600)
+        self.conf.set("section", "key", "value")
+        self.conf.write(out_path)
+        self.assertEqual(os.stat(out_path).st_mode & 0o777, 0o600)
+
+    def test_write_diff(self):
+        out_path = self._get_out_path()
+        self.conf.set("section", "key", "value")
+        self.conf.write(out_path)
+        self.conf.set("section", "key", "new_value")
+        with mock.patch('sys.stdout', new_callable=six.StringIO) as out:
+            self.conf.write(out_path, show_diff=True)
+        self.assertIn("-key = value\n+key = new_value\n", out.getvalue())
+
     def test_set_value_overwrite_priority(self):
         conf = self._get_conf("v2.0", "v3")
         resp = conf.set("sectionPriority", "key", "value", priority=True)
@@ -140,6 +263,47 @@ class TestTempestConf(BaseConfigTempestTest):
         self.assertEqual(len(conf_exts), 4)
         self.assertTrue("project-id" in conf_exts)
 
+    def test_append_values_order(self):
+        self.conf.set("compute-feature-enabled", "api_extensions", "b,a")
+        self.conf.append_values(
+            {"compute-feature-enabled.api_extensions": ["d", "a", "c", "d"]})
+        # existing values keep their order, new ones follow in the given
+        # order without duplicates
+        self.assertEqual(
+            self.conf.get("compute-feature-enabled", "api_extensions"),
+            "b,a,d,c")
+
+    def test_update_values(self):
+        self.conf.set("network-feature-enabled", "api_extensions",
+                      "dvr,tag,router")
+        self.conf.set("compute", "image_ssh_user", "cirros")
+        with mock.patch.object(self.conf, 'set',
+                               wraps=self.conf.set) as mock_set:
+            self.conf.update_values(
+                to_remove={"network-feature-enabled.api_extensions":
+                           ["dvr", "router"],
+                           "compute.image_ssh_user": ["cirros"]},
+                to_append={"network-feature-enabled.api_extensions":
+                           ["router", "trunk"],
+                           "compute.image_ssh_user": ["centos"]},
+                layer='override')
+        self.assertEqual(
+            self.conf.get("network-feature-enabled", "api_extensions"),
+            "tag,router,trunk")
+        self.assertEqual(self.conf.get("compute", "image_ssh_user"), "centos")
+        # every option is written back once
+        self.assertEqual(mock_set.call_count, 2)
+        self.assertEqual(self.conf.get_source(
+            "network-feature-enabled", "api_extensions").layer, 'override')
+
+    def test_update_values_unchanged(self):
+        self.conf.set("network-feature-enabled", "api_extensions", "dvr,tag")
+        with mock.patch.object(self.conf, 'set') as mock_set:
+            self.conf.update_values(
+                to_remove={"network-feature-enabled.api_extensions": ["x"]},
+                to_append={"network-feature-enabled.api_extensions": ["tag"]})
+        self.assertFalse(mock_set.called)
+
     def test_append_values_with_overrides(self):
         # Test if --add option can override an option which was
         # passed to python-tempestconf as an override, it shouldn't
@@ -163,3 +327,29 @@ class TestTempestConf(BaseConfigTempestTest):
         self.assertTrue("dvr" in conf_exts)
         self.assertTrue("l3-flavors" in conf_exts)
         self.assertTrue("rbac-policies" in conf_exts)
+
+
+class TestListValue(BaseConfigTempestTest):
+
+    def test_parse(self):
+        value = tempest_conf.ListValue.parse('b,a,,b')
+        self.assertEqual(list(value), ['b', 'a'])
+        self.assertEqual(str(value), 'b,a')
+        self.assertEqual(len(tempest_conf.ListValue.parse('')), 0)
+
+    def test_union_difference(self):
+        value = tempest_conf.ListValue(['a', 'b', 'c'])
+        self.assertEqual(list(value | ['d', 'a']), ['a', 'b', 'c', 'd'])
+        self.assertEqual(list(value - ['b']), ['a', 'c'])
+        # operands are not changed
+        self.assertEqual(list(value), ['a', 'b', 'c'])
+        self.assertIn('a', value)
+        self.assertEqual(value, tempest_conf.ListValue('abc'))
+        self.assertNotEqual(value, tempest_conf.ListValue('cba'))
+
+    def test_set(self):
+        conf = tempest_conf.TempestConf()
+        conf.set('compute-feature-enabled', 'api_extensions',
+                 tempest_conf.ListValue(['a', 'b']))
+        self.assertEqual(conf.get('compute-feature-enabled',
+                                  'api_extensions'), 'a,b')
@@ -0,0 +1,131 @@
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from config_tempest.tests.base import BaseConfigTempestTest
+from config_tempest.tests.base import run_async
+from config_tempest import utils
+
+
+class TestUtils(BaseConfigTempestTest):
+
+    def test_get_base_url(self):
+        self.assertEqual(utils.get_base_url('http://10.0.0.1:5000/v3'),
+                         'http://10.0.0.1:5000/')
+        self.assertEqual(utils.get_base_url('http://10.0.0.1/identity/v2.0'),
+                         'http://10.0.0.1/identity/')
+
+    def test_first_success(self):
+        def check(path):
+            if path == 'healthcheck':
+                raise IOError('not found')
+            return path != 'rgw/healthcheck'
+        self.assertEqual(
+            utils.first_success(['healthcheck', 'swift/healthcheck',
+                                 'rgw/healthcheck'], check),
+            ('swift/healthcheck', True))
+
+    def test_first_success_none(self):
+        self.assertEqual(utils.first_success(['a', 'b'], lambda c: False),
+                         (None, None))
+        self.assertEqual(utils.first_success([], lambda c: True),
+                         (None, None))
+
+    def test_first_success_prefers_order(self):
+        # the second candidate finishes first, but the first one is preferred
+        first_done = threading.Event()
+
+        def check(candidate):
+            if candidate == 'first':
+                first_done.wait(5)
+                return 'first result'
+            first_done.set()
+            return 'second result'
+        self.assertEqual(utils.first_success(['first', 'second'], check),
+                         ('first', 'first result'))
+
+    def test_first_success_does_not_wait_for_others(self):
+        release = threading.Event()
+
+        def check(candidate):
+            if candidate == 'slow':
+                release.wait(5)
+            return True
+        self.assertEqual(utils.first_success(['fast', 'slow'], check),
+                         ('fast', True))
+        release.set()
+
+    def test_async_first_success(self):
+        async def check(candidate):
+            if candidate == 'slow':
+                await asyncio.sleep(5)
+            if candidate == 'broken':
+                raise IOError()
+            return candidate == 'fast'
+        self.assertEqual(
+            run_async(utils.async_first_success(
+                ['broken', 'wrong', 'fast', 'slow'], check)),
+            ('fast', True))
+
+
+class TestWriteAtomic(BaseConfigTempestTest):
+
+    def setUp(self):
+        super(TestWriteAtomic, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.path = os.path.join(self.tmp_dir, 'tempest.conf')
+
+    def test_write_atomic(self):
+        utils.write_atomic(self.path, 'old')
+        utils.write_atomic(self.path, 'new')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertEqual(os.listdir(self.tmp_dir), ['tempest.conf'])
+
+    def test_write_atomic_mode(self):
+        umask = os.umask(0o027)
+        self.addCleanup(os.umask, umask)
+        # the umask is process wide, it isn't changed even for a moment
+        with mock.patch('config_tempest.utils.os.umask') as mock_umask:
+            utils.write_atomic(self.path, 'new')
+        self.assertFalse(mock_umask.called)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o640)
+        # the mode of an existing file is kept
+        os.chmod(self.path, 0o600)
+        utils.write_atomic(self.path, 'changed')
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_write_atomic_failure(self):
+        utils.write_atomic(self.path, 'old')
+        with mock.patch('config_tempest.utils.os.replace',
+                        side_effect=OSError()):
+            self.assertRaises(OSError, utils.write_atomic, self.path, 'new')
+        with open(self.path) as f:
+            self.assertEqual(f.read(), 'old')
+        self.assertEqual(os.listdir(self.tmp_dir), ['tempest.conf'])
+
+    def test_get_file_hash(self):
+        self.assertIsNone(utils.get_file_hash(self.path))
+        utils.write_atomic(self.path, 'content')
+        self.assertEqual(
+            utils.get_file_hash(self.path),
+            'ed7002b439e9ac845f22357d822bac1444730fbdb6016d3ec9432297b9ec9f73')
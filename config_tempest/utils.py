@@ -13,8 +13,21 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import asyncio
+from concurrent import futures
+import hashlib
+import os
 import re
 from six.moves import urllib
+import uuid
+
+try:
+    from importlib import metadata
+except ImportError:
+    # python < 3.8
+    import importlib_metadata as metadata
+
+from config_tempest.constants import LOG
 
 
 def get_base_url(endpoint):
@@ -31,3 +44,151 @@ def get_base_url(endpoint):
     url = list(url)
     url[2] = url_path_without_version + '/'
     return urllib.parse.urlunsplit(url)
+
+
+def _pick(candidates, results):
+    """Return the first successful result if it's already decided.
+
+    :param results: {index of a candidate: result or None if it failed}
+    :return: (decided, candidate, result)
+    """
+    for i, candidate in enumerate(candidates):
+        if i not in results:
+            # a preferred candidate is still running
+            return False, None, None
+        if results[i]:
+            return True, candidate, results[i]
+    return True, None, None
+
+
+def _check(check, candidate):
+    try:
+        return check(candidate)
+    except Exception as e:
+        LOG.debug("Candidate '%s' failed: %s", candidate, e)
+        return None
+
+
+def first_success(candidates, check):
+    """Try all candidates at once and return the first successful one.
+
+    The check is run for all candidates concurrently, each in its own
+    thread. A candidate is successful when the check returns a truthy value
+    without raising an exception. Candidates are listed in the order of
+    preference, the result is returned as soon as a candidate succeeds and
+    all the preferred ones failed, the others aren't waited for.
+
+    :param candidates: f.e. paths or urls to probe
+    :type candidates: list
+    :param check: callable taking a candidate
+    :return: the successful candidate and the return value of the check or
+             (None, None) if all of them failed
+    :rtype: tuple
+    """
+    if not candidates:
+        return None, None
+    executor = futures.ThreadPoolExecutor(max_workers=len(candidates))
+    try:
+        running = dict((executor.submit(_check, check, c), i)
+                       for i, c in enumerate(candidates))
+        results = {}
+        for future in futures.as_completed(running):
+            results[running[future]] = future.result()
+            decided, candidate, result = _pick(candidates, results)
+            if decided:
+                return candidate, result
+    finally:
+        executor.shutdown(wait=False)
+
+
+async def async_first_success(candidates, check):
+    """Async counterpart of first_success.
+
+    :param check: coroutine function taking a candidate
+    """
+    async def _async_check(candidate):
+        try:
+            return await check(candidate)
+        except Exception as e:
+            LOG.debug("Candidate '%s' failed: %s", candidate, e)
+            return None
+
+    if not candidates:
+        return None, None
+    running = dict((asyncio.ensure_future(_async_check(c)), i)
+                   for i, c in enumerate(candidates))
+    results = {}
+    pending = set(running)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                results[running[future]] = future.result()
+            decided, candidate, result = _pick(candidates, results)
+            if decided:
+                return candidate, result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def get_file_hash(path):
+    """Return sha256 of the content of a file or None if it doesn't exist.
+
+    :rtype: string or None
+    """
+    sha = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                sha.update(chunk)
+    except (IOError, OSError):
+        return None
+    return sha.hexdigest()
+
+
+def write_atomic(path, content):
+    """Replace a file by the given content atomically.
+
+    The content is written to a temporary file in the same directory, which
+    is synced and renamed to the path, so that readers see either the old
+    or the new content, never a partially written file. Permissions of an
+    existing file are kept.
+
+    :type path: string
+    :type content: string
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        mode = None
+    tmp_path = os.path.join(directory, '.%s.%s' % (os.path.basename(path),
+                                                   uuid.uuid4().hex[:8]))
+    # the kernel applies the umask, the same way as open(path, 'w') does,
+    # the umask can't be read without changing it for all the threads
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def get_entry_points(group):
+    """Return entry points of installed packages in a group.
+
+    :type group: string
+    :rtype: iterable of entry points
+    """
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        return entry_points.select(group=group)
+    return entry_points.get(group, [])
@@ -22,62 +22,19 @@
 # key = value1,value2,value3
 #
 # then this script compares these values regardless their order.
+#
+# The comparison itself is implemented by config_tempest.compare module,
+# pass --format json to get the difference as JSON.
 
-import six
-from six.moves import configparser
+import os
 import sys
 
+# use config_tempest of the source tree the script is part of
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', '..', '..'))
 
-def compare_ini_files(conf1, path1, conf2, path2):
-    failed = 0
-    for section in conf1.sections():
-        if not conf2.has_section(section):
-            sys.stderr.write("%s doesn't have %s section.\n" %
-                             (path2, section))
-            failed = 1
-            continue
-        for (key, value) in conf1.items(section):
-            values1 = value.split(',')
-            if len(values1) > 1:
-                # the value contains a list of strings divided by commas,
-                # e.g. api_extensions
-                values2 = conf2.get(section, key).split(',')
-                for i in values1:
-                    if i not in values2:
-                        sys.stderr.write("%s value not in %s.%s of %s\n" %
-                                         (i, section, key, path2))
-                        failed = 1
-            else:
-                val1 = conf1.get(section, key)
-                if not conf2.has_option(section, key):
-                    sys.stderr.write("%s doesn't have %s option in %s "
-                                     "section.\n" % (path2, key, section))
-                    failed = 1
-                else:
-                    val2 = conf2.get(section, key)
-                    if not val1 == val2:
-                        sys.stderr.write("%s in %s != %s in %s under %s.%s\n" %
-                                         (val1, path1, val2,
-                                          path2, section, key))
-                        failed = 1
-    return failed
+from config_tempest import compare  # noqa: E402
 
 
 if __name__ == '__main__':
-    if six.PY3:
-        conf1 = configparser.ConfigParser()
-        conf2 = configparser.ConfigParser()
-    else:
-        conf1 = configparser.SafeConfigParser()
-        conf2 = configparser.SafeConfigParser()
-
-    conf1.read(sys.argv[1])
-    conf2.read(sys.argv[2])
-
-    # compare first file to the other one
-    ret = compare_ini_files(conf1, sys.argv[1], conf2, sys.argv[2])
-
-    # compare the other file to the first one
-    ret2 = compare_ini_files(conf2, sys.argv[2], conf1, sys.argv[1])
-
-    sys.exit(ret or ret2)
+    sys.exit(compare.main())
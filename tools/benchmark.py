@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# Copyright 2020 Red Hat, Inc.
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Benchmark of the whole discovery against a local fake cloud.
+
+Every scenario starts a fake cloud (see config_tempest/fake_cloud.py)
+of the given size and latency and runs config_tempest() against it in a
+separate process. The wall time, the number of HTTP calls the cloud served
+and the peak RSS of the process are reported.
+
+    $ python tools/benchmark.py
+    $ python tools/benchmark.py --scenario 500-flavors --repeat 3
+    $ python tools/benchmark.py --output results.json
+    $ python tools/benchmark.py --baseline results.json --tolerance 10
+
+When --baseline is used, the script exits with a non-zero code if any
+scenario is slower or uses more memory than the baseline by more than
+--tolerance percent, or makes more HTTP calls than the baseline.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from config_tempest import constants as C
+from config_tempest import main as tool
+from config_tempest.fake_cloud import FakeCloud
+
+# name: arguments of FakeCloud
+SCENARIOS = {
+    'baseline': {},
+    '500-flavors': {'flavors': 500},
+    '5000-images': {'images': 5000},
+    '5000-networks': {'networks': 5000},
+    '25-services-200ms': {'services': 25, 'latency': 0.2},
+}
+
+
+def _run_tool(cloud_creds, queue):
+    """Run config_tempest in a temporary directory and report to queue."""
+    workdir = tempfile.mkdtemp(prefix='tempestconf-bench-')
+    try:
+        os.chdir(workdir)
+        # don't let a deployer input of the user affect the results
+        C.DEPLOYER_INPUT = os.path.join(workdir, 'deployer-input.conf')
+        logging.disable(logging.CRITICAL)
+        start = time.time()
+        tool.config_tempest(cloud_creds=cloud_creds,
+                            out=os.path.join(workdir, 'tempest.conf'))
+        wall_time = time.time() - start
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        queue.put({'wall_time': wall_time, 'peak_rss_kb': peak_rss})
+    except Exception as e:
+        queue.put({'error': repr(e)})
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_scenario(name, repeat=1):
+    """Run a scenario repeat times and return the fastest run.
+
+    :rtype: dict
+    """
+    results = []
+    ctx = multiprocessing.get_context('fork')
+    for _ in range(repeat):
+        with FakeCloud(**SCENARIOS[name]) as cloud:
+            queue = ctx.Queue()
+            process = ctx.Process(target=_run_tool,
+                                  args=(cloud.cloud_creds, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            if 'error' in result:
+                raise RuntimeError("Scenario '%s' failed: %s"
+                                   % (name, result['error']))
+            result['http_calls'] = cloud.http_calls
+            results.append(result)
+    return min(results, key=lambda r: r['wall_time'])
+
+
+def compare(results, baseline, tolerance):
+    """Compare results to a baseline.
+
+    :return: list of regressions found
+    :rtype: list
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result['http_calls'] > base['http_calls']:
+            regressions.append('%s: http_calls %d > %d' % (
+                name, result['http_calls'], base['http_calls']))
+        for metric in ('wall_time', 'peak_rss_kb'):
+            limit = base[metric] * (1 + tolerance / 100.0)
+            if result[metric] > limit:
+                regressions.append('%s: %s %.2f > %.2f (baseline %.2f)' % (
+                    name, metric, result[metric], limit, base[metric]))
+    return regressions
+
+
+def print_results(results):
+    row = '%-20s %12s %12s %14s'
+    print(row % ('scenario', 'wall time', 'http calls', 'peak rss (MB)'))
+    for name, result in results.items():
+        print(row % (name, '%.3fs' % result['wall_time'],
+                     result['http_calls'],
+                     '%.1f' % (result['peak_rss_kb'] / 1024.0)))
+
+
+def get_arg_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS),
+                        help='Scenario to run, all of them by default.')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='Run every scenario N times and report the '
+                             'fastest run.')
+    parser.add_argument('--output', metavar='PATH',
+                        help='Write the results to a json file.')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='Compare the results to a json file written '
+                             'by --output.')
+    parser.add_argument('--tolerance', type=float, default=10.0,
+                        help='Allowed regression of wall time and peak RSS '
+                             'in percent, default is 10.')
+    return parser
+
+
+def main():
+    args = get_arg_parser().parse_args()
+    names = args.scenario or sorted(SCENARIOS)
+    results = dict((name, run_scenario(name, args.repeat))
+                   for name in names)
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: ' + regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()